@@ -0,0 +1,616 @@
+"""Opt-in JSON-RPC automation endpoint for batch rendering and scraping
+
+Started with --automation[=WORKERS], the browser listens on a second
+QLocalServer (owner-only, like the single-instance one) for JSON-RPC 2.0
+requests, one JSON object per line. Responses come back one per line as
+jobs finish, not necessarily in request order.
+
+    render      {url, wait_for, evaluate, world, screenshot, pdf, landscape,
+                 viewport, timeout} -> {url, title, result, screenshot, pdf, ms}
+    tabs.list   {} -> [{tab, url, title, window, current}]
+    tabs.open   {url} -> {tab, ok}, once the tab has loaded
+    tabs.run    {tab, ...render params} on an open tab
+    tabs.close  {tab}
+    stats       {} -> pool counters
+
+render jobs wait in a queue for one of a fixed number of hidden page
+workers. A worker keeps its view and renderer between jobs, which saves
+creating a page and starting a renderer process for every job.
+screenshot and pdf are either true (the data comes back base64-encoded)
+or a file path to write to.
+
+    python automation.py render URL [--screenshot out.png] [--pdf out.pdf] [--evaluate JS]
+    python automation.py --bench [--pages 200] [--workers 4]
+
+is a client for a running browser, and a throughput benchmark in pages per
+minute against a local server, with and without page reuse.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import socket
+from collections import deque
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, QTimer, QUrl, QSize, QBuffer, QMarginsF, Qt, pyqtSignal
+from PyQt6.QtGui import QPageLayout, QPageSize
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineScript
+import single_instance
+from load_metrics import PAINT_TIME_JS
+from session import atomic_write
+
+# JSON-RPC 2.0 error codes; the -320xx range is for the server's own errors
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+LOAD_FAILED = -32000
+TIMED_OUT = -32001
+QUEUE_FULL = -32002
+BUSY = -32003
+
+DEFAULT_VIEWPORT = (1280, 800)
+PAINT_WAIT_MS = 2000
+WORLDS = {"main": QWebEngineScript.ScriptWorldId.MainWorld,
+          "application": QWebEngineScript.ScriptWorldId.ApplicationWorld}
+
+
+def server_name():
+    """Next to the single-instance socket, per user and data directory"""
+    root, ext = os.path.splitext(single_instance.server_name())
+    return f"{root}-automation{ext}"
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def job_params(params):
+    """Checked render parameters; raises RpcError(INVALID_PARAMS)"""
+    if not isinstance(params, dict):
+        raise RpcError(INVALID_PARAMS, "params must be an object")
+    checked = {"timeout": 30.0, "world": "main", "viewport": DEFAULT_VIEWPORT, "landscape": False}
+    for key, value in params.items():
+        if key == "url":
+            url = QUrl(value) if isinstance(value, str) else QUrl()
+            if not url.isValid() or not url.scheme():
+                raise RpcError(INVALID_PARAMS, f"not an absolute URL: {value!r}")
+            checked["url"] = url
+        elif key in ("wait_for", "evaluate"):
+            if not isinstance(value, str):
+                raise RpcError(INVALID_PARAMS, f"{key} must be a JavaScript expression")
+            checked[key] = value
+        elif key == "world":
+            if value not in WORLDS:
+                raise RpcError(INVALID_PARAMS, f"world must be one of {', '.join(WORLDS)}")
+            checked[key] = value
+        elif key in ("screenshot", "pdf"):
+            if not isinstance(value, (bool, str)):
+                raise RpcError(INVALID_PARAMS, f"{key} must be true or a file path")
+            if value:
+                checked[key] = value
+        elif key == "landscape":
+            checked[key] = bool(value)
+        elif key == "viewport":
+            if not (isinstance(value, list) and len(value) == 2
+                    and all(isinstance(n, int) and 0 < n <= 8192 for n in value)):
+                raise RpcError(INVALID_PARAMS, "viewport must be [width, height]")
+            checked[key] = tuple(value)
+        elif key == "timeout":
+            if not isinstance(value, (int, float)) or not 0 < value <= 600:
+                raise RpcError(INVALID_PARAMS, "timeout must be 0-600 seconds")
+            checked[key] = float(value)
+        elif key != "tab":
+            raise RpcError(INVALID_PARAMS, f"unknown parameter {key!r}")
+    return checked
+
+
+class Job:
+    """One render request; respond(result) or respond(error=RpcError) is called exactly once"""
+
+    def __init__(self, params, respond):
+        self.params = params
+        self.respond = respond
+        self.step = None
+        self.result = {}
+        self.started = time.perf_counter()
+
+
+def output(data, target):
+    """bytes -> base64 text, or written to target when that is a path"""
+    if isinstance(target, str):
+        atomic_write(os.path.abspath(target), data)
+        return os.path.abspath(target)
+    return base64.b64encode(data).decode()
+
+
+class PageWorker(QObject):
+    """Runs jobs one at a time on a view: load, wait, evaluate, screenshot, PDF"""
+
+    finished = pyqtSignal(object)  # self
+
+    def __init__(self, view, pooled=False, parent=None):
+        super().__init__(parent)
+        self.view = view
+        # A pooled page starts every job with an empty history; a user's tab keeps its own
+        self.pooled = pooled
+        self.job = None
+        self.idle_since = time.monotonic()
+        view.loadFinished.connect(self.loaded)
+        self.poll = QTimer(self)
+        self.poll.setInterval(100)
+        self.poll.timeout.connect(self.check_condition)
+        self.deadline = QTimer(self)
+        self.deadline.setSingleShot(True)
+        self.deadline.timeout.connect(
+            lambda: self.fail(RpcError(TIMED_OUT, f"timed out during {self.job.step}")))
+
+    def run(self, job):
+        self.job = job
+        params = job.params
+        self.deadline.start(int(params["timeout"] * 1000))
+        if self.view.size() != QSize(*params["viewport"]):
+            self.view.resize(*params["viewport"])
+        if "url" in params:
+            job.step = "load"
+            if self.pooled:
+                self.view.page().history().clear()
+            self.view.page().load(params["url"])
+        else:
+            self.after_load()
+
+    def loaded(self, ok):
+        if self.job is None or self.job.step != "load":
+            return
+        if not ok:
+            self.fail(RpcError(LOAD_FAILED, f"could not load {self.job.params['url'].toString()}"))
+            return
+        self.after_load()
+
+    def after_load(self):
+        if "wait_for" in self.job.params:
+            self.wait_until("wait_for", f"!!({self.job.params['wait_for']})", self.evaluate)
+        else:
+            self.evaluate()
+
+    def wait_until(self, step, expression, then):
+        """Poll expression until it is truthy, then call then()"""
+        self.job.step = step
+        self.condition = (expression, then)
+        self.poll.start()
+        self.check_condition()
+
+    def check_condition(self):
+        job = self.job
+        expression, then = self.condition
+        world = WORLDS[job.params["world"]]
+        self.view.page().runJavaScript(expression, world,
+                                       lambda value: self.condition_met(job, value, then))
+
+    def condition_met(self, job, value, then):
+        # Several polls can be in flight; only the first truthy answer counts
+        if self.job is not job or not self.poll.isActive() or not value:
+            return
+        self.poll.stop()
+        then()
+
+    def evaluate(self):
+        job = self.job
+        if "evaluate" not in job.params:
+            self.screenshot()
+            return
+        job.step = "evaluate"
+        self.view.page().runJavaScript(job.params["evaluate"], WORLDS[job.params["world"]],
+                                       lambda value: self.evaluated(job, value))
+
+    def evaluated(self, job, value):
+        if self.job is not job:
+            return
+        job.result["result"] = value
+        self.screenshot()
+
+    def screenshot(self):
+        if "screenshot" not in self.job.params:
+            self.pdf()
+            return
+        # loadFinished comes before the first frame; grabbing then gives a blank image.
+        # A page with nothing to paint never reports a paint, so that wait is capped
+        job = self.job
+        self.wait_until("paint", PAINT_TIME_JS, self.grab)
+        QTimer.singleShot(PAINT_WAIT_MS, lambda: self.paint_waited(job))
+
+    def paint_waited(self, job):
+        if self.job is job and job.step == "paint":
+            self.poll.stop()
+            self.grab()
+
+    def grab(self):
+        job = self.job
+        job.step = "screenshot"
+        buffer = QBuffer()
+        buffer.open(QBuffer.OpenModeFlag.WriteOnly)
+        self.view.grab().save(buffer, "PNG")
+        job.result["screenshot"] = output(bytes(buffer.data()), job.params["screenshot"])
+        self.pdf()
+
+    def pdf(self):
+        job = self.job
+        if "pdf" not in job.params:
+            self.done()
+            return
+        job.step = "pdf"
+        orientation = QPageLayout.Orientation.Landscape if job.params["landscape"] \
+            else QPageLayout.Orientation.Portrait
+        layout = QPageLayout(QPageSize(QPageSize.PageSizeId.A4), orientation, QMarginsF(10, 10, 10, 10))
+        self.view.page().printToPdf(lambda data: self.printed(job, data), layout)
+
+    def printed(self, job, data):
+        if self.job is not job:
+            return
+        if not len(data):
+            self.fail(RpcError(LOAD_FAILED, "printing to PDF failed"))
+            return
+        job.result["pdf"] = output(bytes(data), job.params["pdf"])
+        self.done()
+
+    def done(self):
+        job = self.job
+        page = self.view.page()
+        job.result.update(url=page.url().toString(), title=page.title(),
+                          ms=round((time.perf_counter() - job.started) * 1000, 1))
+        self.end()
+        job.respond(job.result)
+
+    def fail(self, error):
+        job = self.job
+        if job is None:
+            return
+        self.end()
+        # After end(): stopping a load emits loadFinished(False), which must not fail the job twice
+        self.view.stop()
+        job.respond(error=error)
+
+    def end(self):
+        self.poll.stop()
+        self.deadline.stop()
+        self.job = None
+        self.idle_since = time.monotonic()
+        self.finished.emit(self)
+
+
+class PagePool(QObject):
+    """Up to `size` hidden page workers fed from a job queue
+
+    With reuse (the default) a worker's view outlives its job; workers idle
+    for idle_timeout seconds are closed, so their renderers exit.
+    """
+
+    def __init__(self, profile, size=4, max_queue=1000, reuse=True, idle_timeout=120,
+                 interceptor=None, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        # Content blocking is per page, like in tabs (uncounted here)
+        self.interceptor = interceptor
+        self.size = max(1, size)
+        self.max_queue = max_queue
+        self.reuse = reuse
+        self.idle_timeout = idle_timeout
+        self.queue = deque()
+        self.workers = []
+        self.idle = []
+        self.counts = {"completed": 0, "failed": 0, "pages_created": 0}
+        self.trim_timer = QTimer(self)
+        self.trim_timer.setInterval(30_000)
+        self.trim_timer.timeout.connect(self.trim)
+        self.trim_timer.start()
+
+    def submit(self, job):
+        if len(self.queue) >= self.max_queue:
+            raise RpcError(QUEUE_FULL, f"{len(self.queue)} jobs already queued")
+        respond = job.respond
+
+        def counted(result=None, error=None):
+            self.counts["failed" if error else "completed"] += 1
+            respond(result, error)
+
+        job.respond = counted
+        self.queue.append(job)
+        self.dispatch()
+
+    def dispatch(self):
+        while self.queue and (self.idle or len(self.workers) < self.size):
+            worker = self.idle.pop() if self.idle else self.new_worker()
+            worker.run(self.queue.popleft())
+
+    def new_worker(self):
+        view = QWebEngineView()
+        page = QWebEnginePage(self.profile, view)
+        if self.interceptor is not None:
+            page.setUrlRequestInterceptor(self.interceptor)
+        view.setPage(page)
+        # Rendered and grabbable like a shown window, but never on screen
+        view.setAttribute(Qt.WidgetAttribute.WA_DontShowOnScreen)
+        view.resize(*DEFAULT_VIEWPORT)
+        view.show()
+        worker = PageWorker(view, pooled=True, parent=self)
+        worker.finished.connect(self.worker_finished)
+        self.workers.append(worker)
+        self.counts["pages_created"] += 1
+        return worker
+
+    def worker_finished(self, worker):
+        if self.reuse:
+            self.idle.append(worker)
+        else:
+            self.close_worker(worker)
+        # Later, so a job's response goes out before the next job starts
+        QTimer.singleShot(0, self.dispatch)
+
+    def close_worker(self, worker):
+        self.workers.remove(worker)
+        if worker in self.idle:
+            self.idle.remove(worker)
+        worker.finished.disconnect(self.worker_finished)
+        worker.view.page().deleteLater()
+        worker.view.deleteLater()
+        worker.deleteLater()
+
+    def trim(self):
+        now = time.monotonic()
+        for worker in [w for w in self.idle if now - w.idle_since > self.idle_timeout]:
+            self.close_worker(worker)
+
+    def close(self):
+        self.trim_timer.stop()
+        self.queue.clear()
+        for worker in list(self.workers):
+            self.close_worker(worker)
+            worker.fail(RpcError(LOAD_FAILED, "browser is shutting down"))
+
+    def stats(self):
+        return dict(self.counts, workers=len(self.workers), busy=len(self.workers) - len(self.idle),
+                    queued=len(self.queue), size=self.size)
+
+
+class AutomationServer(QObject):
+    """JSON-RPC over a QLocalServer; render jobs go to a PagePool, tab methods to BrowserApp"""
+
+    def __init__(self, browser_app, workers=4, parent=None):
+        super().__init__(parent)
+        self.browser_app = browser_app
+        self.pool = PagePool(browser_app.web_profile.profile, workers,
+                             interceptor=browser_app.web_profile.content_blocker, parent=self)
+        self.busy_tabs = set()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        self.methods = {
+            "render": self.render,
+            "stats": lambda params, respond: respond(self.pool.stats()),
+            "tabs.list": self.list_tabs,
+            "tabs.open": self.open_tab,
+            "tabs.run": self.run_in_tab,
+            "tabs.close": self.close_tab,
+        }
+
+    def listen(self):
+        name = server_name()
+        if self.server.listen(name):
+            return True
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(500):
+            probe.disconnectFromServer()
+            print(f"Automation socket {name} is in use by another instance", file=sys.stderr)
+            return False
+        # Nobody answers, so the name is left over from a crash
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+
+    def close(self):
+        self.server.close()
+        self.pool.close()
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            conn.readyRead.connect(lambda c=conn: self.read(c))
+            conn.disconnected.connect(conn.deleteLater)
+
+    def read(self, conn):
+        while conn.canReadLine():
+            self.handle(conn, bytes(conn.readLine()))
+
+    def handle(self, conn, line):
+        if not line.strip():
+            return
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.send(conn, None, error=RpcError(PARSE_ERROR, str(e)))
+            return
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            self.send(conn, None, error=RpcError(INVALID_REQUEST, "expected an object with a method"))
+            return
+        request_id = request.get("id")
+        # Requests without an id are notifications and get no response
+        respond = (lambda result=None, error=None: self.send(conn, request_id, result, error)) \
+            if "id" in request else (lambda result=None, error=None: None)
+        method = self.methods.get(request["method"])
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"no method {request['method']!r}")
+            method(request.get("params", {}), respond)
+        except RpcError as e:
+            respond(error=e)
+
+    def send(self, conn, request_id, result=None, error=None):
+        if sip.isdeleted(conn) or conn.state() != QLocalSocket.LocalSocketState.ConnectedState:
+            return  # The client went away before its job finished
+        response = {"jsonrpc": "2.0", "id": request_id}
+        if error is not None:
+            response["error"] = {"code": error.code, "message": str(error)}
+        else:
+            response["result"] = result
+        # default=str: page values can be dates and other types JSON does not have
+        conn.write(json.dumps(response, default=str).encode() + b"\n")
+        conn.flush()
+
+    def render(self, params, respond):
+        params = job_params(params)
+        if "url" not in params:
+            raise RpcError(INVALID_PARAMS, "render needs a url")
+        self.pool.submit(Job(params, respond))
+
+    # Tabs
+
+    def find_tab(self, params):
+        tab_id = params.get("tab") if isinstance(params, dict) else None
+        for window, view in self.browser_app.live_tabs():
+            if view.tab_id == tab_id:
+                return window, view
+        raise RpcError(INVALID_PARAMS, f"no open tab {tab_id!r} with a page")
+
+    def list_tabs(self, params, respond):
+        respond([{"tab": view.tab_id, "url": view.url().toString(), "title": view.title(),
+                  "window": self.browser_app.windows.index(window),
+                  "current": view is window.tabs.currentWidget()}
+                 for window, view in self.browser_app.live_tabs()])
+
+    def open_tab(self, params, respond):
+        url = job_params({"url": params.get("url") if isinstance(params, dict) else None})["url"]
+        view = self.browser_app.active_window().add_new_tab(url)
+
+        def loaded(ok):
+            view.loadFinished.disconnect(loaded)
+            respond({"tab": view.tab_id, "ok": ok})
+
+        view.loadFinished.connect(loaded)
+
+    def run_in_tab(self, params, respond):
+        window, view = self.find_tab(params)
+        params = job_params(params)
+        if view in self.busy_tabs:
+            raise RpcError(BUSY, "the tab is running another job")
+        if "screenshot" in params:
+            # Background tabs are not painted
+            window.tabs.setCurrentWidget(view)
+        # The tab keeps its size; viewport only applies to pooled pages
+        params["viewport"] = (view.width(), view.height())
+        worker = PageWorker(view, parent=self)
+        self.busy_tabs.add(view)
+
+        def finished(worker):
+            self.busy_tabs.discard(view)
+            worker.deleteLater()
+
+        worker.finished.connect(finished)
+        worker.run(Job(params, respond))
+
+    def close_tab(self, params, respond):
+        window, view = self.find_tab(params)
+        window.close_current_tab(window.tabs.indexOf(view))
+        respond(True)
+
+
+def call(method, params=None, timeout=300.0):
+    """Send one request to a running browser's automation socket; the result, or raises RpcError"""
+    request = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}).encode() + b"\n"
+    name = server_name()
+    if sys.platform == "win32":
+        with open("\\\\.\\pipe\\" + name, "r+b", buffering=0) as pipe:
+            pipe.write(request)
+            line = b""
+            while not line.endswith(b"\n"):
+                line += pipe.read(1)
+    else:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(name)
+            sock.sendall(request)
+            line = sock.makefile("rb").readline()
+    response = json.loads(line)
+    if "error" in response:
+        raise RpcError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+def benchmark(pages=200, workers=4):
+    """Pages per minute through the pool, reusing pages and with a new page per job"""
+    import tempfile
+    import bench
+    from PyQt6.QtWidgets import QApplication
+    from internal_pages import register_scheme
+    from web_profile import WebProfile
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    register_scheme()
+    app = QApplication(sys.argv)
+    fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+    server, base_url = bench.serve_directory(fixtures)
+    urls = bench.read_url_list(os.path.join(fixtures, "urls.txt"), base_url)
+    with tempfile.TemporaryDirectory(prefix="elafry-automation-") as storage:
+        web_profile = WebProfile(storage, name="automation-bench", parent=app)
+        for reuse in (True, False):
+            pool = PagePool(web_profile.profile, workers, reuse=reuse,
+                            interceptor=web_profile.content_blocker)
+            results = []
+
+            def respond(result=None, error=None):
+                results.append(error is None)
+                if len(results) == pages:
+                    app.quit()
+
+            start = time.perf_counter()
+            for i in range(pages):
+                params = job_params({"url": urls[i % len(urls)].toString(), "screenshot": True,
+                                     "evaluate": "document.title"})
+                pool.submit(Job(params, respond))
+            app.exec()
+            elapsed = time.perf_counter() - start
+            pool.close()
+            pool.deleteLater()
+            app.processEvents()
+            print(f"{'reused pages' if reuse else 'page per job'}: {pages} pages, {workers} workers, "
+                  f"{pool.counts['pages_created']} pages created, {results.count(False)} failed: "
+                  f"{pages / elapsed * 60:.0f} pages/min")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+    if "--bench" in sys.argv:
+        parser = argparse.ArgumentParser(description="Automation throughput")
+        parser.add_argument("--bench", action="store_true")
+        parser.add_argument("--pages", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=4)
+        args = parser.parse_args()
+        benchmark(args.pages, args.workers)
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description="Render a page through a running Elafrý (--automation)")
+    parser.add_argument("command", choices=["render", "stats"])
+    parser.add_argument("url", nargs="?")
+    parser.add_argument("--wait-for", help="JavaScript condition to wait for after loading")
+    parser.add_argument("--evaluate", help="JavaScript expression whose value is printed")
+    parser.add_argument("--screenshot", help="PNG file to write")
+    parser.add_argument("--pdf", help="PDF file to write")
+    parser.add_argument("--landscape", action="store_true")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    params = {}
+    if args.command == "render":
+        params = {"url": QUrl.fromUserInput(args.url or "").toString(), "timeout": args.timeout,
+                  "landscape": args.landscape}
+        for key in ("wait_for", "evaluate", "screenshot", "pdf"):
+            value = getattr(args, key)
+            if value:
+                # Paths are written by the browser, which may run in another directory
+                params[key] = os.path.abspath(value) if key in ("screenshot", "pdf") else value
+    try:
+        print(json.dumps(call(args.command, params), indent=2, default=str))
+    except (OSError, RpcError) as e:
+        sys.exit(f"{args.command} failed: {e}")
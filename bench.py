@@ -0,0 +1,444 @@
+"""Headless page-load benchmark: python browser.py --bench urls.txt
+
+Loads every URL of the list through BrowserWindow.create_browser, with N
+views loading concurrently, and prints (or writes) a JSON report with
+min/p50/p95/max time to loadFinished and to first paint, plus peak memory.
+Lines of the URL list that are not absolute URLs are paths served by a
+local HTTP server from the fixtures directory (the list's own directory by
+default), so a run needs no network access. Blank lines and lines starting
+with # are ignored. With --bench-sites N those paths are spread over N
+host names (bench-1.test, ...) that Chromium resolves to the local server,
+so the process model sees N different sites.
+
+With --bench-churn N the list is instead opened as N tabs, --bench-churn-batch
+at a time, each batch closed once it has loaded. The report compares the
+browser's RSS and its number of child processes after the first batch with
+the numbers at the end, and the exit status is 1 if either grew: closed tabs
+have to give their memory and renderer processes back.
+
+With --bench-cache the fixtures are served as cacheable (max-age) and the
+list is loaded twice, first with the HTTP cache cleared and then from the
+warm cache; the report holds both passes and the profile's hit counts.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from PyQt6.QtCore import QObject, QTimer, QUrl, QT_VERSION_STR, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEngineScript
+from load_metrics import percentile, PAINT_TIME_JS
+from task_manager import process_stats, psutil, MB
+
+
+def parse_options(argv):
+    """Benchmark options if --bench was given, else None"""
+    if "--bench" not in argv:
+        return None
+    parser = argparse.ArgumentParser(prog="browser.py --bench", add_help=False)
+    parser.add_argument("--bench", required=True, metavar="URLS_FILE")
+    parser.add_argument("--bench-concurrency", type=int, default=4)
+    parser.add_argument("--bench-repeat", type=int, default=1)
+    parser.add_argument("--bench-timeout", type=float, default=30.0)
+    parser.add_argument("--bench-fixtures")
+    parser.add_argument("--bench-output")
+    parser.add_argument("--bench-sites", type=int, default=0)
+    parser.add_argument("--bench-cache", action="store_true")
+    parser.add_argument("--bench-churn", type=int, default=0, metavar="TABS")
+    parser.add_argument("--bench-churn-batch", type=int, default=10)
+    parser.add_argument("--bench-churn-tolerance-mb", type=float, default=64.0)
+    options, _ = parser.parse_known_args(argv)
+    return options
+
+
+def site_host(i):
+    return f"bench-{i + 1}.test"
+
+
+def resolver_rules_argument():
+    # A Chromium switch on the application command line, which QtWebEngine
+    # passes on; QTWEBENGINE_CHROMIUM_FLAGS cannot hold the spaces in it
+    return "--host-resolver-rules=MAP *.test 127.0.0.1"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    # Every run measures the same network work, whatever the HTTP cache holds
+    cache_control = "no-store"
+
+    def log_message(self, *args):
+        pass
+
+    def end_headers(self):
+        self.send_header("Cache-Control", self.cache_control)
+        super().end_headers()
+
+
+class CacheableHandler(QuietHandler):
+    """For --bench-cache: responses the HTTP cache may keep and reuse without asking"""
+    cache_control = "max-age=3600"
+
+
+def serve_directory(directory, handler=QuietHandler):
+    """Serve directory on a free localhost port; returns (server, base URL)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def read_url_list(path, base_url):
+    urls = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            url = QUrl(line)
+            urls.append(url if url.scheme() else QUrl(base_url).resolved(QUrl(line.lstrip("/"))))
+    return urls
+
+
+def spread_over_sites(urls, base_url, sites):
+    """Give the i-th load of a local fixture its own site, round robin over `sites` hosts"""
+    local = QUrl(base_url)
+    spread = []
+    for i, url in enumerate(urls):
+        if sites and url.host() == local.host() and url.port() == local.port():
+            url = QUrl(url)
+            url.setHost(site_host(i % sites))
+        spread.append(url)
+    return spread
+
+
+def child_processes(pid=None):
+    """Number of processes descended from pid (this process by default), or None if unknown"""
+    pid = pid or os.getpid()
+    if sys.platform.startswith("linux"):
+        children = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue  # Exited while we looked
+            children.setdefault(ppid, []).append(int(entry))
+        count, stack = 0, [pid]
+        while stack:
+            below = children.get(stack.pop(), [])
+            count += len(below)
+            stack.extend(below)
+        return count
+    if psutil is not None:
+        try:
+            return len(psutil.Process(pid).children(recursive=True))
+        except psutil.Error:
+            return None
+    return None
+
+
+def summarize(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {"min": round(values[0], 1), "p50": round(percentile(values, 0.5), 1),
+            "p95": round(percentile(values, 0.95), 1), "max": round(values[-1], 1),
+            "count": len(values)}
+
+
+class PageLoadBench(QObject):
+    """Loads a URL queue through `concurrency` views and collects timings"""
+
+    finished = pyqtSignal(object)  # the report dict
+
+    def __init__(self, window, urls, concurrency=4, repeat=1, timeout=30.0, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.queue = list(urls) * repeat
+        self.total = len(self.queue)
+        self.concurrency = max(1, min(concurrency, self.total))
+        self.timeout = timeout
+        self.views = []
+        # view -> (url, perf_counter start, wall clock start, loaded); one load per view at a time
+        self.current = {}
+        self.load_ms = []
+        self.paint_ms = []
+        self.failures = []
+        self.done = 0
+        self.peak = {"browser": 0, "renderers": 0, "total": 0}
+        self.peak_renderer_processes = 0
+
+        self.memory_timer = QTimer(self)
+        self.memory_timer.setInterval(200)
+        self.memory_timer.timeout.connect(self.sample_memory)
+        self.watchdog = QTimer(self)
+        self.watchdog.setInterval(1000)
+        self.watchdog.timeout.connect(self.check_timeouts)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.memory_timer.start()
+        self.watchdog.start()
+        if not self.queue:
+            self.finish()
+            return
+        for _ in range(self.concurrency):
+            url = self.queue.pop(0)
+            # Same view setup (profile, interceptor, signal wiring) as a real tab
+            view = self.window.create_browser(url)
+            view.resize(1280, 800)
+            view.loadFinished.connect(lambda ok, v=view: self.loaded(v, ok))
+            self.views.append(view)
+            self.current[view] = (url, time.perf_counter(), time.time(), False)
+            # Hidden views are throttled and never paint, so each gets a surface
+            view.show()
+
+    def load_next(self, view):
+        if not self.queue:
+            self.current.pop(view, None)
+            if not self.current:
+                self.finish()
+            return
+        url = self.queue.pop(0)
+        self.current[view] = (url, time.perf_counter(), time.time(), False)
+        view.setUrl(url)
+
+    def loaded(self, view, ok):
+        entry = self.current.get(view)
+        if entry is None or entry[3]:
+            return  # Not ours, or a second loadFinished while waiting for the paint time
+        url, start, wall_start, _ = entry
+        elapsed = (time.perf_counter() - start) * 1000
+        if not ok:
+            self.failures.append(url.toString())
+            self.complete(view)
+            return
+        self.current[view] = (url, start, wall_start, True)
+        self.load_ms.append(elapsed)
+        view.page().runJavaScript(PAINT_TIME_JS, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                  lambda painted, v=view, e=self.current[view]: self.painted(v, e, painted))
+
+    def painted(self, view, entry, painted):
+        if self.current.get(view) is not entry:
+            return  # Timed out in the meantime
+        if painted:
+            self.paint_ms.append(painted - entry[2] * 1000)
+        self.complete(view)
+
+    def complete(self, view):
+        self.done += 1
+        self.load_next(view)
+
+    def check_timeouts(self):
+        now = time.perf_counter()
+        for view, entry in list(self.current.items()):
+            url, start, _, loaded = entry
+            if now - start > self.timeout:
+                # Counted before stop(), whose loadFinished(False) is then ignored
+                self.current[view] = (url, start, 0, True)
+                if not loaded:
+                    self.failures.append(url.toString())
+                view.stop()
+                self.complete(view)
+
+    def sample_memory(self):
+        own = process_stats(os.getpid())
+        pids = {v.page().renderProcessPid() for v in self.views} - {0}
+        renderers = sum(s[0] for s in map(process_stats, pids) if s)
+        browser = own[0] if own else 0
+        self.peak["browser"] = max(self.peak["browser"], browser)
+        self.peak["renderers"] = max(self.peak["renderers"], renderers)
+        self.peak["total"] = max(self.peak["total"], browser + renderers)
+        self.peak_renderer_processes = max(self.peak_renderer_processes, len(pids))
+
+    def finish(self):
+        self.sample_memory()
+        self.memory_timer.stop()
+        self.watchdog.stop()
+        wall = time.perf_counter() - self.started
+        for view in self.views:
+            self.window.destroy_browser(view)
+        self.finished.emit({
+            "loads": self.total,
+            "failures": len(self.failures),
+            "failed_urls": sorted(set(self.failures)),
+            "concurrency": self.concurrency,
+            "wall_seconds": round(wall, 3),
+            "loads_per_second": round(self.done / wall, 2) if wall else None,
+            "load_finished_ms": summarize(self.load_ms),
+            "first_paint_ms": summarize(self.paint_ms),
+            "peak_rss_mb": {k: round(v / MB, 1) for k, v in self.peak.items()},
+            "peak_renderer_processes": self.peak_renderer_processes,
+            "environment": {
+                "qt": QT_VERSION_STR,
+                "platform": sys.platform,
+                "chromium_flags": os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", ""),
+            },
+        })
+
+
+class TabChurnBench(QObject):
+    """Opens and closes `tabs` real tabs in batches and checks nothing is left behind"""
+
+    finished = pyqtSignal(object)  # the report dict
+
+    SETTLE_MS = 3000  # Renderer processes take a moment to exit after their page is deleted
+
+    def __init__(self, window, urls, tabs=500, batch=10, timeout=30.0, tolerance_mb=64.0, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.urls = list(urls)
+        self.tabs = tabs
+        self.batch = max(1, batch)
+        self.tolerance = tolerance_mb * MB
+        self.opened = 0
+        self.failures = 0
+        self.open_views = {}  # view -> loaded
+        self.baseline = None
+        self.watchdog = QTimer(self)
+        self.watchdog.setSingleShot(True)
+        self.watchdog.setInterval(int(timeout * 1000))
+        self.watchdog.timeout.connect(self.close_batch)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.open_batch()
+
+    def open_batch(self):
+        if self.opened >= self.tabs:
+            QTimer.singleShot(self.SETTLE_MS, self.finish)
+            return
+        for _ in range(min(self.batch, self.tabs - self.opened)):
+            url = self.urls[self.opened % len(self.urls)] if self.urls else QUrl("about:blank")
+            view = self.window.add_new_tab(url)
+            self.open_views[view] = False
+            view.loadFinished.connect(lambda ok, v=view: self.loaded(v, ok))
+            self.opened += 1
+        self.watchdog.start()
+
+    def loaded(self, view, ok):
+        if view not in self.open_views or self.open_views[view]:
+            return
+        self.open_views[view] = True
+        if not ok:
+            self.failures += 1
+        if all(self.open_views.values()):
+            self.close_batch()
+
+    def close_batch(self):
+        self.watchdog.stop()
+        self.failures += sum(1 for loaded in self.open_views.values() if not loaded)
+        views, self.open_views = list(self.open_views), {}
+        for view in views:
+            # The same path as the tab's close button
+            self.window.close_current_tab(self.window.tabs.indexOf(view))
+        if self.baseline is None:
+            # The first batch pays for caches and shared processes that stay; measure from here
+            QTimer.singleShot(self.SETTLE_MS, self.take_baseline)
+        else:
+            QTimer.singleShot(0, self.open_batch)
+
+    def sample(self):
+        own = process_stats(os.getpid())
+        return {"rss": own[0] if own else 0, "child_processes": child_processes()}
+
+    def take_baseline(self):
+        self.baseline = self.sample()
+        self.open_batch()
+
+    def finish(self):
+        final = self.sample()
+        growth = final["rss"] - self.baseline["rss"]
+        before, after = self.baseline["child_processes"], final["child_processes"]
+        # One spare renderer may be started or dropped at any time
+        processes_flat = before is None or after is None or after <= before + 1
+        self.finished.emit({
+            "tabs": self.opened,
+            "batch": self.batch,
+            "failures": self.failures,
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "baseline": {"rss_mb": round(self.baseline["rss"] / MB, 1), "child_processes": before},
+            "final": {"rss_mb": round(final["rss"] / MB, 1), "child_processes": after},
+            "rss_growth_mb": round(growth / MB, 1),
+            "flat": growth <= self.tolerance and processes_flat,
+        })
+
+
+def run_bench(app, bench):
+    """Run one benchmark object to completion in app's event loop; its report"""
+    result = {}
+
+    def done(report):
+        result.update(report)
+        app.quit()
+
+    bench.finished.connect(done)
+    QTimer.singleShot(0, bench.start)
+    app.exec()
+    return result
+
+
+def clear_http_cache(app, web_profile):
+    """Clear the HTTP cache and wait for Chromium to finish (signal from Qt 6.7)"""
+    completed = getattr(web_profile.profile, "clearHttpCacheCompleted", None)
+    if completed is not None:
+        completed.connect(app.quit)
+    else:
+        QTimer.singleShot(1000, app.quit)
+    web_profile.clear_cache()
+    app.exec()
+    if completed is not None:
+        completed.disconnect(app.quit)
+
+
+def run_cache_passes(app, browser_app, window, urls, options):
+    """The same list from a cleared HTTP cache, then from the warm one"""
+    web_profile = browser_app.web_profile
+    clear_http_cache(app, web_profile)
+    passes = {}
+    for name in ("cold", "warm"):
+        web_profile.cache_hits = web_profile.cache_misses = 0
+        passes[name] = run_bench(app, PageLoadBench(window, urls, options.bench_concurrency, 1,
+                                                    options.bench_timeout))
+        passes[name]["cache"] = web_profile.cache_stats()
+    cold, warm = passes["cold"]["load_finished_ms"], passes["warm"]["load_finished_ms"]
+    return {
+        "cold": passes["cold"],
+        "warm": passes["warm"],
+        "warm_speedup_p50": round(cold["p50"] / warm["p50"], 2) if cold and warm and warm["p50"] else None,
+        "loads": passes["warm"]["loads"],
+        "failures": passes["cold"]["failures"] + passes["warm"]["failures"],
+    }
+
+
+def run(app, browser_app, options):
+    """Run the benchmark in app's event loop; returns the process exit status"""
+    fixtures = options.bench_fixtures or os.path.dirname(os.path.abspath(options.bench))
+    server, base_url = serve_directory(fixtures, CacheableHandler if options.bench_cache else QuietHandler)
+    urls = read_url_list(options.bench, base_url) * options.bench_repeat
+    urls = spread_over_sites(urls, base_url, options.bench_sites)
+    window = browser_app.new_window()
+    if options.bench_cache:
+        result = run_cache_passes(app, browser_app, window, urls, options)
+    elif options.bench_churn:
+        result = run_bench(app, TabChurnBench(window, urls, options.bench_churn, options.bench_churn_batch,
+                                              options.bench_timeout, options.bench_churn_tolerance_mb))
+    else:
+        result = run_bench(app, PageLoadBench(window, urls, options.bench_concurrency, 1,
+                                              options.bench_timeout))
+    result["sites"] = options.bench_sites
+    server.shutdown()
+    window.close()  # Flushes and stops the history, index and session writers
+
+    text = json.dumps(result, indent=2)
+    if options.bench_output:
+        with open(options.bench_output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if options.bench_churn:
+        return 0 if result.get("flat") else 1
+    return 1 if result.get("failures") == result.get("loads") else 0
@@ -0,0 +1,9 @@
+// Builds the page in script, like a small single-page app
+(function () {
+    var app = document.getElementById("app");
+    var items = [];
+    for (var i = 0; i < 2000; i++) {
+        items.push("<li>Item " + i + ": " + Math.sqrt(i).toFixed(4) + "</li>");
+    }
+    app.innerHTML = "<ul>" + items.join("") + "</ul>";
+})();
@@ -1,26 +1,375 @@
+import startup_trace  # first, so the import phases below are timed
 import sys
+import os
+import json
+import uuid
 import base64
+from urllib.parse import parse_qs
 from io import BytesIO
-from PyQt6.QtCore import QUrl, Qt, QSize, QTimer, QByteArray
+import single_instance
+import engine_config
+if __name__ == "__main__":
+    try:
+        single_instance.automation_workers(sys.argv[1:])
+    except ValueError as error:
+        sys.exit(f"elafry: {error}")
+    # Hand the URLs to an already running browser before paying for the Qt imports
+    if single_instance.forward(sys.argv[1:]):
+        sys.exit(0)
+startup_trace.begin("import PyQt6 and QtWebEngine")
+from PyQt6 import sip
+from PyQt6.QtCore import QUrl, QUrlQuery, Qt, QSize, QTimer, QByteArray, QStandardPaths, QObject
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QToolBar, QLineEdit,
                              QTabWidget, QWidget, QVBoxLayout, QStatusBar,
                              QProgressBar, QSplitter, QMenu, QToolButton,
-                             QSizePolicy)
+                             QSizePolicy, QLabel)
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineSettings, QWebEnginePage, QWebEngineProfile
-from PyQt6.QtGui import QAction, QIcon, QKeySequence, QShortcut, QPixmap, QPainter, QColor, QPen
+from PyQt6.QtWebEngineCore import (QWebEngineSettings, QWebEnginePage, QWebEngineProfile,
+                                   QWebEngineScript)
+from PyQt6.QtGui import QAction, QIcon, QKeySequence, QShortcut
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+from tab_lifecycle import TabLifecycleManager
+from web_profile import WebProfile
+from internal_pages import (NEW_TAB_URL, NewTabPage, register_scheme, is_internal,
+                            render_search_page, render_perf_page, render_reader_page)
+from thumbnails import ThumbnailCache
+from history import HistoryStore, HistoryCompleter
+from fulltext import PageTextIndex
+from tab_model import TabModel, TabWidget, TabPanel
+from tab_overview import TabOverview, tab_thumbnail_cache
+from session import (ClosedTabStore, SessionStore, TabPlaceholder,
+                     serialize_history, restore_history, atomic_write)
+from load_metrics import LoadMetrics, PAGE_TIMING_JS, PAINT_TIME_JS
+from task_manager import ProcessSampler, TaskManager, MB
+from site_rules import SiteRules, LITE_MODE, rule_domain
+from speculation import Speculator
+from offline_archive import OfflineArchive
+from offline_pages import OfflineSaver, OfflinePages, format_size
+from downloads import DownloadManager, DownloadsDialog, describe
+from reader import ReaderMode, EXTRACT_CALL, install_script, is_reader, original_url
+from theme import PALETTES, IconCache, stylesheets, qpalette, window_font, icon_color
+startup_trace.end("import PyQt6 and QtWebEngine")
+
+
+def data_path(*parts):
+    """Path inside the per-user application data directory"""
+    base = (os.environ.get("ELAFRY_DATA_DIR") or
+            QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation))
+    return os.path.join(base, *parts)
+
+
+class BrowserApp(QObject):
+    """State shared by every window: profile, history, page index and session
+
+    Windows come and go; closing the last one ends the application, and the
+    session then remembers all windows that were open.
+    """
+
+    def __init__(self, web_profile, home_url=NEW_TAB_URL, metrics_export=None,
+                 memory_budget=2048 * MB, prerender=False, hover_delay=200, parent=None):
+        super().__init__(parent)
+        self.windows = []
+
+        # Persistent profile (disk cache, cookies) shared by all tabs
+        self.web_profile = web_profile
+
+        # Browsing history; written to SQLite on a background thread
+        self.history = HistoryStore(data_path("history.sqlite"), self)
+
+        # Full-text index of visited pages, searched with "?? words" or elafry://search
+        self.page_index = PageTextIndex(data_path("pages.sqlite"))
+
+        # Home / new tab page; the built-in one is served from memory
+        self.home_url = QUrl(home_url)
+        self.thumbnails = ThumbnailCache()
+        # Toolbar icons, rendered once per color and pixel ratio for all windows
+        self.icons = IconCache()
+        self.new_tab_page = NewTabPage(self.thumbnails, self.history)
+        # Last look of every tab, for the tab overview; survives freezing and discarding
+        self.tab_thumbnails = tab_thumbnail_cache()
+        # Rendered in the theme of the window the user is looking at
+        self.web_profile.pages.add_page("newtab", lambda url: self.active_window().render_new_tab(url))
+        self.web_profile.pages.add_page("thumb", self.new_tab_page.thumbnail)
+        self.web_profile.pages.add_page("search", lambda url: self.active_window().render_search(url))
+        self.web_profile.pages.add_page("perf", lambda url: self.active_window().render_perf(url))
+
+        # Reader mode (F9): articles extracted from pages, shown as elafry://reader/<id>
+        self.reader = ReaderMode()
+        install_script(web_profile.profile)
+        self.web_profile.pages.add_page("reader", lambda url: self.active_window().render_reader(url))
+
+        # Load timings of recent navigations, shown on elafry://perf and optionally
+        # exported (JSON lines, or Prometheus text for a *.prom path) for collection
+        self.load_metrics = LoadMetrics()
+        self.metrics_export = metrics_export
+        self.exported_generation = 0
+        self.export_timer = QTimer(self)
+        self.export_timer.setInterval(30_000)
+        self.export_timer.timeout.connect(lambda: self.export_metrics(background=True))
+        if metrics_export:
+            self.export_timer.start()
+
+        # Per-site lite mode: JavaScript, images, autoplay... switched off by domain
+        self.site_rules = SiteRules(data_path("site_rules.json"), self)
+
+        # Hints (and optionally prerenders) for links the pointer rests on
+        self.speculator = Speculator(web_profile.profile, self.site_rules, hover_delay, prerender,
+                                     content_blocker=web_profile.content_blocker, parent=self)
+
+        # Pages saved for offline reading (Ctrl+Shift+S), deduplicated MHTML in SQLite
+        self.offline_archive = OfflineArchive(data_path("offline"))
+        self.offline_saver = OfflineSaver(self.offline_archive, web_profile.profile, self)
+        self.offline_saver.saved.connect(self.page_saved_offline)
+        self.offline_saver.failed.connect(
+            lambda url: self.active_window().status.showMessage(f"Could not save {url} for offline reading", 5000))
+        web_profile.content_blocker.offline_prefix = QUrl.fromLocalFile(self.offline_archive.view_dir).toString()
+        self.offline_pages = None
+
+        # Downloads, queued under global and per-host limits (Ctrl+J)
+        self.downloads = DownloadManager(web_profile.profile, data_path("downloads.json"), parent=self)
+        self.downloads.progress.connect(self.show_download_progress)
+        self.downloads.changed.connect(lambda: self.show_download_progress(self.downloads.summary()))
+        self.downloads.finished.connect(
+            lambda entry: self.active_window().status.showMessage(f"Downloaded {entry.file_name}", 5000))
+        self.downloads_dialog = None
+
+        # Recently closed tabs for Ctrl+Shift+T
+        self.closed_tabs = ClosedTabStore()
+
+        # Session persistence; restored tabs get a view only when first activated
+        self.tab_views = {}  # tab id -> QWebEngineView, across all windows
+        self.session = SessionStore(data_path("session"), self.collect_session,
+                                    self.serialize_tab, self)
+
+        # Renderer CPU and memory; past the budget, idle tabs are discarded
+        self.sampler = ProcessSampler(self.renderer_pids, memory_budget, parent=self)
+        self.sampler.memory_pressure.connect(self.relieve_memory_pressure)
+        self.task_manager = None
+
+        # JSON-RPC automation endpoint (--automation); None unless started
+        self.automation = None
+
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self.accept_launch)
+
+    def start(self, urls=()):
+        """Restore the last session's windows, then open urls"""
+        windows = self.session.load()
+        for current, entries in windows:
+            self.new_window(session=(current, entries))
+        if not windows:
+            self.new_window(urls)
+        else:
+            self.open_urls(urls)
+
+    def listen(self):
+        """Accept URLs from later launches (see single_instance.forward)"""
+        name = single_instance.server_name()
+        if self.server.listen(name):
+            return True
+        # forward() also gives up on an instance that is still starting; only a
+        # name nobody answers on is left over from a crash
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(500):
+            probe.disconnectFromServer()
+            return False
+        QLocalServer.removeServer(name)
+        return self.server.listen(name)
+
+    def start_automation(self, workers=4):
+        """Serve JSON-RPC automation requests (see automation.py)"""
+        # Imported only here, to keep the automation code off the normal startup path
+        import automation
+        self.automation = automation.AutomationServer(self, workers, self)
+        if not self.automation.listen():
+            self.automation = None
+            return False
+        return True
+
+    def accept_launch(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            conn.readyRead.connect(lambda c=conn: self.read_launch(c))
+            conn.disconnected.connect(conn.deleteLater)
+
+    def read_launch(self, conn):
+        if not conn.canReadLine():
+            return
+        line = bytes(conn.readLine())
+        conn.write(b"1")
+        conn.flush()
+        conn.disconnectFromServer()
+        try:
+            message = json.loads(line)
+            cwd = str(message.get("cwd", ""))
+            urls = [QUrl.fromUserInput(str(u), cwd, QUrl.UserInputResolutionOption.AssumeLocalFile)
+                    for u in message.get("urls", [])]
+        except (ValueError, AttributeError, TypeError):
+            return
+        workers = message.get("automation")
+        if isinstance(workers, int) and workers >= 1:
+            if self.automation is None and not self.start_automation(workers):
+                self.active_window().status.showMessage("Could not start the automation server", 5000)
+            # Asking for automation is not asking for a window
+            if not urls:
+                return
+        # A bare launch opens a new window, like other browsers do
+        if message.get("new_window") or not urls:
+            self.new_window(urls)
+        else:
+            self.open_urls(urls)
+
+    def new_window(self, urls=(), session=None):
+        window = BrowserWindow(self, urls, session)
+        self.windows.append(window)
+        window.show()
+        return window
+
+    def open_urls(self, urls):
+        if not urls:
+            return
+        window = self.active_window()
+        for url in urls:
+            window.add_new_tab(url if isinstance(url, QUrl) else QUrl.fromUserInput(url))
+        if window.isMinimized():
+            window.showNormal()
+        window.raise_()
+        window.activateWindow()
+
+    def active_window(self):
+        window = QApplication.activeWindow()
+        return window if window in self.windows else self.windows[-1]
+
+    def live_tabs(self):
+        """(window, view) for every tab that has a web view"""
+        for window in self.windows:
+            for i in range(window.tabs.count()):
+                widget = window.tabs.widget(i)
+                if isinstance(widget, QWebEngineView):
+                    yield window, widget
+
+    def renderer_pids(self):
+        return {view.page().renderProcessPid() for _, view in self.live_tabs()} - {0}
+
+    def show_task_manager(self):
+        if self.task_manager is None:
+            self.task_manager = TaskManager(self, self.sampler)
+        self.task_manager.show()
+        self.task_manager.raise_()
+        self.task_manager.activateWindow()
+
+    def show_offline_pages(self):
+        if self.offline_pages is None:
+            self.offline_pages = OfflinePages(self.offline_archive)
+            self.offline_pages.open_requested.connect(lambda url: self.active_window().add_new_tab(url))
+        self.offline_pages.show()
+        self.offline_pages.raise_()
+        self.offline_pages.activateWindow()
+
+    def show_downloads(self):
+        if self.downloads_dialog is None:
+            self.downloads_dialog = DownloadsDialog(self.downloads)
+        self.downloads_dialog.show()
+        self.downloads_dialog.raise_()
+        self.downloads_dialog.activateWindow()
+
+    def show_download_progress(self, summary):
+        text = describe(summary)
+        for window in self.windows:
+            window.download_label.setText(text)
+
+    def page_saved_offline(self, url, raw_size, stored_size):
+        self.active_window().status.showMessage(
+            f"Saved for offline reading: {format_size(raw_size)} page, "
+            f"{format_size(stored_size)} new in the archive (Ctrl+Shift+O)", 5000)
+        if self.offline_pages is not None:
+            self.offline_pages.refresh()
+
+    def relieve_memory_pressure(self, total_rss, budget):
+        # Prerenders go first, being only a guess
+        if self.speculator.cancel_all():
+            return
+        # One least recently used tab per window per sample, until back under budget
+        discarded = sum(window.lifecycle.discard_oldest() for window in self.windows)
+        if discarded:
+            self.active_window().status.showMessage(
+                f"Renderers use {total_rss // MB} MB of a {budget // MB} MB budget; "
+                f"discarded {discarded} idle tab{'s' if discarded != 1 else ''}", 5000)
+
+    def window_closed(self, window):
+        if len(self.windows) == 1:
+            # Last window: the session keeps its tabs; shut down the stores
+            self.export_metrics()
+            self.downloads.close()
+            self.session.close()
+            self.history.close()
+            self.page_index.close()
+            self.offline_archive.close()
+            if self.automation is not None:
+                self.automation.close()
+            self.server.close()
+            return
+        # Closing one of several windows drops its tabs from the session
+        for i in range(window.tabs.count()):
+            tab_id = getattr(window.tabs.widget(i), "tab_id", None)
+            self.tab_views.pop(tab_id, None)
+            self.load_metrics.forget(tab_id)
+            self.tab_thumbnails.discard(tab_id)
+        self.windows.remove(window)
+        self.session.schedule()
+
+    def export_metrics(self, background=False):
+        if not self.metrics_export or self.load_metrics.generation == self.exported_generation:
+            return
+        self.exported_generation = self.load_metrics.generation
+        # Snapshot on this thread; the deque must not be read while tabs append to it
+        data = self.load_metrics.export_data(self.metrics_export)
+        if background:
+            self.session.writer.submit(atomic_write, self.metrics_export, data)
+        else:
+            atomic_write(self.metrics_export, data)
+
+    def collect_session(self):
+        return [window.collect_session() for window in self.windows]
+
+    def serialize_tab(self, tab_id):
+        browser = self.tab_views.get(tab_id)
+        if browser is None:
+            return None
+        return serialize_history(browser.page().history())
+
 
 class BrowserWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, browser_app, urls=(), session=None):
         super().__init__()
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
         self.setWindowTitle("Elafrý")
         self.setWindowIcon(QIcon("logo.png"))
         self.resize(1200, 800)
         self.current_theme = "light"
+        # Theme independent, so set once rather than in every stylesheet
+        self.setFont(window_font(self.font()))
 
         # Web engine settings (JavaScript enabled by default in PyQt6)
         # DevTools accessible via right-click context menu
 
+        # Profile, history, page index and session are shared with the other windows
+        self.browser_app = browser_app
+        self.web_profile = browser_app.web_profile
+        self.history = browser_app.history
+        self.page_index = browser_app.page_index
+        self.home_url = browser_app.home_url
+        self.thumbnails = browser_app.thumbnails
+        self.new_tab_page = browser_app.new_tab_page
+        self.closed_tabs = browser_app.closed_tabs
+        self.tab_views = browser_app.tab_views
+        self.session = browser_app.session
+        self.load_metrics = browser_app.load_metrics
+        self.icons = browser_app.icons
+        self.applied_sheets = {}  # widget key -> stylesheet last set on it
+
         # Search Engines
         self.search_engines = {
             "DuckDuckGo": "https://duckduckgo.com/?q=",
@@ -52,16 +401,9 @@ class BrowserWindow(QMainWindow):
         self.navbar.setFloatable(False)
         self.toolbar_layout.addWidget(self.navbar)
 
-        # Lucide SVG Icons
-        self.lucide_icons = {
-            'chevron-left': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="m15 18-6-6 6-6"/></svg>''',
-            'chevron-right': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="m9 18 6-6-6-6"/></svg>''',
-            'rotate-cw': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M21 12a9 9 0 1 1-9-9c2.52 0 4.93 1 6.74 2.74L21 8"/><path d="M21 3v5h-5"/></svg>''',
-            'home': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="m3 9 9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"/><polyline points="9 22 9 12 15 12 15 22"/></svg>''',
-        }
-
         # Navigation Actions with SVG Icons
-        # Store actions for theme updates
+        # Store actions for theme updates (action -> icon name)
+        self.nav_icons = {}
         self.nav_back_action = self.add_nav_action_svg('chevron-left', self.navigate_back, "Back (Alt+Left)")
         self.nav_forward_action = self.add_nav_action_svg('chevron-right', self.navigate_forward, "Forward (Alt+Right)")
         self.nav_reload_action = self.add_nav_action_svg('rotate-cw', self.navigate_reload, "Reload (F5)")
@@ -76,6 +418,8 @@ class BrowserWindow(QMainWindow):
         self.url_bar.setPlaceholderText("🔍 Search or enter URL")
         self.url_bar.returnPressed.connect(self.navigate_to_url)
         self.url_bar.setMinimumWidth(400)
+        self.completer = HistoryCompleter(self.history, self.url_bar)
+        self.completer.activated.connect(lambda text: self.navigate_to_url())
         self.navbar.addWidget(self.url_bar)
 
         # Search Engine Cycle
@@ -84,11 +428,33 @@ class BrowserWindow(QMainWindow):
         self.search_engine_btn.triggered.connect(self.cycle_search_engine)
         self.navbar.addAction(self.search_engine_btn)
 
+        # Lite mode for the current site
+        self.lite_mode_btn = QAction('🪶', self)
+        self.lite_mode_btn.setCheckable(True)
+        self.lite_mode_btn.setToolTip("Lite mode for this site: no JavaScript, images, plugins, autoplay or WebGL")
+        self.lite_mode_btn.triggered.connect(self.toggle_lite_mode)
+        self.navbar.addAction(self.lite_mode_btn)
+        # A bound method, so the connection goes away with the window
+        browser_app.site_rules.changed.connect(self.site_rules_changed)
+
+        # Reader mode for the current page
+        self.reader_btn = QAction('📖', self)
+        self.reader_btn.setCheckable(True)
+        self.reader_btn.setToolTip("Reader mode (F9)")
+        self.reader_btn.triggered.connect(self.toggle_reader_mode)
+        self.navbar.addAction(self.reader_btn)
+
         # Theme Toggle
         self.theme_btn = QAction('◐', self)
         self.theme_btn.setToolTip("Toggle Dark/Light Theme")
         self.theme_btn.triggered.connect(self.toggle_theme)
         self.navbar.addAction(self.theme_btn)
+
+        # Vertical Tabs Toggle
+        self.vertical_tabs_btn = QAction('☰', self)
+        self.vertical_tabs_btn.setToolTip("Toggle Vertical Tabs")
+        self.vertical_tabs_btn.triggered.connect(self.toggle_vertical_tabs)
+        self.navbar.addAction(self.vertical_tabs_btn)
         
         # New Tab Button
         new_tab_btn = QAction('+', self)
@@ -96,88 +462,111 @@ class BrowserWindow(QMainWindow):
         new_tab_btn.triggered.connect(self.add_new_tab)
         self.navbar.addAction(new_tab_btn)
 
-        # Tabs
-        self.tabs = QTabWidget()
+        # Tabs; the model mirrors the content tabs for O(1) lookups by view
+        self.tab_model = TabModel(self)
+        self.tabs = TabWidget(self.tab_model)
         self.tabs.setDocumentMode(True)
         self.tabs.setTabsClosable(True)
         self.tabs.tabCloseRequested.connect(self.close_current_tab)
         self.tabs.currentChanged.connect(self.current_tab_changed)
+        self.tabs.leaving.connect(lambda widget: self.capture_tab_thumbnail(widget, was_visible=True))
         self.tabs.tabBarDoubleClicked.connect(self.tab_open_doubleclick)
-        self.main_layout.addWidget(self.tabs)
+        self.tabs.tabBar().setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.tabs.tabBar().customContextMenuRequested.connect(self.show_tab_context_menu)
+
+        # Optional vertical tab list, sharing the tab model
+        self.tab_panel = TabPanel(self.tab_model)
+        self.tab_panel.clicked.connect(lambda index: self.tabs.setCurrentIndex(index.row()))
+        self.tab_panel.hide()
+
+        self.content_splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.content_splitter.addWidget(self.tab_panel)
+        self.content_splitter.addWidget(self.tabs)
+        self.content_splitter.setStretchFactor(1, 1)
+        self.content_splitter.setSizes([240, 960])
+        self.main_layout.addWidget(self.content_splitter)
+
+        # Grid of tab thumbnails (Ctrl+Shift+A), shown in place of the tabs
+        self.overview = TabOverview(self.tab_model, browser_app.tab_thumbnails)
+        self.overview.tab_chosen.connect(self.choose_overview_tab)
+        self.overview.closed.connect(self.toggle_overview)
+        self.overview.hide()
+        self.main_layout.addWidget(self.overview)
+
+        # Freezes, then discards, tabs left idle in the background
+        self.lifecycle = TabLifecycleManager(self)
 
         # Status Bar
         self.status = QStatusBar()
         self.setStatusBar(self.status)
 
+        # Load time of the current tab's page; details in the tooltip
+        self.perf_label = QLabel()
+        self.status.addPermanentWidget(self.perf_label)
+
+        # Requests blocked on the current tab
+        self.blocked_label = QLabel()
+        self.blocked_label.setToolTip("Ads and trackers blocked on this page")
+        self.status.addPermanentWidget(self.blocked_label)
+
+        # Running downloads of all windows; details with Ctrl+J
+        self.download_label = QLabel(describe(self.browser_app.downloads.summary()))
+        self.download_label.setToolTip("Downloads (Ctrl+J)")
+        self.status.addPermanentWidget(self.download_label)
+
         # Keyboard Shortcuts
         self.shortcut_new_tab = QShortcut(QKeySequence("Ctrl+T"), self)
         self.shortcut_new_tab.activated.connect(self.add_new_tab)
+
+        self.shortcut_new_window = QShortcut(QKeySequence("Ctrl+N"), self)
+        self.shortcut_new_window.activated.connect(lambda: self.browser_app.new_window())
         
         self.shortcut_close_tab = QShortcut(QKeySequence("Ctrl+W"), self)
         self.shortcut_close_tab.activated.connect(lambda: self.close_current_tab(self.tabs.currentIndex()))
 
+        self.shortcut_reopen_tab = QShortcut(QKeySequence("Ctrl+Shift+T"), self)
+        self.shortcut_reopen_tab.activated.connect(self.reopen_closed_tab)
+
         self.shortcut_reload = QShortcut(QKeySequence("F5"), self)
         self.shortcut_reload.activated.connect(self.navigate_reload)
+
+        self.shortcut_reader = QShortcut(QKeySequence("F9"), self)
+        self.shortcut_reader.activated.connect(self.toggle_reader_mode)
         
+        self.shortcut_overview = QShortcut(QKeySequence("Ctrl+Shift+A"), self)
+        self.shortcut_overview.activated.connect(self.toggle_overview)
+
+        self.shortcut_downloads = QShortcut(QKeySequence("Ctrl+J"), self)
+        self.shortcut_downloads.activated.connect(lambda: self.browser_app.show_downloads())
+
+        self.shortcut_save_offline = QShortcut(QKeySequence("Ctrl+Shift+S"), self)
+        self.shortcut_save_offline.activated.connect(self.save_offline)
+        self.shortcut_offline_pages = QShortcut(QKeySequence("Ctrl+Shift+O"), self)
+        self.shortcut_offline_pages.activated.connect(lambda: self.browser_app.show_offline_pages())
+
+        self.shortcut_task_manager = QShortcut(QKeySequence("Shift+Esc"), self)
+        self.shortcut_task_manager.activated.connect(lambda: self.browser_app.show_task_manager())
+
         self.shortcut_devtools = QShortcut(QKeySequence("F12"), self)
         self.shortcut_devtools.activated.connect(lambda: self.tabs.currentWidget().page().triggerAction(QWebEnginePage.WebAction.InspectElement) if self.tabs.count() > 0 and isinstance(self.tabs.currentWidget(), QWebEngineView) else None)
 
         # Initialize
-        self.add_new_tab(QUrl('https://duckduckgo.com'), 'New Tab')
+        if session:
+            self.restore_session(*session)
+        elif not urls:
+            self.add_new_tab(self.home_url, 'New Tab')
+        for url in urls:
+            self.add_new_tab(url if isinstance(url, QUrl) else QUrl.fromUserInput(url))
         self.apply_theme()
         
         # Add the "+" tab
         self.update_plus_tab()
 
-    def create_svg_icon(self, icon_name, color="#000000"):
-        """Create a QIcon by drawing the icon shape"""
-        pixmap = QPixmap(24, 24)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
-        pen = QPen(QColor(color))
-        pen.setWidth(2)
-        pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-        pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
-        painter.setPen(pen)
-        
-        # Draw based on icon name
-        if icon_name == 'chevron-left':
-            # Draw left chevron
-            painter.drawLine(15, 6, 9, 12)
-            painter.drawLine(9, 12, 15, 18)
-        elif icon_name == 'chevron-right':
-            # Draw right chevron
-            painter.drawLine(9, 6, 15, 12)
-            painter.drawLine(15, 12, 9, 18)
-        elif icon_name == 'rotate-cw':
-            # Draw reload/refresh icon
-            painter.drawArc(4, 4, 16, 16, 90 * 16, 270 * 16)
-            # Arrow head
-            painter.drawLine(20, 4, 20, 9)
-            painter.drawLine(20, 4, 15, 4)
-        elif icon_name == 'home':
-            # Draw home icon
-            painter.drawLine(12, 5, 4, 11)
-            painter.drawLine(12, 5, 20, 11)
-            painter.drawLine(4, 11, 4, 20)
-            painter.drawLine(20, 11, 20, 20)
-            painter.drawLine(4, 20, 20, 20)
-            painter.drawLine(9, 14, 9, 20)
-            painter.drawLine(15, 14, 15, 20)
-            painter.drawLine(9, 14, 15, 14)
-        
-        painter.end()
-        return QIcon(pixmap)
-
     def add_nav_action_svg(self, icon_name, slot, tooltip):
-        """Add a navigation action with a drawn icon"""
-        color = "#1F2937" if self.current_theme == "light" else "#FFFFFF"
-        icon = self.create_svg_icon(icon_name, color)
+        """Add a navigation action with a Lucide icon"""
         action = QAction(self)
-        action.setIcon(icon)
+        action.setIcon(self.icons.icon(icon_name, icon_color(self.current_theme), self.devicePixelRatioF()))
+        self.nav_icons[action] = icon_name
         action.setToolTip(tooltip)
         action.triggered.connect(slot)
         self.navbar.addAction(action)
@@ -195,11 +584,11 @@ class BrowserWindow(QMainWindow):
         action.triggered.connect(slot)
         self.sidebar.addAction(action)
 
-    def add_new_tab(self, qurl=None, label="New Tab"):
+    def add_new_tab(self, qurl=None, label="New Tab", history=None):
         if not isinstance(qurl, QUrl):
-             qurl = QUrl('https://duckduckgo.com')
+             qurl = self.home_url
 
-        browser = self.create_browser(qurl)
+        browser = self.create_browser(qurl, history)
 
         # Insert before the "+" tab if it exists
         count = self.tabs.count()
@@ -211,15 +600,278 @@ class BrowserWindow(QMainWindow):
         browser.setFocus()
         return browser
 
-    def create_browser(self, qurl):
+    def create_browser(self, qurl, history=None, tab_id=None):
+        startup_trace.begin("first QWebEngineView")
         browser = QWebEngineView()
-        browser.setUrl(qurl)
+        browser.setPage(self.browser_app.speculator.new_page(browser))
+        startup_trace.end("first QWebEngineView")
+        browser.tab_id = tab_id or uuid.uuid4().hex
+        self.tab_views[browser.tab_id] = browser
+        if history:
+            restore_history(browser.page().history(), history)
+        else:
+            browser.setUrl(qurl)
         browser.urlChanged.connect(lambda q, b=browser: self.update_url_bar(q, b))
         browser.titleChanged.connect(lambda t, b=browser: self.update_tab_title(b, t))
-        browser.page().linkHovered.connect(lambda l: self.status.showMessage(l))
+        browser.urlChanged.connect(self.history.record_visit)
+        browser.titleChanged.connect(lambda t, b=browser: self.history.set_title(b.url(), t))
+        browser.urlChanged.connect(lambda q, b=browser: self.session.tab_changed(b.tab_id))
+        browser.titleChanged.connect(lambda t, b=browser: self.session.tab_changed(b.tab_id))
+        browser.loadStarted.connect(lambda b=browser: self.load_metrics.started(b.tab_id))
+        browser.loadProgress.connect(lambda p, b=browser: self.load_metrics.progress(b.tab_id, p))
+        browser.loadFinished.connect(lambda ok, b=browser: self.page_loaded(b, ok))
+        self.connect_page(browser)
+        self.lifecycle.register(browser)
         return browser
 
+    def connect_page(self, browser):
+        """Connect the signals of the view's current page, which a prerender may replace"""
+        page = browser.page()
+        speculator = self.browser_app.speculator
+        page.linkHovered.connect(lambda l: self.status.showMessage(l))
+        page.linkHovered.connect(lambda l, p=page: speculator.hovered(p, l))
+        page.prerender_taken.connect(
+            lambda prerendered, b=browser: QTimer.singleShot(0, lambda: self.swap_page(b, prerendered)))
+        page.lifecycleStateChanged.connect(lambda s, b=browser: self.tab_model.refresh(b))
+        page.renderProcessTerminated.connect(
+            lambda status, code, b=browser: self.render_process_terminated(b, status))
+
+    def swap_page(self, browser, page):
+        """Show a prerendered page in place of the tab's own, keeping the old history for Back"""
+        if sip.isdeleted(browser) or sip.isdeleted(page):
+            return
+        old = browser.page()
+        self.browser_app.speculator.forget(old)
+        # The prerender only has its own entry. Restoring the old history now would reload
+        # the old page; navigate_back restores it once the new page has no entry to go back to
+        if old.history().count():
+            browser.grafted_history = getattr(browser, "grafted_history", []) + \
+                [serialize_history(old.history())]
+        page.setParent(browser)
+        browser.setPage(page)  # Emits urlChanged and titleChanged for the new page
+        self.connect_page(browser)
+        if not sip.isdeleted(old):
+            old.deleteLater()
+        self.status.clearMessage()
+        self.page_loaded(browser, True)
+
+    def page_loaded(self, browser, ok):
+        if not startup_trace.is_done("first loadFinished"):
+            startup_trace.mark("first loadFinished")
+            if startup_trace.enabled:
+                # Without a paint entry the first paint falls back to now
+                browser.page().runJavaScript(PAINT_TIME_JS, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                             self.startup_painted)
+        if is_internal(browser.url()):
+            self.load_metrics.cancel(browser.tab_id)
+        else:
+            url = browser.url()
+            record = self.load_metrics.finished(browser.tab_id, url.toString(), url.host(), ok)
+            if record is not None and ok:
+                browser.page().runJavaScript(PAGE_TIMING_JS, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                             lambda result, b=browser, r=record: self.timing_received(b, r, result))
+        if browser is self.tabs.currentWidget():
+            self.update_blocked_count(browser)
+            self.update_perf_label(browser)
+        if not ok or is_internal(browser.url()):
+            return
+        self.web_profile.record_load(browser.page())
+        # Index the page text once the page has settled, off the critical path
+        QTimer.singleShot(2000, lambda: self.index_page_text(browser))
+        # Give the page a moment to paint before taking its thumbnail
+        QTimer.singleShot(800, lambda: self.capture_thumbnail(browser))
 
+    def startup_painted(self, painted_ms):
+        startup_trace.mark("first paint", painted_ms / 1000 if painted_ms else None)
+        startup_trace.write_report()
+        self.status.showMessage(f"Startup trace written to {startup_trace.report_path}", 5000)
+        if startup_trace.quit_after:
+            QApplication.quit()
+
+    def timing_received(self, browser, record, result):
+        self.load_metrics.add_timing(record, result)
+        if not sip.isdeleted(browser) and browser is self.tabs.currentWidget():
+            self.update_perf_label(browser)
+
+    def update_perf_label(self, browser):
+        record = self.load_metrics.last.get(browser.tab_id)
+        if record is None or is_internal(browser.url()):
+            self.perf_label.setText("")
+            self.perf_label.setToolTip("")
+            return
+        self.perf_label.setText(f"⏱ {record.load_ms / 1000:.2f} s" if record.ok else "⏱ failed")
+        timing = record.timing
+        lines = [f"Load: {record.load_ms:.0f} ms"]
+        for label, key in (("Time to first byte", "ttfb"), ("First contentful paint", "first_contentful_paint"),
+                           ("DOMContentLoaded", "dom_content_loaded"), ("Load event", "load_event")):
+            if record.value(key) is not None:
+                lines.append(f"{label}: {record.value(key):.0f} ms")
+        if timing:
+            kb = ((timing.get("document_bytes") or 0) + (timing.get("resource_bytes") or 0)) / 1024
+            lines.append(f"{timing.get('resources', 0)} requests, {kb:.0f} KB")
+        lines.append("Details: elafry://perf")
+        self.perf_label.setToolTip("\n".join(lines))
+
+    def update_blocked_count(self, browser):
+        count = self.web_profile.content_blocker.blocked_count(browser.page())
+        self.blocked_label.setText(f"🛡 {count}" if count else "")
+
+    def index_page_text(self, browser):
+        if sip.isdeleted(browser) or browser.url().scheme() not in ("http", "https"):
+            return
+        url, title = browser.url().toString(), browser.title()
+        browser.page().runJavaScript(self.page_index.extract_script(),
+                                     QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                     lambda text: self.page_index.add_page(url, title, text))
+
+    def save_offline(self):
+        browser = self.tabs.currentWidget()
+        if not isinstance(browser, QWebEngineView) or browser.url().scheme() not in ("http", "https"):
+            self.status.showMessage("Only web pages can be saved for offline reading", 3000)
+            return
+        self.browser_app.offline_saver.save(browser.page(), self.page_index.extract_script())
+        self.status.showMessage(f"Saving {browser.title() or browser.url().toString()}…", 3000)
+
+    def render_search(self, url):
+        # parse_qs also decodes the "+" used for spaces by form submissions
+        params = parse_qs(url.query(QUrl.ComponentFormattingOption.FullyEncoded))
+        query = params.get("q", [""])[0]
+        results = self.page_index.search(query) if query.strip() else []
+        return "text/html", render_search_page(self.theme_palette(), query, results)
+
+    def render_perf(self, url):
+        records = list(reversed(self.load_metrics.records))[:200]
+        return "text/html", render_perf_page(self.theme_palette(), self.load_metrics.summary(),
+                                             records, self.browser_app.metrics_export,
+                                             self.browser_app.speculator.summary())
+
+    def render_reader(self, url):
+        body = render_reader_page(self.theme_palette(), self.browser_app.reader.get(url), url)
+        return ("text/html", body) if body is not None else None
+
+    def capture_thumbnail(self, browser):
+        if sip.isdeleted(browser) or browser is not self.tabs.currentWidget():
+            return
+        pixmap = self.capture_tab_thumbnail(browser)
+        # Only top sites get new tab page thumbnails, so busy pages don't evict them
+        host = browser.url().host().removeprefix("www.")
+        if pixmap is not None and any(host == site for site, _, _ in self.new_tab_page.top_sites()):
+            self.thumbnails.put(host, pixmap)
+
+    def capture_tab_thumbnail(self, widget, was_visible=False):
+        """Grab a visible (or just hidden) tab for the overview; others keep their last thumbnail"""
+        # Background tabs may be frozen, and grabbing them would wake the renderer
+        if not isinstance(widget, QWebEngineView) or not (was_visible or widget.isVisible()) or \
+                widget.page().lifecycleState() != QWebEnginePage.LifecycleState.Active:
+            return None
+        pixmap = widget.grab()
+        self.browser_app.tab_thumbnails.put(widget.tab_id, pixmap)
+        return pixmap
+
+    def toggle_overview(self):
+        if self.overview.isVisible():
+            self.overview.hide()
+            self.content_splitter.show()
+            if isinstance(self.active_browser(), QWebEngineView):
+                self.active_browser().setFocus()
+            return
+        self.capture_tab_thumbnail(self.active_browser())
+        self.content_splitter.hide()
+        self.overview.open(self.tabs.currentIndex())
+
+    def choose_overview_tab(self, row):
+        self.toggle_overview()
+        self.tabs.setCurrentIndex(row)
+
+    def render_new_tab(self, url):
+        html = self.new_tab_page.render(self.theme_palette(), self.search_engines,
+                                        self.current_search_engine)
+        return "text/html", html
+
+    def destroy_browser(self, browser):
+        """Delete a closed tab's view and page so its renderer process exits"""
+        self.lifecycle.unregister(browser)
+        self.tab_views.pop(browser.tab_id, None)
+        self.load_metrics.forget(browser.tab_id)
+        browser.stop()
+        page = browser.page()
+        self.browser_app.speculator.forget(page)
+        # Deleting the view drops its signal connections (and the lambdas holding it)
+        page.deleteLater()
+        browser.deleteLater()
+
+    def restore_session(self, current, entries):
+        """Recreate saved tabs; only the current one gets a web view now"""
+        self.tabs.blockSignals(True)
+        for n, (tab_id, title, url) in enumerate(entries):
+            if n == current:
+                widget = self.create_browser(QUrl(url), self.session.load_history(tab_id), tab_id)
+            else:
+                widget = TabPlaceholder(tab_id, title, url)
+            self.tabs.addTab(widget, self.tab_label(title or "New Tab"))
+        self.tabs.setCurrentIndex(current)
+        self.tabs.blockSignals(False)
+        self.current_tab_changed(current)
+
+    def render_process_terminated(self, browser, status):
+        """Swap a tab whose renderer died for a placeholder with a Reload button"""
+        Status = QWebEnginePage.RenderProcessTerminationStatus
+        if status == Status.NormalTerminationStatus or self.tab_views.get(browser.tab_id) is not browser:
+            return
+        i = self.tab_model.row(browser)
+        if i < 0:
+            return
+        message = {
+            Status.CrashedTerminationStatus: "This tab crashed.",
+            Status.KilledTerminationStatus: "This tab's process was ended.",
+        }.get(status, "This tab stopped unexpectedly.")
+        # History lives in the browser process, so it survives the renderer
+        placeholder = TabPlaceholder(browser.tab_id, browser.title(), browser.url().toString(),
+                                     message, serialize_history(browser.page().history()))
+        placeholder.reload_requested.connect(
+            lambda p=placeholder: self.load_placeholder(self.tabs.indexOf(p), p))
+        label = self.tabs.tabText(i)
+        current = self.tabs.currentIndex() == i
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(i)
+        self.tabs.insertTab(i, placeholder, label)
+        if current:
+            self.tabs.setCurrentIndex(i)
+        self.tabs.blockSignals(False)
+        self.tab_model.set_title(placeholder, placeholder.title)
+        self.destroy_browser(browser)
+
+    def load_placeholder(self, i, placeholder):
+        """Replace a restored (or crashed) placeholder with a real web view"""
+        history = placeholder.history or self.session.load_history(placeholder.tab_id)
+        browser = self.create_browser(QUrl(placeholder.url), history, placeholder.tab_id)
+        label = self.tabs.tabText(i)
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(i)
+        self.tabs.insertTab(i, browser, label)
+        self.tabs.setCurrentIndex(i)
+        self.tabs.blockSignals(False)
+        self.tab_model.set_title(browser, placeholder.title)
+        placeholder.deleteLater()
+        self.current_tab_changed(i)
+
+    def collect_session(self):
+        current, entries = 0, []
+        for i in range(self.tabs.count()):
+            widget = self.tabs.widget(i)
+            if isinstance(widget, TabPlaceholder):
+                entries.append((widget.tab_id, widget.title, widget.url))
+            elif isinstance(widget, QWebEngineView):
+                entries.append((widget.tab_id, widget.title(), widget.url().toString()))
+            else:
+                continue
+            if i == self.tabs.currentIndex():
+                current = len(entries) - 1
+        return current, entries
+
+    def closeEvent(self, event):
+        self.browser_app.window_closed(self)
+        super().closeEvent(event)
 
     def update_plus_tab(self):
         # Check if last tab is +, if not add it
@@ -238,9 +890,20 @@ class BrowserWindow(QMainWindow):
             self.add_new_tab()
             return
 
+        self.session.schedule()
+        if i < self.tab_model.rowCount():
+            self.tab_panel.setCurrentIndex(self.tab_model.index(i))
+
         # Update URL bar
         browser = self.tabs.widget(i)
-        if isinstance(browser, QWebEngineView):
+        if isinstance(browser, TabPlaceholder):
+            # Crashed tabs wait for their Reload button instead of crashing again
+            if not browser.crashed:
+                self.load_placeholder(i, browser)
+        elif isinstance(browser, QWebEngineView):
+            self.lifecycle.activate(browser)
+            self.update_blocked_count(browser)
+            self.update_perf_label(browser)
             self.update_url_bar(browser.url(), browser)
             self.update_title(browser)
 
@@ -253,32 +916,73 @@ class BrowserWindow(QMainWindow):
              # Let's simple check:
              pass
 
+        browser = self.tabs.widget(i)
         self.tabs.removeTab(i)
+        self.browser_app.tab_thumbnails.discard(getattr(browser, "tab_id", None))
+        if isinstance(browser, QWebEngineView):
+            self.closed_tabs.push(browser.title(), browser.url().toString(),
+                                  serialize_history(browser.page().history()))
+            self.destroy_browser(browser)
+        elif isinstance(browser, TabPlaceholder):
+            history = browser.history or self.session.load_history(browser.tab_id)
+            if history:
+                self.closed_tabs.push(browser.title, browser.url, history)
+            browser.deleteLater()
+        self.session.schedule()
         
         # If we removed the last content tab and only + remains
         if self.tabs.count() == 1 and self.tabs.tabText(0) == "+":
              self.add_new_tab() # Keep at least one tab open
 
+    def reopen_closed_tab(self):
+        entry = self.closed_tabs.pop()
+        if entry is None:
+            return
+        title, url, history = entry
+        self.add_new_tab(QUrl(url), title or "New Tab", history)
+
     def tab_open_doubleclick(self, i):
         if i == -1:
             self.add_new_tab()
 
+    def show_tab_context_menu(self, pos):
+        i = self.tabs.tabBar().tabAt(pos)
+        browser = self.tabs.widget(i)
+        if not isinstance(browser, QWebEngineView):
+            return
+        menu = QMenu(self)
+        pinned = self.lifecycle.is_pinned(browser)
+        pin_action = menu.addAction("Unpin Tab" if pinned else "Pin Tab")
+        pin_action.triggered.connect(lambda: self.lifecycle.set_pinned(browser, not pinned))
+        close_action = menu.addAction("Close Tab")
+        close_action.triggered.connect(lambda: self.close_current_tab(self.tabs.indexOf(browser)))
+        menu.exec(self.tabs.tabBar().mapToGlobal(pos))
+
     def update_tab_title(self, browser, title):
-        # Find which tab contains this browser
-        for i in range(self.tabs.count()):
-            widget = self.tabs.widget(i)
-            if widget == browser:
-                short_title = (title[:15] + '..') if len(title) > 15 else title
-                self.tabs.setTabText(i, short_title)
-                if i == self.tabs.currentIndex():
-                    self.setWindowTitle(f"{title} - Elafrý")
-                return
+        i = self.tab_model.row(browser)
+        if i < 0:
+            return
+        self.tabs.setTabText(i, self.tab_label(title))
+        self.tab_model.set_title(browser, title)
+        if i == self.tabs.currentIndex():
+            self.setWindowTitle(f"{title} - Elafrý")
+
+    def tab_label(self, title):
+        return (title[:15] + '..') if len(title) > 15 else title
 
     def update_title(self, browser):
         self.setWindowTitle(f"{browser.title()} - Elafrý")
 
     def navigate_back(self):
-        self.active_browser().back()
+        browser = self.active_browser()
+        if not isinstance(browser, QWebEngineView):
+            return
+        grafted = getattr(browser, "grafted_history", None)
+        if grafted and not browser.history().canGoBack():
+            # Back past a swapped-in prerender: the tab's history from before the swap
+            restore_history(browser.page().history(), grafted.pop())
+            return
+        browser.back()
 
     def navigate_forward(self):
         self.active_browser().forward()
@@ -287,7 +991,7 @@ class BrowserWindow(QMainWindow):
         self.active_browser().reload()
 
     def navigate_home(self):
-        self.active_browser().setUrl(QUrl("https://duckduckgo.com"))
+        self.active_browser().setUrl(self.home_url)
 
     def active_browser(self):
         return self.tabs.currentWidget()
@@ -295,6 +999,14 @@ class BrowserWindow(QMainWindow):
     def navigate_to_url(self):
         text = self.url_bar.text()
         if not text: return
+        if text.startswith("??"):
+            # Search the text of previously visited pages
+            q = QUrl("elafry://search")
+            query = QUrlQuery()
+            query.addQueryItem("q", text[2:].strip())
+            q.setQuery(query)
+            self.active_browser().setUrl(q)
+            return
         q = QUrl(text)
         if q.scheme() == "" and "." in text:
              q.setScheme("http")
@@ -306,8 +1018,67 @@ class BrowserWindow(QMainWindow):
     def update_url_bar(self, q, browser):
         # Update only if it's the current tab's browser
         if self.tabs.currentWidget() == browser:
-            self.url_bar.setText(q.toString())
+            # Leave the URL bar empty on the new tab page, ready for typing
+            self.url_bar.setText("" if q == QUrl(NEW_TAB_URL) else q.toString())
             self.url_bar.setCursorPosition(0)
+            self.update_lite_mode(browser)
+            self.update_reader_mode(browser)
+
+    def site_rules_changed(self):
+        self.update_lite_mode(self.active_browser())
+
+    def update_lite_mode(self, browser):
+        host = browser.url().host() if isinstance(browser, QWebEngineView) else ""
+        self.lite_mode_btn.setEnabled(bool(host))
+        self.lite_mode_btn.setChecked(bool(host) and bool(self.browser_app.site_rules.covering(host)))
+
+    def toggle_lite_mode(self, checked):
+        browser = self.active_browser()
+        if not isinstance(browser, QWebEngineView):
+            return
+        host = browser.url().host()
+        site_rules = self.browser_app.site_rules
+        if checked:
+            site_rules.set_rule(rule_domain(host), LITE_MODE)
+        else:
+            site_rules.remove(site_rules.covering(host))
+        # The page's settings only reach the renderer with the next document
+        browser.page().apply_rules(host)
+        browser.reload()
+
+    def update_reader_mode(self, browser):
+        url = browser.url() if isinstance(browser, QWebEngineView) else QUrl()
+        self.reader_btn.setEnabled(url.scheme() in ("http", "https") or is_reader(url))
+        self.reader_btn.setChecked(is_reader(url))
+
+    def toggle_reader_mode(self):
+        browser = self.active_browser()
+        if not isinstance(browser, QWebEngineView):
+            return
+        url = browser.url()
+        if is_reader(url):
+            # Back to the original, from the back/forward cache when it kept the page
+            original = original_url(url)
+            history = browser.history()
+            if history.canGoBack() and history.backItem().url() == original:
+                browser.back()
+            else:
+                browser.setUrl(original)
+        elif url.scheme() in ("http", "https"):
+            browser.page().runJavaScript(EXTRACT_CALL, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                         lambda result: self.show_reader(browser, url, result))
+        self.update_reader_mode(browser)
+
+    def show_reader(self, browser, url, result):
+        if sip.isdeleted(browser) or browser.url() != url:
+            return
+        reader_url = self.browser_app.reader.add(result)
+        if reader_url is None:
+            self.status.showMessage("No article found on this page", 3000)
+            self.update_reader_mode(browser)
+            return
+        # Navigating away lets the original page's renderer go, or be frozen for Back
+        browser.setUrl(reader_url)
 
     def cycle_search_engine(self):
         engines = list(self.search_engines.keys())
@@ -315,186 +1086,101 @@ class BrowserWindow(QMainWindow):
         self.current_search_engine = engines[(idx + 1) % len(engines)]
         self.search_engine_btn.setText(f"🔎 {self.current_search_engine}")
 
+    def toggle_vertical_tabs(self):
+        vertical = not self.tab_panel.isVisible()
+        self.tab_panel.setVisible(vertical)
+        self.tabs.tabBar().setVisible(not vertical)
+
     def toggle_theme(self):
         self.current_theme = "dark" if self.current_theme == "light" else "light"
         self.apply_theme()
 
+    def theme_palette(self):
+        return PALETTES[self.current_theme]
+
+    def themed_widgets(self):
+        """Widgets with their own stylesheet, by theme.STYLESHEETS key"""
+        return {"navbar": self.navbar, "tabs": self.tabs, "tab_bar": self.tabs.tabBar(),
+                "tab_panel": self.tab_panel, "overview": self.overview, "status": self.status}
+
     def apply_theme(self):
-        # Refresh navigation icons with new theme colors
-        color = "#1F2937" if self.current_theme == "light" else "#FFFFFF"
-        
-        # Update navigation action icons
-        if hasattr(self, 'nav_back_action'):
-            self.nav_back_action.setIcon(self.create_svg_icon('chevron-left', color))
-            self.nav_forward_action.setIcon(self.create_svg_icon('chevron-right', color))
-            self.nav_reload_action.setIcon(self.create_svg_icon('rotate-cw', color))
-            self.nav_home_action.setIcon(self.create_svg_icon('home', color))
-        
-        # Modern Glassmorphism-inspired Palette
-        if self.current_theme == "dark":
-            bg = "#1E1E1E" # Deep Gray
-            fg = "#FFFFFF"
-            glass_bg = "#2D2D2D" # Slightly lighter
-            accent = "#61AFEF" # OneDark Blue
-            border = "#3e4451"
-            hover_bg = "#3a3f4b"
-        else:
-            bg = "#F3F4F6"
-            fg = "#1F2937"
-            glass_bg = "#FFFFFF"
-            accent = "#0F62FE" # Enterprise Blue
-            border = "#D1D5DB"
-            hover_bg = "#E5E7EB"
-
-        style = f"""
-        QMainWindow {{ 
-            background-color: {bg}; 
-            color: {fg}; 
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-        }}
-        
-        /* Navigation Bar */
-        QToolBar {{
-            background: {glass_bg};
-            border: none;
-            border-bottom: 1px solid {border};
-            padding: 4px 8px;
-            spacing: 4px;
-        }}
-        
-        QToolBar QToolButton {{
-            background: transparent;
-            border: none;
-            border-radius: 12px;
-            padding: 6px;
-            color: {fg};
-            min-width: 32px;
-            min-height: 32px;
-            max-width: 32px;
-            max-height: 32px;
-        }}
-        
-        QToolBar QToolButton:hover {{
-            background: {hover_bg};
-        }}
-        
-        QToolBar QToolButton:pressed {{
-            background: {accent}33;
-        }}
-        
-        QToolBar::separator {{
-            background: {border};
-            width: 1px;
-            margin: 6px 8px;
-        }}
-        
-        /* URL Bar */
-        QLineEdit {{
-            background-color: {bg};
-            color: {fg};
-            border: 2px solid {border};
-            border-radius: 20px;
-            padding: 8px 16px;
-            font-size: 14px;
-            selection-background-color: {accent};
-        }}
-        
-        QLineEdit:focus {{
-            border: 2px solid {accent};
-            background-color: {glass_bg};
-        }}
-        
-        /* Tabs */
-        QTabWidget::pane {{ 
-            border: none; 
-            background: {glass_bg}; 
-        }}
-        
-        QTabBar::tab {{
-            background: {bg};
-            color: {fg};
-            padding: 10px 24px;
-            border-top-left-radius: 10px;
-            border-top-right-radius: 10px;
-            border: none;
-            margin-right: 2px;
-            min-width: 120px;
-            max-width: 200px;
-        }}
-        
-        QTabBar::tab:selected {{
-            background: {glass_bg};
-            border-bottom: 3px solid {accent};
-            font-weight: 600;
-        }}
-        
-        QTabBar::tab:hover:!selected {{
-            background: {hover_bg};
-        }}
-        
-        /* Vertical Tabs Style overrides */
-        QTabBar::tab:left {{
-            padding: 12px 16px;
-            border-top-left-radius: 10px;
-            border-bottom-left-radius: 10px;
-            border-top-right-radius: 0px;
-            border-bottom-right-radius: 0px;
-            margin-bottom: 2px;
-            min-height: 48px;
-        }}
-        
-        QTabBar::tab:left:selected {{
-            border-bottom: none;
-            border-right: 3px solid {accent};
-        }}
-        
-        /* Status Bar */
-        QStatusBar {{
-            background: {glass_bg};
-            color: {fg};
-            border-top: 1px solid {border};
-        }}
-        
-        /* Scrollbars (Modern Slim) */
-        QScrollBar:vertical {{
-            border: none;
-            background: {bg};
-            width: 8px;
-            margin: 0px;
-        }}
-        
-        QScrollBar::handle:vertical {{
-            background: {border};
-            min-height: 20px;
-            border-radius: 4px;
-        }}
-        
-        QScrollBar::handle:vertical:hover {{
-            background: {accent};
-        }}
-        
-        QScrollBar:horizontal {{
-            border: none;
-            background: {bg};
-            height: 8px;
-            margin: 0px;
-        }}
-        
-        QScrollBar::handle:horizontal {{
-            background: {border};
-            min-width: 20px;
-            border-radius: 4px;
-        }}
-        
-        QScrollBar::handle:horizontal:hover {{
-            background: {accent};
-        }}
-        """
-        self.setStyleSheet(style)
+        # Only the toolbar, tab widget, tab bar, tab panel and status bar have stylesheets.
+        # The tab widget's sheet holds just the pane rule. A sheet on the window would
+        # re-polish every widget below it, web views and dialogs included
+        sheets = stylesheets(self.current_theme)
+        for key, widget in self.themed_widgets().items():
+            if self.applied_sheets.get(key) != sheets[key]:
+                widget.setStyleSheet(sheets[key])
+                self.applied_sheets[key] = sheets[key]
+        self.setPalette(qpalette(self.current_theme))
+
+        color, dpr = icon_color(self.current_theme), self.devicePixelRatioF()
+        for action, name in self.nav_icons.items():
+            action.setIcon(self.icons.icon(name, color, dpr))
+
 
 if __name__ == "__main__":
+    bench_options = None
+    if "--bench" in sys.argv:
+        # Imported only here, to keep http.server off the normal startup path
+        import bench
+        bench_options = bench.parse_options(sys.argv[1:])
+    if bench_options:
+        # Headless, with a throwaway profile unless ELAFRY_DATA_DIR says otherwise
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        if "ELAFRY_DATA_DIR" not in os.environ:
+            import tempfile
+            os.environ["ELAFRY_DATA_DIR"] = tempfile.mkdtemp(prefix="elafry-bench-")
+        if bench_options.bench_sites:
+            sys.argv.append(bench.resolver_rules_argument())
+    # Set before data_path() is first used, which depends on it
+    QApplication.setApplicationName("Elafrý")
+    # Process model and Chromium flags have to be in place before QApplication
+    engine = engine_config.load(data_path("engine.json"), sys.argv[1:])
+    engine.apply_environment()
+    register_scheme()
+    startup_trace.begin("QApplication")
     app = QApplication(sys.argv)
-    app.setApplicationName("Elafrý")
-    window = BrowserWindow()
-    window.show()
+    startup_trace.end("QApplication")
+    startup_trace.begin("WebProfile")
+    web_profile = WebProfile(data_path("profile"), cache_path=engine.cache_dir,
+                             cache_size=engine.cache_size_mb * MB, memory_only=engine.memory_cache, parent=app)
+    engine.apply_settings(web_profile.profile.settings())
+    startup_trace.end("WebProfile")
+    engine_report = engine.report()
+    try:
+        os.makedirs(data_path(), exist_ok=True)
+        atomic_write(data_path("engine-report.txt"), (engine_report + "\n").encode())
+    except OSError:
+        pass
+    if "--engine-report" in sys.argv:
+        print(engine_report, file=sys.stderr)
+    metrics_export = next((arg.split("=", 1)[1] for arg in sys.argv[1:]
+                           if arg.startswith("--metrics-export=")), None)
+    hover_delay = 200
+    for arg in sys.argv[1:]:
+        if arg.startswith("--hover-delay="):
+            try:
+                hover_delay = int(arg.split("=", 1)[1])
+            except ValueError as e:
+                print(f"Ignoring {arg}: {e}", file=sys.stderr)
+    browser_app = BrowserApp(web_profile, metrics_export=metrics_export,
+                             prerender="--prerender" in sys.argv, hover_delay=hover_delay, parent=app)
+    if bench_options:
+        sys.exit(bench.run(app, browser_app, bench_options))
+    if "--new-instance" not in sys.argv and not browser_app.listen():
+        # Another instance owns the socket but was too busy starting to answer; give it longer
+        if single_instance.forward(sys.argv[1:], timeout=10.0):
+            sys.exit(0)
+        print("elafry: another instance is running but not answering; starting a separate one",
+              file=sys.stderr)
+    # Served by this instance, for its own tabs; later launches ask it over the launch socket
+    automation_workers = single_instance.automation_workers(sys.argv[1:])
+    if automation_workers and not browser_app.start_automation(automation_workers):
+        sys.exit("elafry: could not start the automation server")
+    # Qt removes its own options from arguments(); what is left besides our flags are URLs
+    urls = [arg for arg in app.arguments()[1:] if not arg.startswith("-")]
+    startup_trace.begin("BrowserWindow.__init__")
+    browser_app.start(urls)
+    startup_trace.end("BrowserWindow.__init__")
     sys.exit(app.exec())
@@ -37,6 +37,8 @@ def build():
         '--hidden-import=PyQt6.QtWidgets',
         '--hidden-import=PyQt6.QtWebEngineWidgets',
         '--hidden-import=PyQt6.QtWebEngineCore',
+        '--hidden-import=PyQt6.QtNetwork',
+        '--hidden-import=PyQt6.QtSvg',
         
         # Exclude unnecessary standard library modules to save space
         '--exclude-module=tkinter',
@@ -44,8 +46,6 @@ def build():
         '--exclude-module=numpy',
         '--exclude-module=pandas',
         '--exclude-module=unittest',
-        '--exclude-module=email',
-        '--exclude-module=http',
         '--exclude-module=xml',
         '--exclude-module=pydoc',
     ]
@@ -0,0 +1,108 @@
+import glob
+import os
+import threading
+from PyQt6.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+from filters import FilterMatcher, load_filter_lists
+
+_RT = QWebEngineUrlRequestInfo.ResourceType
+RESOURCE_TYPE_NAMES = {
+    "ResourceTypeMainFrame": "document",
+    "ResourceTypeSubFrame": "subdocument",
+    "ResourceTypeStylesheet": "stylesheet",
+    "ResourceTypeScript": "script",
+    "ResourceTypeImage": "image",
+    "ResourceTypeFontResource": "font",
+    "ResourceTypeObject": "object",
+    "ResourceTypePluginResource": "object",
+    "ResourceTypeMedia": "media",
+    "ResourceTypeXhr": "xmlhttprequest",
+    "ResourceTypeJson": "xmlhttprequest",
+    "ResourceTypePing": "ping",
+    "ResourceTypeCspReport": "ping",
+    "ResourceTypeWebSocket": "websocket",
+}
+# Only map the enum members this Qt version has
+RESOURCE_TYPES = {getattr(_RT, name): kind for name, kind in RESOURCE_TYPE_NAMES.items()
+                  if hasattr(_RT, name)}
+
+NETWORK_SCHEMES = {"http", "https", "ws", "wss"}
+
+
+class ContentBlocker(QWebEngineUrlRequestInterceptor):
+    """Ad and tracker blocking shared by every page
+
+    Tab pages each get a PageBlocker (see attach) that applies these decisions
+    and counts what it blocked: a page's interceptor only sees that page's
+    requests, which a profile-wide one cannot tell apart. Installed on a page
+    directly, the blocker blocks without counting.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enabled = True
+        # Empty until the filter lists have been loaded in the background
+        self.matcher = FilterMatcher()
+        self.total_blocked = 0
+        # file: URL prefix of saved offline pages; whatever they request from the network is blocked
+        self.offline_prefix = None
+
+    def load_lists(self, directory):
+        """Load every *.txt filter list in directory without blocking the UI thread"""
+        paths = sorted(glob.glob(os.path.join(directory, "*.txt")))
+        if not paths:
+            return
+        cache_path = os.path.join(directory, "compiled.cache")
+
+        def load():
+            # Swapping the attribute is atomic, so requests never see a half-built matcher
+            self.matcher = load_filter_lists(paths, cache_path)
+
+        threading.Thread(target=load, daemon=True).start()
+
+    def attach(self, page):
+        """Block page's requests and count them for page (see blocked_count)"""
+        page.request_blocker = PageBlocker(self, page)
+        page.setUrlRequestInterceptor(page.request_blocker)
+
+    def interceptRequest(self, info):
+        self.intercept(info)
+
+    def intercept(self, info):
+        """Block the request if it should be; True if the filter lists blocked it"""
+        resource_type = RESOURCE_TYPES.get(info.resourceType(), "other")
+        if resource_type == "document":
+            return False  # Never block top-level navigations
+        url = info.requestUrl()
+        first_party = info.firstPartyUrl()
+        if self.offline_prefix and first_party.scheme() == "file" and url.scheme() in NETWORK_SCHEMES \
+                and first_party.toString().startswith(self.offline_prefix):
+            info.block(True)
+            return False
+        if not self.enabled:
+            return False
+        if self.matcher.should_block(url.toString(), url.host(), first_party.host(), resource_type):
+            info.block(True)
+            self.total_blocked += 1
+            return True
+        return False
+
+    def blocked_count(self, page):
+        """Requests blocked for page's current document"""
+        blocker = getattr(page, "request_blocker", None)
+        return blocker.count if blocker is not None else 0
+
+
+class PageBlocker(QWebEngineUrlRequestInterceptor):
+    """One page's interceptor: the shared blocker's decisions, counted for that page"""
+
+    def __init__(self, blocker, page):
+        super().__init__(page)
+        self.blocker = blocker
+        self.count = 0
+
+    def interceptRequest(self, info):
+        if info.resourceType() == _RT.ResourceTypeMainFrame:
+            # The page asks for its next document, with the new URL: start counting afresh
+            self.count = 0
+        if self.blocker.intercept(info):
+            self.count += 1
@@ -0,0 +1,508 @@
+"""Download manager: a queue with global and per-host limits, pause/resume/cancel
+
+Every QWebEngineDownloadRequest the profile hands over is accepted at once
+(Qt cancels requests not accepted inside downloadRequested) and, when the
+global or the per-host limit is reached, paused right away; it resumes
+when a slot frees up. The bytes are written by Chromium's network service,
+never by the UI thread. Progress is not taken from receivedBytesChanged,
+which fires for every chunk of every download: a timer samples the active
+downloads and emits one progress summary per interval for the whole batch.
+
+The list is kept in downloads.json. Downloads that were running or queued
+when the browser exited are requested again on the next start; Qt offers
+no way to hand Chromium a partial file from an earlier process, so they
+start over from the first byte.
+
+    python downloads.py [--files 10] [--size-mb 20] [--rate-mb 5]
+
+downloads generated files from a throttled local HTTP server and reports
+the concurrency reached and how many progress signals that took.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, QTimer, QUrl, Qt, pyqtSignal
+from PyQt6.QtGui import QDesktopServices
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                             QPushButton, QLabel, QHeaderView, QAbstractItemView)
+from PyQt6.QtWebEngineCore import QWebEngineDownloadRequest, QWebEnginePage
+from session import atomic_write
+from task_manager import MB
+
+_DS = QWebEngineDownloadRequest.DownloadState
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+PAUSED = "paused"
+INTERRUPTED = "interrupted"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, CANCELLED)
+
+
+def format_bytes(size):
+    if size >= MB:
+        return f"{size / MB:.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+class Download:
+    """One entry of the list; request is None for entries from an earlier session"""
+
+    def __init__(self, url, path, state=QUEUED, received=0, total=-1, download_id=None, started_at=None):
+        self.id = download_id or uuid.uuid4().hex
+        self.url = url
+        self.path = path
+        self.state = state
+        self.received = received
+        self.total = total
+        self.started_at = started_at or time.time()
+        self.speed = 0.0  # bytes per second, smoothed
+        self.error = ""
+        self.request = None
+
+    @property
+    def host(self):
+        return QUrl(self.url).host()
+
+    @property
+    def file_name(self):
+        return os.path.basename(self.path)
+
+    def to_json(self):
+        return {"id": self.id, "url": self.url, "path": self.path, "state": self.state,
+                "received": self.received, "total": self.total, "started_at": self.started_at}
+
+
+class DownloadManager(QObject):
+    """Takes over the profile's downloads; changed() on list or state changes, progress(summary) per tick"""
+
+    changed = pyqtSignal()
+    progress = pyqtSignal(dict)  # {"active", "queued", "received", "total", "speed"}
+    finished = pyqtSignal(object)  # the Download, once completed
+
+    def __init__(self, profile, path, max_active=3, max_per_host=2, interval=500,
+                 keep_finished=100, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        self.path = path
+        self.max_active = max_active
+        self.max_per_host = max_per_host
+        self.keep_finished = keep_finished
+        self.downloads = []  # oldest first
+        self.restarting = {}  # URL -> entry waiting for its new request
+        self.page = None  # Hidden page that re-requests downloads after a restart
+        self.closed = False
+
+        self.ticker = QTimer(self)
+        self.ticker.setInterval(interval)
+        self.ticker.timeout.connect(self.tick)
+        self.last_tick = time.monotonic()
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(1000)
+        self.save_timer.timeout.connect(self.save)
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+        profile.downloadRequested.connect(self.download_requested)
+        self.load()
+
+    # Persistence
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring {self.path}: {e}", file=sys.stderr)
+            return
+        for item in saved if isinstance(saved, list) else ():
+            try:
+                entry = Download(str(item["url"]), str(item["path"]), str(item["state"]),
+                                 int(item.get("received", 0)), int(item.get("total", -1)),
+                                 str(item["id"]), float(item.get("started_at", 0)))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if entry.state in (QUEUED, DOWNLOADING):
+                # Was running when the browser exited
+                self.restart(entry)
+            elif entry.state not in FINISHED:
+                entry.state = PAUSED if entry.state == PAUSED else INTERRUPTED
+            self.downloads.append(entry)
+
+    def schedule_save(self):
+        if not self.closed:
+            self.save_timer.start()
+
+    def save(self):
+        data = json.dumps([d.to_json() for d in self.downloads], indent=1).encode()
+        self.writer.submit(atomic_write, self.path, data)
+
+    def close(self):
+        """Save the list (running downloads restart next time) and wait for the writer"""
+        self.ticker.stop()
+        self.save_timer.stop()
+        for entry in self.downloads:
+            if entry.request is not None:
+                entry.received = entry.request.receivedBytes()
+        self.save()
+        self.writer.shutdown(wait=True)
+        # Chromium cancels what is still running on the way out; the list keeps it as running
+        self.closed = True
+
+    # Requests
+
+    def download_requested(self, request):
+        # Pages saved for offline reading are the offline archive's
+        if request.isSavePageDownload():
+            return
+        url = request.url().toString()
+        entry = self.restarting.pop(url, None)
+        if entry is not None:
+            # Same file as before the restart, not "name (1).ext"
+            request.setDownloadDirectory(os.path.dirname(entry.path))
+            request.setDownloadFileName(os.path.basename(entry.path))
+        else:
+            entry = Download(url, os.path.join(request.downloadDirectory(), request.downloadFileName()))
+            self.downloads.append(entry)
+        entry.request = request
+        entry.total = request.totalBytes()
+        entry.state = QUEUED
+        request.stateChanged.connect(lambda state, e=entry: self.state_changed(e, state))
+        request.totalBytesChanged.connect(lambda r=request, e=entry: setattr(e, "total", r.totalBytes()))
+        request.accept()
+        self.schedule()
+        if entry.state == QUEUED:
+            # Over a limit: Chromium has started it, so hold it until a slot frees up
+            request.pause()
+        self.trim()
+        self.changed.emit()
+        self.schedule_save()
+
+    def restart(self, entry):
+        """Request entry's URL again; the new request takes over the entry"""
+        if self.page is None:
+            self.page = QWebEnginePage(self.profile, self)
+        # The partial file is useless to a new request and would push it to "name (1).ext"
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+        entry.state = QUEUED
+        entry.received = 0
+        self.restarting[entry.url] = entry
+        self.page.download(QUrl(entry.url), os.path.basename(entry.path))
+
+    def state_changed(self, entry, state):
+        request = entry.request
+        if self.closed or request is None:
+            return
+        if state == _DS.DownloadCompleted:
+            entry.state = COMPLETED
+            entry.received = entry.total = request.receivedBytes()
+            self.finished.emit(entry)
+        elif state == _DS.DownloadCancelled:
+            entry.state = CANCELLED
+        elif state == _DS.DownloadInterrupted:
+            entry.state = INTERRUPTED
+            entry.error = request.interruptReasonString()
+            entry.received = request.receivedBytes()
+        else:
+            return
+        entry.speed = 0.0
+        entry.request = None if entry.state in FINISHED else request
+        self.schedule()
+        self.changed.emit()
+        self.schedule_save()
+
+    # Scheduling
+
+    def active(self):
+        return [d for d in self.downloads if d.state == DOWNLOADING]
+
+    def schedule(self):
+        """Start queued downloads, oldest first, while the limits allow"""
+        active = self.active()
+        per_host = {}
+        for d in active:
+            per_host[d.host] = per_host.get(d.host, 0) + 1
+        for entry in self.downloads:
+            if len(active) >= self.max_active:
+                break
+            if entry.state != QUEUED or entry.request is None or per_host.get(entry.host, 0) >= self.max_per_host:
+                continue
+            entry.state = DOWNLOADING
+            # Interrupted downloads continue from where they stopped if the server allows ranges
+            if entry.request.isPaused() or entry.request.state() == _DS.DownloadInterrupted:
+                entry.request.resume()
+            active.append(entry)
+            per_host[entry.host] = per_host.get(entry.host, 0) + 1
+        if active and not self.ticker.isActive():
+            self.last_tick = time.monotonic()
+            self.ticker.start()
+
+    def pause(self, entry):
+        if entry.request is None or entry.state not in (QUEUED, DOWNLOADING):
+            return
+        if not entry.request.isPaused():
+            entry.request.pause()
+        entry.state = PAUSED
+        entry.speed = 0.0
+        self.schedule()
+        self.changed.emit()
+        self.schedule_save()
+
+    def resume(self, entry):
+        """Back into the queue"""
+        if entry.state not in (PAUSED, INTERRUPTED):
+            return
+        if entry.request is None:
+            self.restart(entry)
+        else:
+            entry.state = QUEUED
+            self.schedule()
+        self.changed.emit()
+        self.schedule_save()
+
+    def cancel(self, entry):
+        if entry.state in FINISHED:
+            return
+        if entry.request is not None:
+            entry.request.cancel()  # stateChanged does the rest
+        else:
+            self.restarting.pop(entry.url, None)
+            entry.state = CANCELLED
+            self.changed.emit()
+            self.schedule_save()
+
+    def clear_finished(self):
+        self.downloads = [d for d in self.downloads if d.state not in FINISHED]
+        self.changed.emit()
+        self.schedule_save()
+
+    def trim(self):
+        finished = [d for d in self.downloads if d.state in FINISHED]
+        if len(finished) > self.keep_finished:
+            drop = set(map(id, finished[:len(finished) - self.keep_finished]))
+            self.downloads = [d for d in self.downloads if id(d) not in drop]
+
+    # Progress
+
+    def tick(self):
+        now = time.monotonic()
+        elapsed = max(now - self.last_tick, 1e-3)
+        self.last_tick = now
+        active = self.active()
+        for entry in active:
+            received = entry.request.receivedBytes()
+            rate = max(received - entry.received, 0) / elapsed
+            entry.speed = rate if not entry.speed else 0.7 * entry.speed + 0.3 * rate
+            entry.received = received
+        if not active:
+            self.ticker.stop()
+        self.progress.emit(self.summary())
+
+    def summary(self):
+        active = self.active()
+        return {"active": len(active),
+                "queued": sum(d.state == QUEUED for d in self.downloads),
+                "received": sum(d.received for d in active),
+                "total": sum(d.total for d in active if d.total > 0),
+                "speed": sum(d.speed for d in active)}
+
+
+def describe(summary):
+    """Status bar text for a progress summary"""
+    if not summary["active"] and not summary["queued"]:
+        return ""
+    text = f"⬇ {summary['active']}"
+    if summary["queued"]:
+        text += f" (+{summary['queued']} queued)"
+    if summary["total"]:
+        text += f" · {min(summary['received'] / summary['total'], 1):.0%}"
+    if summary["speed"]:
+        text += f" · {format_bytes(summary['speed'])}/s"
+    return text
+
+
+class DownloadsDialog(QDialog):
+    """List of downloads with pause, resume and cancel"""
+
+    COLUMNS = ("File", "Size", "Progress", "Speed", "State")
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.setWindowTitle("Downloads - Elafrý")
+        self.resize(760, 420)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.doubleClicked.connect(lambda index: self.open_folder())
+
+        self.total_label = QLabel()
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.total_label)
+        buttons.addStretch()
+        for text, action in (("Pause", manager.pause), ("Resume", manager.resume), ("Cancel", manager.cancel)):
+            btn = QPushButton(text)
+            btn.clicked.connect(lambda checked, a=action: self.apply_to_selected(a))
+            buttons.addWidget(btn)
+        folder_btn = QPushButton("Show in Folder")
+        folder_btn.clicked.connect(self.open_folder)
+        clear_btn = QPushButton("Clear Finished")
+        clear_btn.clicked.connect(manager.clear_finished)
+        buttons.addWidget(folder_btn)
+        buttons.addWidget(clear_btn)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        manager.changed.connect(self.refresh)
+        manager.progress.connect(lambda summary: self.refresh())
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        selected = {self.table.item(i.row(), 0).data(Qt.ItemDataRole.UserRole)
+                    for i in self.table.selectionModel().selectedRows()}
+        # Newest first
+        downloads = list(reversed(self.manager.downloads))
+        self.table.setRowCount(len(downloads))
+        for row, entry in enumerate(downloads):
+            if entry.total > 0:
+                progress = f"{min(entry.received / entry.total, 1):.0%}"
+                size = format_bytes(entry.total)
+            else:
+                progress, size = format_bytes(entry.received), "–"
+            cells = (entry.file_name, size, progress,
+                     f"{format_bytes(entry.speed)}/s" if entry.state == DOWNLOADING else "",
+                     entry.state + (f": {entry.error}" if entry.state == INTERRUPTED and entry.error else ""))
+            for column, text in enumerate(cells):
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    self.table.setItem(row, column, item)
+                item.setText(text)
+                item.setData(Qt.ItemDataRole.UserRole, entry.id)
+            self.table.item(row, 0).setToolTip(f"{entry.url}\n{entry.path}")
+        selection = self.table.selectionModel()
+        selection.clearSelection()
+        for row, entry in enumerate(downloads):
+            if entry.id in selected:
+                selection.select(self.table.model().index(row, 0),
+                                 selection.SelectionFlag.Select | selection.SelectionFlag.Rows)
+        self.total_label.setText(describe(self.manager.summary()))
+
+    def selected(self):
+        ids = {self.table.item(i.row(), 0).data(Qt.ItemDataRole.UserRole)
+               for i in self.table.selectionModel().selectedRows()}
+        return [d for d in self.manager.downloads if d.id in ids]
+
+    def apply_to_selected(self, action):
+        for entry in self.selected():
+            action(entry)
+
+    def open_folder(self):
+        for entry in self.selected()[:1]:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(entry.path)))
+
+
+def benchmark(files=10, size_mb=20, rate_mb=5, max_active=3, max_per_host=2):
+    import sys
+    import shutil
+    import tempfile
+    import threading
+    from functools import partial
+    from http.server import ThreadingHTTPServer
+    from PyQt6.QtWidgets import QApplication
+    from bench import QuietHandler
+    from web_profile import WebProfile
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    class ThrottledHandler(QuietHandler):
+        # Slow enough that several downloads overlap, as over a real network
+        def copyfile(self, source, output):
+            chunk = 64 * 1024
+            while True:
+                data = source.read(chunk)
+                if not data:
+                    break
+                output.write(data)
+                time.sleep(chunk / (rate_mb * MB))
+
+    work = tempfile.mkdtemp(prefix="elafry-downloads-")
+    served = os.path.join(work, "served")
+    os.makedirs(served)
+    for i in range(files):
+        with open(os.path.join(served, f"file{i}.bin"), "wb") as f:
+            f.write(os.urandom(size_mb * MB))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(ThrottledHandler, directory=served))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Two host names for the same server, so the per-host limit has something to do
+    hosts = ["127.0.0.1", "localhost"]
+    port = server.server_address[1]
+
+    app = QApplication(sys.argv)
+    web_profile = WebProfile(os.path.join(work, "profile"), name="downloads-bench", parent=app)
+    web_profile.profile.setDownloadPath(os.path.join(work, "downloads"))
+    manager = DownloadManager(web_profile.profile, os.path.join(work, "downloads.json"),
+                              max_active, max_per_host)
+    counts = {"progress": 0, "peak_active": 0, "chunks": 0}
+
+    def progressed(summary):
+        counts["progress"] += 1
+        counts["peak_active"] = max(counts["peak_active"], summary["active"])
+
+    def chunk():
+        counts["chunks"] += 1
+
+    def finished(entry):
+        if all(d.state in FINISHED for d in manager.downloads) and len(manager.downloads) == files:
+            app.quit()
+
+    manager.progress.connect(progressed)
+    manager.finished.connect(finished)
+    # What a manager listening to every chunk would have handled
+    web_profile.profile.downloadRequested.connect(lambda request: request.receivedBytesChanged.connect(chunk))
+    page = QWebEnginePage(web_profile.profile)
+    start = time.perf_counter()
+    for i in range(files):
+        page.download(QUrl(f"http://{hosts[i % len(hosts)]}:{port}/file{i}.bin"))
+    QTimer.singleShot(600_000, app.quit)
+    app.exec()
+    elapsed = time.perf_counter() - start
+    complete = [d for d in manager.downloads if d.state == COMPLETED
+                and os.path.getsize(d.path) == size_mb * MB]
+    manager.close()
+    server.shutdown()
+    shutil.rmtree(work, ignore_errors=True)
+    print(f"{len(complete)}/{files} files of {size_mb} MB in {elapsed:.1f} s "
+          f"({files * size_mb / elapsed:.1f} MB/s, limits {max_active} total / {max_per_host} per host)")
+    print(f"peak concurrent downloads {counts['peak_active']}; {counts['progress']} progress signals "
+          f"instead of {counts['chunks']} receivedBytesChanged")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Download manager throughput and signal load")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--rate-mb", type=float, default=5.0, help="per-connection server rate")
+    parser.add_argument("--max-active", type=int, default=3)
+    parser.add_argument("--max-per-host", type=int, default=2)
+    args = parser.parse_args()
+    benchmark(args.files, args.size_mb, args.rate_mb, args.max_active, args.max_per_host)
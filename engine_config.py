@@ -0,0 +1,231 @@
+"""Chromium process model, flags and QWebEngineSettings, chosen by preset
+
+Settings are layered: the preset's defaults, then the "engine.json" file in
+the data directory, then --engine-* command line options. Flags only take
+effect when applied before the QApplication exists.
+
+    python engine_config.py --compare [--tabs 20]
+
+runs the page-load benchmark once per preset with that many tabs open on
+as many different sites, and prints each preset's peak memory.
+"""
+import os
+import sys
+import json
+import math
+
+PROCESS_MODELS = {
+    # Whatever Chromium does by default, site isolation included; adds no flags
+    "default": [],
+    # Every site gets its own renderer, forced even where Chromium would not
+    "site-per-process": ["--site-per-process"],
+    # Separate processes per tab/site instance; site isolation has to be off for this to apply
+    "process-per-site-instance": ["--process-per-site-instance", "--disable-site-isolation-trials"],
+    # All tabs of a site share one renderer
+    "process-per-site": ["--process-per-site", "--disable-site-isolation-trials"],
+}
+
+PRESETS = {
+    "low-memory": {
+        "process_model": "process-per-site",
+        "renderer_process_limit": 2,
+        "gpu": False,
+        "js_heap_mb": 256,
+        "settings": {
+            "WebGLEnabled": False,
+            "Accelerated2dCanvasEnabled": False,
+            "PluginsEnabled": False,
+            "DnsPrefetchEnabled": False,
+            "ScrollAnimatorEnabled": False,
+        },
+    },
+    "balanced": {
+        # Turning site isolation off has to be asked for, with low-memory or --engine-process-model
+        "process_model": "default",
+        "renderer_process_limit": None,
+        "gpu": True,
+        "js_heap_mb": None,
+        "settings": {
+            "DnsPrefetchEnabled": True,
+            "ScrollAnimatorEnabled": True,
+        },
+    },
+    "max-isolation": {
+        "process_model": "site-per-process",
+        "renderer_process_limit": None,
+        "gpu": True,
+        "js_heap_mb": None,
+        "settings": {
+            "PluginsEnabled": False,
+            "DnsPrefetchEnabled": False,
+            "LocalContentCanAccessRemoteUrls": False,
+            "LocalContentCanAccessFileUrls": False,
+            "AllowRunningInsecureContent": False,
+        },
+    },
+}
+DEFAULT_PRESET = "balanced"
+
+# --engine-<option>=value on the command line; "-" in names maps to "_"
+OPTIONS = {
+    "preset": str,
+    "process_model": str,
+    "renderer_process_limit": int,
+    "gpu": lambda v: v.lower() in ("1", "on", "true", "yes"),
+    "js_heap_mb": int,
+    # The profile's HTTP cache; not part of any preset
+    "cache_size_mb": int,
+    "cache_dir": str,
+    "memory_cache": lambda v: v.lower() in ("1", "on", "true", "yes"),
+}
+CACHE_DEFAULTS = {"cache_size_mb": 256, "cache_dir": None, "memory_cache": False}
+REPORTED = ("preset", "process_model", "renderer_process_limit", "gpu", "js_heap_mb") + tuple(CACHE_DEFAULTS)
+
+
+class EngineConfig:
+    """Effective engine configuration; sources records where each value came from"""
+
+    def __init__(self, preset=DEFAULT_PRESET):
+        self.sources = {}
+        for key, value in CACHE_DEFAULTS.items():
+            self.set(key, value, "default")
+        self.set("preset", preset, "default")
+
+    def set(self, key, value, source):
+        if key == "preset":
+            if value not in PRESETS:
+                raise ValueError(f"unknown engine preset {value!r}, expected one of {', '.join(PRESETS)}")
+            # A preset resets everything it defines
+            for name, default in PRESETS[value].items():
+                if name != "settings":
+                    setattr(self, name, default)
+                    self.sources[name] = f"preset {value}"
+            self.settings = dict(PRESETS[value]["settings"])
+        elif key == "settings":
+            self.settings.update(value)
+            return
+        elif key == "process_model" and value not in PROCESS_MODELS:
+            raise ValueError(f"unknown process model {value!r}, expected one of {', '.join(PROCESS_MODELS)}")
+        elif key == "cache_size_mb" and (not isinstance(value, int) or value < 0):
+            raise ValueError(f"cache size must be a number of MB (0 lets Chromium choose), not {value!r}")
+        elif key == "cache_dir" and value is not None:
+            value = os.path.expanduser(str(value))
+        setattr(self, key, value)
+        self.sources[key] = source
+
+    def chromium_flags(self):
+        flags = list(PROCESS_MODELS[self.process_model])
+        if self.renderer_process_limit:
+            flags.append(f"--renderer-process-limit={self.renderer_process_limit}")
+        if not self.gpu:
+            flags += ["--disable-gpu", "--disable-gpu-compositing"]
+        if self.js_heap_mb:
+            flags.append(f"--js-flags=--max-old-space-size={self.js_heap_mb}")
+        return flags
+
+    def apply_environment(self):
+        """Put the flags into QTWEBENGINE_CHROMIUM_FLAGS; must run before QApplication"""
+        existing = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "")
+        # Flags already in the environment come last, so they win over the preset
+        os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = " ".join(self.chromium_flags() + existing.split())
+
+    def apply_settings(self, settings):
+        """Apply the preset's attributes to a (profile's) QWebEngineSettings"""
+        from PyQt6.QtWebEngineCore import QWebEngineSettings
+        applied = {}
+        for name, enabled in self.settings.items():
+            # Only set the attributes this Qt version has
+            attribute = getattr(QWebEngineSettings.WebAttribute, name, None)
+            if attribute is not None:
+                settings.setAttribute(attribute, enabled)
+                applied[name] = enabled
+        return applied
+
+    def report(self):
+        lines = ["Engine configuration:"]
+        for key in REPORTED:
+            lines.append(f"  {key:24} {getattr(self, key)!s:28} ({self.sources[key]})")
+        lines.append("  QTWEBENGINE_CHROMIUM_FLAGS " + os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", ""))
+        for name, enabled in sorted(self.settings.items()):
+            lines.append(f"  {name:40} {'on' if enabled else 'off'}")
+        return "\n".join(lines)
+
+
+def load(path, argv):
+    """Build the configuration from the settings file and command line"""
+    config = EngineConfig()
+    try:
+        with open(path) as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        saved = {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring {path}: {e}", file=sys.stderr)
+        saved = {}
+    if not isinstance(saved, dict):
+        saved = {}
+    cli = {}
+    for arg in argv:
+        if arg.startswith("--engine-") and "=" in arg:
+            name, value = arg[len("--engine-"):].split("=", 1)
+            cli[name.replace("-", "_")] = value
+
+    # Each source's preset first, so that source's other values override it
+    for source, values, convert in ((path, saved, False), ("command line", cli, True)):
+        for key in sorted(values, key=lambda k: k != "preset"):
+            if key not in OPTIONS and not (key == "settings" and not convert):
+                continue
+            try:
+                value = OPTIONS[key](values[key]) if convert else values[key]
+                config.set(key, value, source)
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Ignoring engine option {key} from {source}: {e}", file=sys.stderr)
+    return config
+
+
+def compare_presets(tabs=20):
+    import subprocess
+    import tempfile
+    here = os.path.dirname(os.path.abspath(__file__))
+    urls = os.path.join(here, "bench_fixtures", "urls.txt")
+    with open(urls) as f:
+        count = sum(1 for line in f if line.strip() and not line.startswith("#"))
+    results = {}
+    with tempfile.TemporaryDirectory() as work:
+        for preset in PRESETS:
+            output = os.path.join(work, f"{preset}.json")
+            # Concurrency = tabs keeps `tabs` views open at once, each on its own site
+            subprocess.run([sys.executable, os.path.join(here, "browser.py"),
+                            "--bench", urls, f"--bench-concurrency={tabs}",
+                            f"--bench-repeat={math.ceil(tabs / count)}", f"--bench-sites={tabs}",
+                            f"--bench-output={output}", f"--engine-preset={preset}"],
+                           env=dict(os.environ, ELAFRY_DATA_DIR=os.path.join(work, preset)),
+                           timeout=600, check=False)
+            try:
+                with open(output) as f:
+                    results[preset] = json.load(f)
+            except (OSError, ValueError):
+                results[preset] = None
+
+    # A Markdown table, ready for the Engine Presets section of ARCHITECTURE.md
+    print(f"{tabs} tabs, Qt {next((r['environment']['qt'] for r in results.values() if r), '?')}, {sys.platform}")
+    print()
+    print("| Preset | Renderer processes | Renderer MB | Total MB | p50 load ms |")
+    print("|---|---:|---:|---:|---:|")
+    for preset, report in results.items():
+        if report is None:
+            print(f"| {preset} | failed | | | |")
+            continue
+        peak = report["peak_rss_mb"]
+        load = report["load_finished_ms"] or {}
+        print(f"| {preset} | {report['peak_renderer_processes']} | {peak['renderers']} "
+              f"| {peak['total']} | {load.get('p50', '–')} |")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare engine presets' memory with N tabs open")
+    parser.add_argument("--compare", action="store_true", required=True)
+    parser.add_argument("--tabs", type=int, default=20)
+    args = parser.parse_args()
+    compare_presets(args.tabs)
@@ -0,0 +1,342 @@
+"""Compiled matcher for EasyList / uBlock Origin style network filters.
+
+Pure Python so it can be benchmarked on its own:
+
+    python filters.py easylist.txt [more lists...]
+"""
+import os
+import re
+import sys
+import time
+import pickle
+
+CACHE_VERSION = 1
+
+# URL tokens used to pick candidate filters (lowercased alphanumerics)
+TOKEN_RE = re.compile(r"[a-z0-9%]{2,}")
+HOST_RULE_RE = re.compile(r"\|\|([a-z0-9.-]+)\^?")
+SEPARATOR_RE = r"(?:[^\w.%-]|$)"
+
+RESOURCE_TYPES = frozenset([
+    "script", "image", "stylesheet", "xmlhttprequest", "subdocument", "document",
+    "font", "media", "object", "ping", "websocket", "other",
+])
+OPTION_ALIASES = {
+    "xhr": "xmlhttprequest", "css": "stylesheet", "frame": "subdocument",
+    "3p": "third-party", "1p": "~third-party", "first-party": "~third-party",
+}
+
+
+def host_in(host, domain):
+    return host == domain or host.endswith("." + domain)
+
+
+def base_domain(host):
+    """Approximate registrable domain (example.com, example.co.uk) without a suffix list"""
+    labels = host.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and len(labels[-2]) <= 3:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def is_third_party(host, source_host):
+    return bool(source_host) and base_domain(host) != base_domain(source_host)
+
+
+class DomainTrie:
+    """Maps domains to values; lookups walk a host's labels from the TLD down"""
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, domain, value):
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        # The None key holds a tuple of values; labels are never None
+        node[None] = node.get(None, ()) + (value,)
+        self.size += 1
+
+    def lookup(self, host):
+        """Values for every domain that host equals or is a subdomain of, most specific last"""
+        node = self.root
+        found = []
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            values = node.get(None)
+            if values:
+                found.extend(values)
+        return found
+
+
+def pattern_to_regex(pattern):
+    if len(pattern) > 1 and pattern.startswith("/") and pattern.endswith("/"):
+        return pattern[1:-1]
+    start = end = ""
+    if pattern.startswith("||"):
+        start = r"^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?"
+        pattern = pattern[2:]
+    elif pattern.startswith("|"):
+        start = "^"
+        pattern = pattern[1:]
+    if pattern.endswith("|"):
+        end = "$"
+        pattern = pattern[:-1]
+    parts = []
+    for ch in pattern:
+        if ch == "*":
+            parts.append(".*")
+        elif ch == "^":
+            parts.append(SEPARATOR_RE)
+        else:
+            parts.append(re.escape(ch))
+    return start + "".join(parts) + end
+
+
+def pattern_tokens(pattern):
+    """Tokens that must appear whole in any URL the pattern matches"""
+    if pattern.startswith("/") and pattern.endswith("/"):
+        return []
+    lowered = pattern.lower()
+    tokens = []
+    for m in TOKEN_RE.finditer(lowered):
+        before = lowered[m.start() - 1] if m.start() > 0 else ""
+        after = lowered[m.end()] if m.end() < len(lowered) else ""
+        # A token next to a wildcard or an unanchored pattern edge may be partial
+        if before == "*" or after == "*":
+            continue
+        if before == "" or after == "":
+            continue
+        tokens.append(m.group())
+    return tokens
+
+
+def parse_filter(line):
+    """Parse one filter line into (exception, host or None, pattern, options), or None"""
+    line = line.strip()
+    if not line or line[0] in "![" or "##" in line or "#@#" in line or "#?#" in line or "#$#" in line:
+        return None
+    exception = line.startswith("@@")
+    if exception:
+        line = line[2:]
+
+    pattern, options = line, ""
+    if "$" in line and not (line.startswith("/") and line.endswith("/")):
+        pattern, options = line.rsplit("$", 1)
+
+    third_party = None
+    types, not_types = set(), set()
+    domains, not_domains = [], []
+    match_case = False
+    for option in filter(None, options.split(",")):
+        option = OPTION_ALIASES.get(option.lower(), option.lower())
+        negated = option.startswith("~")
+        name = option.lstrip("~")
+        if name == "third-party":
+            third_party = not negated
+        elif name.startswith("domain="):
+            for d in name[7:].split("|"):
+                (not_domains if d.startswith("~") else domains).append(d.lstrip("~"))
+        elif name in RESOURCE_TYPES:
+            (not_types if negated else types).add(name)
+        elif name == "match-case":
+            match_case = True
+        else:
+            # Unsupported option: skipping the filter beats applying it too widely
+            return None
+
+    if types:
+        types = frozenset(types)
+    elif not_types:
+        types = RESOURCE_TYPES - not_types
+    else:
+        types = None
+    opts = (third_party, types, tuple(domains), tuple(not_domains), match_case)
+
+    if not pattern or pattern == "*":
+        return None
+    m = HOST_RULE_RE.fullmatch(pattern.lower())
+    if m:
+        return exception, m.group(1), None, opts
+    return exception, None, pattern, opts
+
+
+class FilterSet:
+    """Filters of one kind (block or allow): a host trie plus token-hashed buckets"""
+
+    def __init__(self):
+        self.hosts = DomainTrie()
+        self.buckets = {}   # token -> [(regex source, opts)]
+        self.generic = []   # filters without a usable token
+
+    def add(self, host, pattern, opts):
+        if host is not None:
+            self.hosts.add(host, opts)
+            return
+        regex = pattern_to_regex(pattern)
+        tokens = pattern_tokens(pattern)
+        if not tokens:
+            self.generic.append((regex, opts))
+            return
+        # Bucket under the rarest token so far to keep buckets short
+        token = min(tokens, key=lambda t: (len(self.buckets.get(t, ())), -len(t)))
+        self.buckets.setdefault(token, []).append((regex, opts))
+
+
+class FilterMatcher:
+    """Decides whether a request URL should be blocked"""
+
+    def __init__(self):
+        self.block = FilterSet()
+        self.allow = FilterSet()
+        self.rule_count = 0
+        self.regex_cache = {}
+        # Identical option tuples are shared, which keeps the pickled cache small
+        self.interned = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["regex_cache"] = {}
+        state["interned"] = {}
+        return state
+
+    def add_filter(self, line):
+        parsed = parse_filter(line)
+        if parsed is None:
+            return False
+        exception, host, pattern, opts = parsed
+        opts = self.interned.setdefault(opts, opts)
+        (self.allow if exception else self.block).add(host, pattern, opts)
+        self.rule_count += 1
+        return True
+
+    def add_list(self, text):
+        for line in text.splitlines():
+            self.add_filter(line)
+
+    def regex(self, source, match_case):
+        key = (source, match_case)
+        compiled = self.regex_cache.get(key)
+        if compiled is None:
+            try:
+                compiled = re.compile(source, 0 if match_case else re.IGNORECASE)
+            except re.error:
+                compiled = re.compile(r"(?!)")
+            self.regex_cache[key] = compiled
+        return compiled
+
+    def options_match(self, opts, resource_type, third_party, source_host):
+        want_third_party, types, domains, not_domains, _ = opts
+        if want_third_party is not None and want_third_party != third_party:
+            return False
+        if types is not None and resource_type not in types:
+            return False
+        if domains and not any(host_in(source_host, d) for d in domains):
+            return False
+        if not_domains and any(host_in(source_host, d) for d in not_domains):
+            return False
+        return True
+
+    def hit(self, filters, url, tokens, host, source_host, resource_type, third_party):
+        for opts in filters.hosts.lookup(host):
+            if self.options_match(opts, resource_type, third_party, source_host):
+                return True
+        for token in tokens:
+            for source, opts in filters.buckets.get(token, ()):
+                if (self.options_match(opts, resource_type, third_party, source_host)
+                        and self.regex(source, opts[4]).search(url)):
+                    return True
+        for source, opts in filters.generic:
+            if (self.options_match(opts, resource_type, third_party, source_host)
+                    and self.regex(source, opts[4]).search(url)):
+                return True
+        return False
+
+    def should_block(self, url, host, source_host, resource_type="other"):
+        host = host.lower()
+        source_host = source_host.lower()
+        third_party = is_third_party(host, source_host)
+        tokens = set(TOKEN_RE.findall(url.lower()))
+        if not self.hit(self.block, url, tokens, host, source_host, resource_type, third_party):
+            return False
+        return not self.hit(self.allow, url, tokens, host, source_host, resource_type, third_party)
+
+
+def load_filter_lists(paths, cache_path=None):
+    """Build a matcher from filter list files, reusing a pickled copy when they are unchanged"""
+    signature = []
+    for path in paths:
+        st = os.stat(path)
+        signature.append((os.path.abspath(path), st.st_mtime_ns, st.st_size))
+
+    if cache_path:
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached["version"] == CACHE_VERSION and cached["signature"] == signature:
+                return cached["matcher"]
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, TypeError, AttributeError):
+            pass
+
+    matcher = FilterMatcher()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            matcher.add_list(f.read())
+
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp = cache_path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump({"version": CACHE_VERSION, "signature": signature, "matcher": matcher},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return matcher
+
+
+def benchmark(paths, rounds=20000):
+    cache_path = os.path.join(os.path.dirname(os.path.abspath(paths[0])), ".filters-bench.cache")
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    start = time.perf_counter()
+    matcher = load_filter_lists(paths, cache_path)
+    parsed = time.perf_counter() - start
+    start = time.perf_counter()
+    load_filter_lists(paths, cache_path)
+    cached = time.perf_counter() - start
+    os.remove(cache_path)
+
+    samples = [
+        ("https://www.example.com/assets/app.js", "www.example.com", "example.com", "script"),
+        ("https://cdn.example.net/img/photo-1234.jpg", "cdn.example.net", "example.com", "image"),
+        ("https://pagead2.googlesyndication.com/pagead/js/adsbygoogle.js",
+         "pagead2.googlesyndication.com", "news.example.org", "script"),
+        ("https://www.google-analytics.com/analytics.js", "www.google-analytics.com", "example.com", "script"),
+        ("https://example.org/api/v1/items?page=2&ad_slot=top", "example.org", "example.org", "xmlhttprequest"),
+        ("https://static.example.com/css/site.min.css", "static.example.com", "example.com", "stylesheet"),
+    ]
+    blocked = 0
+    start = time.perf_counter()
+    for i in range(rounds):
+        url, host, source, rtype = samples[i % len(samples)]
+        blocked += matcher.should_block(url, host, source, rtype)
+    elapsed = time.perf_counter() - start
+
+    print(f"rules:            {matcher.rule_count}")
+    print(f"parse lists:      {parsed * 1000:.1f} ms")
+    print(f"load from cache:  {cached * 1000:.1f} ms")
+    print(f"match:            {elapsed / rounds * 1e6:.2f} us/request ({blocked}/{rounds} blocked)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python filters.py LIST [LIST...]")
+    benchmark(sys.argv[1:])
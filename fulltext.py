@@ -0,0 +1,137 @@
+import time
+import queue
+import sqlite3
+import threading
+
+# Runs in the application world, isolated from the page's own scripts
+EXTRACT_TEXT_JS = "document.body ? document.body.innerText.slice(0, {limit}) : ''"
+
+# Marks matched terms in snippets; replaced with <mark> after HTML escaping
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+
+def fts_query(text):
+    """Turn user input into an FTS5 query matching all of its words"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class PageTextIndex:
+    """Full-text index of visited pages in SQLite FTS5, bounded on disk
+
+    Pages are indexed on a writer thread; once the stored text passes
+    max_total_bytes the oldest pages are evicted.
+    """
+
+    def __init__(self, path, max_page_chars=100_000, max_total_bytes=64 * 1024 * 1024,
+                 batch_delay=1.0):
+        self.path = path
+        self.max_page_chars = max_page_chars
+        self.max_total_bytes = max_total_bytes
+        self.batch_delay = batch_delay
+        self.reader = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def extract_script(self):
+        return EXTRACT_TEXT_JS.format(limit=self.max_page_chars)
+
+    def add_page(self, url, title, text):
+        if isinstance(text, str) and text.strip():
+            self.queue.put((url, title or "", text[:self.max_page_chars]))
+
+    def search(self, text, limit=50):
+        """[(url, title, snippet, indexed_at)] best match first"""
+        match = fts_query(text)
+        if not match:
+            return []
+        try:
+            if self.reader is None:
+                self.reader = sqlite3.connect(self.path)
+            return self.reader.execute(
+                f"""SELECT p.url, p.title,
+                          snippet(page_text, 1, '{MATCH_START}', '{MATCH_END}', '…', 24),
+                          p.indexed_at
+                   FROM page_text JOIN pages p ON p.id = page_text.rowid
+                   WHERE page_text MATCH ?
+                   ORDER BY bm25(page_text, 5.0, 1.0) LIMIT ?""", (match, limit)).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+        if self.reader is not None:
+            self.reader.close()
+
+    def run(self):
+        db = sqlite3.connect(self.path)
+        # Must be set before the first table is created to take effect
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS pages (
+                          id INTEGER PRIMARY KEY,
+                          url TEXT UNIQUE NOT NULL,
+                          title TEXT NOT NULL,
+                          size INTEGER NOT NULL,
+                          indexed_at REAL NOT NULL)""")
+        db.execute("CREATE INDEX IF NOT EXISTS pages_indexed_at ON pages (indexed_at)")
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(title, body)")
+        db.commit()
+
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_delay
+            while batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            with db:
+                for url, title, text in batch:
+                    self.store(db, url, title, text)
+                evicted = self.evict(db)
+            if evicted:
+                # Fold the deletions into the index and hand freed pages back to the OS
+                db.execute("INSERT INTO page_text (page_text, rank) VALUES ('merge', 200)")
+                db.commit()
+                db.execute("PRAGMA incremental_vacuum")
+        db.close()
+
+    def store(self, db, url, title, text):
+        size = len(text.encode("utf-8")) + len(title.encode("utf-8"))
+        row = db.execute("SELECT id FROM pages WHERE url = ?", (url,)).fetchone()
+        if row:
+            page_id = row[0]
+            db.execute("DELETE FROM page_text WHERE rowid = ?", (page_id,))
+            db.execute("UPDATE pages SET title = ?, size = ?, indexed_at = ? WHERE id = ?",
+                       (title, size, time.time(), page_id))
+        else:
+            page_id = db.execute("INSERT INTO pages (url, title, size, indexed_at) VALUES (?, ?, ?, ?)",
+                                 (url, title, size, time.time())).lastrowid
+        db.execute("INSERT INTO page_text (rowid, title, body) VALUES (?, ?, ?)", (page_id, title, text))
+
+    def evict(self, db):
+        """Delete the oldest pages until the stored text fits the budget"""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        evicted = 0
+        while total > self.max_total_bytes:
+            rows = db.execute("SELECT id, size FROM pages ORDER BY indexed_at LIMIT 100").fetchall()
+            if not rows:
+                break
+            for page_id, size in rows:
+                db.execute("DELETE FROM page_text WHERE rowid = ?", (page_id,))
+                db.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+                total -= size
+                evicted += 1
+                if total <= self.max_total_bytes:
+                    break
+        return evicted
@@ -0,0 +1,318 @@
+import sys
+import time
+import heapq
+import queue
+import random
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right, insort
+from operator import attrgetter
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+from PyQt6.QtGui import QStandardItem, QStandardItemModel
+from PyQt6.QtWidgets import QCompleter
+
+DAY = 24 * 60 * 60
+# (max age in days, weight), as in Firefox's frecency buckets
+RECENCY_WEIGHTS = ((4, 100), (14, 70), (31, 50), (90, 30))
+RECORDED_SCHEMES = ("http", "https", "file")
+
+# Limits that keep each lookup bounded regardless of history size
+PREFIX_RANGE_LIMIT = 5000
+SUBSTRING_SCAN_LIMIT = 50000
+RERANK_AFTER = 200
+
+
+def normalize(url):
+    """Lowercase, scheme- and www-less form used for prefix matching"""
+    url = url.lower()
+    for prefix in ("https://", "http://", "www."):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+    return url
+
+
+def frecency(visit_count, last_visit, now):
+    age = (now - last_visit) / DAY
+    for days, weight in RECENCY_WEIGHTS:
+        if age < days:
+            return visit_count * weight
+    return visit_count * 10
+
+
+class HistoryEntry:
+    __slots__ = ("url", "title", "visit_count", "last_visit", "frecency", "key", "text")
+
+    def __init__(self, url, title, visit_count, last_visit, now):
+        self.url = url
+        self.key = normalize(url)
+        self.visit_count = visit_count
+        self.last_visit = last_visit
+        self.set_title(title)
+        self.frecency = frecency(visit_count, last_visit, now)
+
+    def set_title(self, title):
+        self.title = title or ""
+        self.text = f"{self.key} {self.title.lower()}"
+
+
+class HistoryIndex:
+    """In-memory history for suggestions: a sorted prefix index plus a frecency ranking"""
+
+    def __init__(self, rows=()):
+        now = time.time()
+        self.entries = {}
+        for url, title, visit_count, last_visit in rows:
+            self.entries[url] = HistoryEntry(url, title, visit_count, last_visit, now)
+        self.keys = sorted((e.key, e.url) for e in self.entries.values())
+        self.rerank()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rerank(self):
+        self.ranked = sorted(self.entries.values(), key=attrgetter("frecency"), reverse=True)
+        # Entries visited or retitled since the last rerank; searched in addition to the ranking
+        self.recent = {}
+        # The ranking's keys and texts joined into single strings, so scans run in str.find
+        self.key_blob, self.key_offsets = self.join_blob(e.key for e in self.ranked)
+        self.text_blob, self.text_offsets = self.join_blob(
+            e.text for e in self.ranked[:SUBSTRING_SCAN_LIMIT])
+
+    def join_blob(self, strings):
+        offsets, parts, pos = [], [], 0
+        for text in strings:
+            offsets.append(pos)
+            parts.append(text)
+            pos += len(text) + 1
+        return "\n" + "\n".join(parts), offsets
+
+    def scan(self, blob, offsets, needle, limit, skip):
+        """Ranked entries whose blob text contains needle, best first"""
+        found = []
+        start = 0
+        while len(found) < limit:
+            pos = blob.find(needle, start)
+            if pos < 0:
+                break
+            # offsets[i] is the newline in front of text i
+            i = bisect_right(offsets, pos) - 1
+            entry = self.ranked[i]
+            if entry.url not in skip:
+                found.append(entry)
+            start = offsets[i + 1] if i + 1 < len(offsets) else len(blob)
+        return found
+
+    def visit(self, url, title, when):
+        entry = self.entries.get(url)
+        if entry is None:
+            entry = self.entries[url] = HistoryEntry(url, title, 1, when, when)
+            insort(self.keys, (entry.key, url))
+        else:
+            entry.visit_count += 1
+            entry.last_visit = when
+            entry.frecency = frecency(entry.visit_count, when, when)
+            if title:
+                entry.set_title(title)
+        self.recent[url] = entry
+        if len(self.recent) > RERANK_AFTER:
+            self.rerank()
+
+    def set_title(self, url, title):
+        entry = self.entries.get(url)
+        if entry is not None and title:
+            entry.set_title(title)
+            self.recent[url] = entry
+
+    def recent_matches(self, test):
+        return sorted((e for e in self.recent.values() if test(e)),
+                      key=attrgetter("frecency"), reverse=True)
+
+    def suggest(self, query, limit=8):
+        """Prefix matches by frecency, then substring matches by frecency"""
+        q = normalize(query.strip())
+        if not q:
+            return []
+        lo = bisect_left(self.keys, (q,))
+        hi = bisect_left(self.keys, (q + "\uffff",))
+        if hi - lo <= PREFIX_RANGE_LIMIT:
+            matches = (self.entries[url] for _, url in self.keys[lo:hi])
+            results = heapq.nlargest(limit, matches, key=attrgetter("frecency"))
+        else:
+            # Very short prefixes match a lot; the best ones are found early in rank order
+            results = self.recent_matches(lambda e: e.key.startswith(q))[:limit]
+            results += self.scan(self.key_blob, self.key_offsets, "\n" + q,
+                                 limit - len(results), self.recent)
+
+        if len(results) < limit:
+            seen = {e.url for e in results}
+            for entry in self.recent_matches(lambda e: q in e.text):
+                if entry.url not in seen and len(results) < limit:
+                    results.append(entry)
+                    seen.add(entry.url)
+            seen.update(self.recent)
+            results += self.scan(self.text_blob, self.text_offsets, q, limit - len(results), seen)
+        return results
+
+    def top_sites(self, limit):
+        """Best ranked entry of each of the top `limit` hosts: (host, title, url)"""
+        sites = {}
+        for entry in self.recent_matches(lambda e: True) + self.ranked:
+            host = entry.key.split("/", 1)[0]
+            if host and host not in sites:
+                sites[host] = (host, entry.title, entry.url)
+                if len(sites) == limit:
+                    break
+        return list(sites.values())
+
+
+class HistoryStore(QObject):
+    """Browsing history in SQLite; all disk I/O happens on a writer thread"""
+
+    loaded = pyqtSignal(object)
+
+    def __init__(self, path, parent=None, batch_delay=0.5):
+        super().__init__(parent)
+        self.path = path
+        self.batch_delay = batch_delay
+        self.index = HistoryIndex()
+        # Visits recorded before the index finished loading, replayed into it afterwards
+        self.pending = []
+        self.queue = queue.Queue()
+        self.loaded.connect(self.index_loaded)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def record_visit(self, qurl):
+        if qurl.scheme() not in RECORDED_SCHEMES:
+            return
+        url, when = qurl.toString(), time.time()
+        self.index.visit(url, "", when)
+        if self.pending is not None:
+            self.pending.append((url, when))
+        self.queue.put(("visit", url, when))
+
+    def set_title(self, qurl, title):
+        if qurl.scheme() not in RECORDED_SCHEMES or not title:
+            return
+        url = qurl.toString()
+        self.index.set_title(url, title)
+        self.queue.put(("title", url, title))
+
+    def suggest(self, text, limit=8):
+        return self.index.suggest(text, limit)
+
+    def top_sites(self, limit):
+        return self.index.top_sites(limit)
+
+    def index_loaded(self, index):
+        for url, when in self.pending:
+            index.visit(url, "", when)
+        self.pending = None
+        self.index = index
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def run(self):
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS history (
+                          url TEXT PRIMARY KEY,
+                          title TEXT NOT NULL DEFAULT '',
+                          visit_count INTEGER NOT NULL DEFAULT 0,
+                          last_visit REAL NOT NULL)""")
+        rows = db.execute("SELECT url, title, visit_count, last_visit FROM history").fetchall()
+        self.loaded.emit(HistoryIndex(rows))
+
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            # Collect whatever else arrives shortly after, and write it in one transaction
+            deadline = time.monotonic() + self.batch_delay
+            while batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            with db:
+                for op in batch:
+                    if op[0] == "visit":
+                        db.execute("""INSERT INTO history (url, visit_count, last_visit) VALUES (?, 1, ?)
+                                      ON CONFLICT(url) DO UPDATE SET visit_count = visit_count + 1,
+                                      last_visit = excluded.last_visit""", op[1:])
+                    else:
+                        db.execute("UPDATE history SET title = ? WHERE url = ?", (op[2], op[1]))
+        db.close()
+
+
+class HistoryCompleter(QCompleter):
+    """URL bar completer fed from the history index, debounced per keystroke"""
+
+    def __init__(self, history, line_edit, delay=30):
+        super().__init__(line_edit)
+        self.history = history
+        self.line_edit = line_edit
+        self.model = QStandardItemModel(self)
+        self.setModel(self.model)
+        self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        # The popup shows "title — url", but choosing an item inserts just the URL
+        self.setCompletionRole(Qt.ItemDataRole.UserRole)
+        line_edit.setCompleter(self)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.update_suggestions)
+        line_edit.textEdited.connect(lambda text: self.timer.start())
+
+    def update_suggestions(self):
+        self.model.clear()
+        for entry in self.history.suggest(self.line_edit.text()):
+            item = QStandardItem(f"{entry.title} — {entry.url}" if entry.title else entry.url)
+            item.setData(entry.url, Qt.ItemDataRole.UserRole)
+            self.model.appendRow(item)
+        if self.model.rowCount():
+            self.complete()
+        else:
+            self.popup().hide()
+
+
+def benchmark(size=200000, rounds=2000):
+    random.seed(0)
+    words = ["news", "docs", "mail", "shop", "video", "wiki", "blog", "forum", "maps", "music",
+             "python", "qt", "linux", "recipes", "travel", "weather", "sports", "finance"]
+    now = time.time()
+    rows = []
+    for i in range(size):
+        host = f"{random.choice(words)}{i % 5000}.{random.choice(['com', 'org', 'net'])}"
+        path = "/".join(random.choices(words, k=3))
+        title = " ".join(random.choices(words, k=4)).title()
+        rows.append((f"https://{host}/{path}/{i}", title, random.randint(1, 50),
+                     now - random.randint(0, 200) * DAY))
+    start = time.perf_counter()
+    index = HistoryIndex(rows)
+    built = time.perf_counter() - start
+
+    queries = ["n", "ne", "new", "news1", "news12", "py", "python", "recipes", "qt/li",
+               "zzz-no-match", "weather sports", "docs4"]
+    timings = []
+    for i in range(rounds):
+        q = queries[i % len(queries)]
+        start = time.perf_counter()
+        index.suggest(q)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"entries:  {len(index)} (index built in {built * 1000:.0f} ms)")
+    print(f"lookup:   mean {sum(timings) / len(timings) * 1000:.3f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:.3f} ms, max {timings[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
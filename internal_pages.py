@@ -0,0 +1,272 @@
+import json
+from html import escape
+from PyQt6.QtCore import QBuffer, QIODevice
+from PyQt6.QtWebEngineCore import (QWebEngineUrlScheme, QWebEngineUrlSchemeHandler,
+                                   QWebEngineUrlRequestJob)
+from fulltext import MATCH_START, MATCH_END
+from load_metrics import QUANTILES
+from reader import original_url
+
+SCHEME = b"elafry"
+NEW_TAB_URL = "elafry://newtab"
+
+
+def register_scheme():
+    """Register the elafry:// scheme; must run before the QApplication is created"""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme |
+                    QWebEngineUrlScheme.Flag.LocalScheme |
+                    QWebEngineUrlScheme.Flag.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def is_internal(qurl):
+    return qurl.scheme() == SCHEME.decode()
+
+
+class InternalSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Serves elafry://<page> URLs from in-memory page providers"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # host -> provider(QUrl) returning (content type, body bytes) or None
+        self.pages = {}
+
+    def add_page(self, host, provider):
+        self.pages[host] = provider
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        provider = self.pages.get(url.host())
+        result = provider(url) if provider else None
+        if result is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        content_type, body = result
+        # The buffer is parented to the job so it lives until the reply is read
+        buf = QBuffer(job)
+        buf.setData(body)
+        buf.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(content_type.encode(), buf)
+
+
+NEW_TAB_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>New Tab</title>
+<style>
+body {{ margin: 0; background: {bg}; color: {fg};
+       font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; }}
+main {{ max-width: 880px; margin: 12vh auto 0; padding: 0 24px; }}
+form {{ display: flex; gap: 8px; margin-bottom: 40px; }}
+input, select {{ font-size: 16px; padding: 12px 18px; border-radius: 24px;
+                border: 2px solid {border}; background: {glass_bg}; color: {fg}; }}
+input {{ flex: 1; outline: none; }}
+input:focus {{ border-color: {accent}; }}
+.sites {{ display: grid; grid-template-columns: repeat(4, 1fr); gap: 16px; }}
+.tile {{ display: block; text-decoration: none; color: {fg}; background: {glass_bg};
+        border: 1px solid {border}; border-radius: 12px; overflow: hidden; }}
+.tile:hover {{ border-color: {accent}; }}
+.tile img, .tile .blank {{ display: block; width: 100%; aspect-ratio: 16 / 10; object-fit: cover;
+                          background: {hover_bg}; }}
+.tile span {{ display: block; padding: 8px 12px; font-size: 13px;
+             white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+</style></head>
+<body><main>
+<form id="search">
+<select id="engine">{engines}</select>
+<input id="q" autofocus autocomplete="off" placeholder="Search the web">
+</form>
+<div class="sites">{tiles}</div>
+</main>
+<script>
+const engines = {engine_urls};
+document.getElementById('search').addEventListener('submit', function(e) {{
+    e.preventDefault();
+    const q = document.getElementById('q').value.trim();
+    if (q) location.href = engines[document.getElementById('engine').value] + encodeURIComponent(q);
+}});
+</script>
+</body></html>
+"""
+
+
+class NewTabPage:
+    """Built-in new tab page: search box and most visited sites with thumbnails"""
+
+    def __init__(self, thumbnails, history, max_sites=8):
+        self.thumbnails = thumbnails
+        self.history = history
+        self.max_sites = max_sites
+
+    def top_sites(self):
+        return self.history.top_sites(self.max_sites)
+
+    def render(self, palette, search_engines, current_engine):
+        engines = "".join(
+            f'<option{" selected" if name == current_engine else ""}>{escape(name)}</option>'
+            for name in search_engines)
+        tiles = []
+        for host, title, url in self.top_sites():
+            if host in self.thumbnails:
+                image = f'<img src="elafry://thumb/{escape(host)}" alt="">'
+            else:
+                image = '<div class="blank"></div>'
+            tiles.append(f'<a class="tile" href="{escape(url)}">{image}<span>{escape(title or host)}</span></a>')
+        # "</" is escaped so page data cannot close the script element
+        engine_urls = json.dumps(search_engines).replace("</", "<\\/")
+        return NEW_TAB_HTML.format(engines=engines, tiles="".join(tiles),
+                                   engine_urls=engine_urls, **palette).encode()
+
+    def thumbnail(self, url):
+        data = self.thumbnails.get(url.path().lstrip("/"))
+        return ("image/jpeg", data) if data is not None else None
+
+
+SEARCH_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ margin: 0; background: {bg}; color: {fg};
+       font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; }}
+main {{ max-width: 760px; margin: 6vh auto; padding: 0 24px; }}
+input {{ width: 100%; box-sizing: border-box; font-size: 16px; padding: 12px 18px; outline: none;
+        border-radius: 24px; border: 2px solid {border}; background: {glass_bg}; color: {fg}; }}
+input:focus {{ border-color: {accent}; }}
+.result {{ margin: 24px 0; }}
+.result a {{ color: {accent}; font-size: 17px; text-decoration: none; }}
+.url {{ font-size: 12px; opacity: 0.7; word-break: break-all; }}
+.snippet {{ font-size: 14px; line-height: 1.5; }}
+mark {{ background: {hover_bg}; color: {fg}; font-weight: 600; }}
+</style></head>
+<body><main>
+<form action="elafry://search" method="get">
+<input name="q" value="{query}" autofocus autocomplete="off" placeholder="Search pages you have visited">
+</form>
+<p>{summary}</p>
+{results}
+</main></body></html>
+"""
+
+
+def render_search_page(palette, query, results):
+    """Results of the full-text history search: (url, title, snippet, indexed_at) rows"""
+    items = []
+    for url, title, snippet, _ in results:
+        snippet = escape(snippet).replace(MATCH_START, "<mark>").replace(MATCH_END, "</mark>")
+        items.append(f'<div class="result"><a href="{escape(url)}">{escape(title or url)}</a>'
+                     f'<div class="url">{escape(url)}</div><div class="snippet">{snippet}</div></div>')
+    if not query:
+        summary = "Type words from a page you have read to find it again."
+    else:
+        summary = f"{len(results)} page{'s' if len(results) != 1 else ''} found"
+    return SEARCH_HTML.format(title=escape(f"{query} - History search" if query else "History search"),
+                              query=escape(query), summary=summary, results="".join(items),
+                              **palette).encode()
+
+
+PERF_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Page load performance</title>
+<style>
+body {{ margin: 0; background: {bg}; color: {fg};
+       font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; }}
+main {{ max-width: 1100px; margin: 4vh auto; padding: 0 24px; }}
+table {{ border-collapse: collapse; width: 100%; margin-bottom: 32px; font-size: 13px; }}
+th, td {{ text-align: right; padding: 6px 10px; border-bottom: 1px solid {border}; }}
+th:first-child, td:first-child {{ text-align: left; }}
+th {{ color: {accent}; font-weight: 600; }}
+td.url {{ max-width: 360px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }}
+tr.failed td {{ opacity: 0.5; }}
+.note {{ font-size: 13px; opacity: 0.7; }}
+</style></head>
+<body><main>
+<h2>Page load performance</h2>
+<p class="note">{note}</p>
+<table><tr><th>Metric</th><th>Loads</th>{quantile_headers}</tr>{summary}</table>
+<h3>Recent loads</h3>
+<table><tr><th>Page</th><th>Load</th><th>TTFB</th><th>FCP</th><th>DOMContentLoaded</th>
+<th>Requests</th><th>KB</th><th>Slowest resource</th></tr>{records}</table>
+</main></body></html>
+"""
+
+
+def format_ms(value):
+    return "–" if value is None else f"{value:.0f} ms"
+
+
+def render_perf_page(palette, summary, records, export_path=None, speculation=None):
+    """elafry://perf: percentiles over the buffered loads, then the loads, newest first"""
+    rows = []
+    for name, stats in summary.items():
+        cells = "".join(f"<td>{format_ms(stats[q])}</td>" for q in QUANTILES)
+        rows.append(f"<tr><td>{escape(name.replace('_', ' '))}</td><td>{stats['count']}</td>{cells}</tr>")
+    loads = []
+    for record in records:
+        slowest = record.timing.get("slowest") or []
+        slowest = f"{slowest[0][2]} ms {slowest[0][0]}" if slowest else ""
+        kb = ((record.timing.get("document_bytes") or 0) + (record.timing.get("resource_bytes") or 0)) / 1024
+        loads.append(
+            f'<tr class="{"ok" if record.ok else "failed"}">'
+            f'<td class="url" title="{escape(record.url)}">{escape(record.url)}</td>'
+            f"<td>{format_ms(record.load_ms)}</td><td>{format_ms(record.value('ttfb'))}</td>"
+            f"<td>{format_ms(record.value('first_contentful_paint'))}</td>"
+            f"<td>{format_ms(record.value('dom_content_loaded'))}</td>"
+            f"<td>{record.timing.get('resources', '')}</td><td>{kb:.0f}</td>"
+            f'<td class="url" title="{escape(slowest)}">{escape(slowest)}</td></tr>')
+    note = f"{len(records)} recent loads."
+    if export_path:
+        note += f" Exported to {escape(export_path)}."
+    if speculation and speculation["intents"]:
+        note += (f" Link hover: {speculation['intents']} intents, {speculation['prerenders']} prerenders,"
+                 f" {speculation['hint_hits'] + speculation['prerender_hits']} used"
+                 f" ({speculation['hit_rate']:.0%}), {speculation['cancelled']} cancelled.")
+    headers = "".join(f"<th>p{round(q * 100)}</th>" for q in QUANTILES)
+    return PERF_HTML.format(note=note, quantile_headers=headers, summary="".join(rows),
+                            records="".join(loads), **palette).encode()
+
+
+READER_HTML = """<!DOCTYPE html>
+<html lang="{lang}" dir="{dir}"><head><meta charset="utf-8">
+<meta http-equiv="Content-Security-Policy"
+      content="default-src 'none'; img-src https: http: data:; style-src 'unsafe-inline'">
+<title>{title}</title>
+<style>
+body {{ margin: 0; background: {bg}; color: {fg}; }}
+main {{ max-width: 42em; margin: 6vh auto; padding: 0 24px;
+        font: 19px/1.6 Georgia, 'Iowan Old Style', 'Noto Serif', serif; }}
+header {{ border-bottom: 1px solid {border}; margin-bottom: 2em; padding-bottom: 1em;
+          font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; }}
+header .site, header .meta {{ font-size: 14px; opacity: 0.7; }}
+h1 {{ font-size: 1.9em; line-height: 1.25; margin: 0.3em 0; }}
+a {{ color: {accent}; }}
+img, figure {{ max-width: 100%; height: auto; margin: 1em 0; }}
+figcaption {{ font-size: 0.8em; opacity: 0.7; }}
+pre {{ overflow-x: auto; font-size: 0.8em; background: {glass_bg}; padding: 12px; }}
+blockquote {{ margin: 1em 0; padding-left: 1em; border-left: 3px solid {border}; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid {border}; padding: 4px 8px; }}
+</style></head>
+<body><main>
+<header><div class="site">{site}</div><h1>{title}</h1>
+<div class="meta">{meta}</div></header>
+<article>{body}</article>
+</main></body></html>
+"""
+
+READER_GONE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="0; url={url}"></head></html>
+"""
+
+
+def render_reader_page(palette, article, url):
+    """elafry://reader/<id>; articles are kept in memory, so a stale one goes back to its page"""
+    if article is None:
+        original = original_url(url)
+        if original.scheme() not in ("http", "https"):
+            return None
+        return READER_GONE_HTML.format(url=escape(original.toString())).encode()
+    minutes = max(1, round(article["words"] / 230))
+    meta = [escape(article["byline"])] if article["byline"] else []
+    meta.append(f"{minutes} min read")
+    meta.append(f'<a href="{escape(article["url"])}">Original page</a>')
+    return READER_HTML.format(lang=escape(article["lang"]), dir=escape(article["dir"] or "auto"),
+                              title=escape(article["title"]), site=escape(article["site"]),
+                              meta=" · ".join(meta), body=article["html"], **palette).encode()
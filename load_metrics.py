@@ -0,0 +1,180 @@
+import json
+import math
+import time
+from collections import deque
+
+# Navigation Timing of the finished page plus a Resource Timing summary, in ms
+# relative to navigation start. Phases that did not happen (no redirect, a
+# reused connection) come back as 0; cross-origin resources without
+# Timing-Allow-Origin report no sizes.
+PAGE_TIMING_JS = """
+(function() {
+    var nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    var paint = performance.getEntriesByName('first-contentful-paint')[0];
+    var resources = performance.getEntriesByType('resource');
+    var bytes = 0, slowest = [];
+    resources.forEach(function(r) {
+        bytes += r.transferSize || 0;
+        slowest.push([r.name.slice(0, 200), r.initiatorType, Math.round(r.duration)]);
+    });
+    slowest.sort(function(a, b) { return b[2] - a[2]; });
+    return {
+        redirect: nav.redirectEnd - nav.redirectStart,
+        dns: nav.domainLookupEnd - nav.domainLookupStart,
+        connect: nav.connectEnd - nav.connectStart,
+        ttfb: nav.responseStart,
+        response: nav.responseEnd - nav.responseStart,
+        dom_interactive: nav.domInteractive,
+        dom_content_loaded: nav.domContentLoadedEventEnd,
+        load_event: nav.loadEventEnd,
+        first_contentful_paint: paint ? paint.startTime : 0,
+        document_bytes: nav.transferSize,
+        resources: resources.length,
+        resource_bytes: bytes,
+        slowest: slowest.slice(0, 5)
+    };
+})()
+"""
+
+# Paint Timing of the page as Unix time in ms, or null if it has not painted (yet)
+PAINT_TIME_JS = """(() => {
+    const e = performance.getEntriesByName("first-contentful-paint")[0] ||
+              performance.getEntriesByName("first-paint")[0];
+    return e ? performance.timeOrigin + e.startTime : null;
+})()"""
+
+# Timings summarized by percentile: name -> (record attribute or timing key, help text)
+SUMMARY_METRICS = {
+    "page_load": ("load_ms", "Time from loadStarted to loadFinished"),
+    "ttfb": ("ttfb", "Time to the first byte of the document"),
+    "first_contentful_paint": ("first_contentful_paint", "First contentful paint"),
+    "dom_content_loaded": ("dom_content_loaded", "End of the DOMContentLoaded event"),
+    "load_event": ("load_event", "End of the load event"),
+}
+QUANTILES = (0.5, 0.95)
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(q * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class LoadRecord:
+    __slots__ = ("url", "host", "started", "first_progress_ms", "load_ms", "ok", "timing")
+
+    def __init__(self, started):
+        self.url = ""
+        self.host = ""
+        self.started = started       # Unix time of loadStarted
+        self.first_progress_ms = None
+        self.load_ms = None
+        self.ok = None
+        self.timing = {}             # PAGE_TIMING_JS result, once it arrives
+
+    def value(self, key):
+        if key in ("load_ms", "first_progress_ms"):
+            return getattr(self, key)
+        value = self.timing.get(key)
+        # 0 means the phase did not happen (or was not exposed)
+        return value if value else None
+
+    def to_dict(self):
+        # Exports carry the host only; full URLs stay in memory for elafry://perf
+        return {"time": round(self.started, 3), "host": self.host, "ok": self.ok,
+                "load_ms": self.load_ms, "first_progress_ms": self.first_progress_ms,
+                **{k: v for k, v in self.timing.items() if k != "slowest"}}
+
+
+class LoadMetrics:
+    """Per-navigation load timings of all tabs, in a bounded ring buffer"""
+
+    def __init__(self, max_records=500):
+        self.records = deque(maxlen=max_records)
+        self.pending = {}    # tab id -> LoadRecord of the load in progress
+        self.last = {}       # tab id -> last finished LoadRecord
+        self.started_at = {}  # tab id -> perf_counter() at loadStarted
+        self.loads_total = {"ok": 0, "failed": 0}
+        self.generation = 0  # bumped on every change, so exports can skip idle periods
+
+    def started(self, tab_id):
+        self.pending[tab_id] = LoadRecord(time.time())
+        self.started_at[tab_id] = time.perf_counter()
+
+    def progress(self, tab_id, value):
+        record = self.pending.get(tab_id)
+        if record is not None and value > 0 and record.first_progress_ms is None:
+            record.first_progress_ms = self.elapsed_ms(tab_id)
+
+    def finished(self, tab_id, url, host, ok):
+        """Close the tab's pending load; returns its record, or None"""
+        record = self.pending.pop(tab_id, None)
+        if record is None:
+            return None
+        # The final URL, after any redirects
+        record.url = url
+        record.host = host
+        record.load_ms = self.elapsed_ms(tab_id)
+        record.ok = ok
+        self.started_at.pop(tab_id, None)
+        self.records.append(record)
+        self.last[tab_id] = record
+        self.loads_total["ok" if ok else "failed"] += 1
+        self.generation += 1
+        return record
+
+    def add_timing(self, record, result):
+        if isinstance(result, dict):
+            record.timing = result
+            self.generation += 1
+
+    def cancel(self, tab_id):
+        """Drop the tab's pending load without recording it"""
+        self.pending.pop(tab_id, None)
+        self.started_at.pop(tab_id, None)
+
+    def forget(self, tab_id):
+        self.cancel(tab_id)
+        self.last.pop(tab_id, None)
+
+    def elapsed_ms(self, tab_id):
+        return round((time.perf_counter() - self.started_at[tab_id]) * 1000, 1)
+
+    def summary(self):
+        """{metric: {"count", "sum", quantile: value}} over the buffered loads, in ms"""
+        result = {}
+        for name, (key, _) in SUMMARY_METRICS.items():
+            values = sorted(v for v in (r.value(key) for r in self.records if r.ok) if v is not None)
+            stats = {"count": len(values), "sum": sum(values)}
+            for q in QUANTILES:
+                stats[q] = percentile(values, q)
+            result[name] = stats
+        return result
+
+    def to_jsonl(self):
+        return "".join(json.dumps(r.to_dict()) + "\n" for r in self.records)
+
+    def to_prometheus(self):
+        """Prometheus text format, e.g. for node_exporter's textfile collector"""
+        lines = ["# HELP elafry_page_loads_total Page loads since the browser started",
+                 "# TYPE elafry_page_loads_total counter"]
+        for result, count in self.loads_total.items():
+            lines.append(f'elafry_page_loads_total{{result="{result}"}} {count}')
+        for name, stats in self.summary().items():
+            metric = f"elafry_{name}_seconds"
+            lines.append(f"# HELP {metric} {SUMMARY_METRICS[name][1]} (last {self.records.maxlen} loads)")
+            lines.append(f"# TYPE {metric} summary")
+            for q in QUANTILES:
+                if stats[q] is not None:
+                    lines.append(f'{metric}{{quantile="{q}"}} {stats[q] / 1000:.4f}')
+            lines.append(f"{metric}_sum {stats['sum'] / 1000:.4f}")
+            lines.append(f"{metric}_count {stats['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export_data(self, path):
+        """Contents of an export file: Prometheus text for *.prom, JSON lines otherwise"""
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_jsonl()
+        return text.encode()
@@ -0,0 +1,351 @@
+"""Content-addressed archive of pages saved for offline reading
+
+Pages arrive as MHTML files written by QWebEnginePage.save(). An MHTML
+file is a MIME multipart document: a header, then one part per resource
+(the page's HTML, each frame, stylesheet, script and image). Every part is
+stored once, zlib-compressed, under the SHA-256 of its bytes, so a
+stylesheet or logo shared by a thousand saved pages of a site takes the
+space of one. A page row keeps its header and the list of part hashes, from
+which the original file is rebuilt byte for byte. An FTS5 table over title,
+URL and page text backs listing and search. Past max_bytes the least
+recently opened pages are evicted and parts nobody references are deleted.
+
+Pure Python so it can be measured on its own:
+
+    python offline_archive.py [page.mhtml ...] [--synthetic 1000]
+"""
+import os
+import sys
+import re
+import time
+import zlib
+import queue
+import shutil
+import sqlite3
+import hashlib
+import threading
+from fulltext import fts_query
+
+BOUNDARY_RE = re.compile(rb'boundary="?([^";\r\n]+)"?', re.IGNORECASE)
+
+
+def split_mhtml(data):
+    """(delimiter, header, parts, trailer) such that delimiter.join([header, *parts, trailer]) == data"""
+    head_end = data.find(b"\r\n\r\n")
+    match = BOUNDARY_RE.search(data, 0, head_end if head_end >= 0 else len(data))
+    if match is None:
+        raise ValueError("not an MHTML file: no multipart boundary")
+    delimiter = b"--" + match.group(1)
+    pieces = data.split(delimiter)
+    if len(pieces) < 3:
+        raise ValueError("not an MHTML file: no parts")
+    return delimiter, pieces[0], pieces[1:-1], pieces[-1]
+
+
+def part_hash(part):
+    return hashlib.sha256(part).hexdigest()
+
+
+class OfflineArchive:
+    """Saved pages and their deduplicated parts in one SQLite file
+
+    Writes (adding, deleting, marking pages opened) happen on a writer
+    thread; listing, search and opening read through a separate connection.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, level=6):
+        self.directory = directory
+        self.path = os.path.join(directory, "archive.sqlite")
+        # Rebuilt MHTML files being viewed; the browser loads them from here
+        self.view_dir = os.path.join(directory, "view")
+        self.max_bytes = max_bytes
+        self.level = level
+        shutil.rmtree(self.view_dir, ignore_errors=True)
+        os.makedirs(self.view_dir, exist_ok=True)
+        self.reader = None
+        self.ready = threading.Event()  # schema exists
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, mhtml_path, url, title, text="", done=None):
+        """Archive an MHTML file (deleted afterwards); done(page id or None, raw bytes, new stored bytes)"""
+        self.queue.put(("add", (mhtml_path, url, title or "", text or "", done)))
+
+    def delete(self, page_id):
+        self.queue.put(("delete", page_id))
+
+    def touch(self, page_id):
+        self.queue.put(("touch", page_id))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+        if self.reader is not None:
+            self.reader.close()
+
+    # Reading
+
+    def connection(self):
+        if self.reader is None:
+            self.ready.wait(5)
+            self.reader = sqlite3.connect(self.path)
+        return self.reader
+
+    def search(self, text="", limit=200):
+        """[(id, url, title, saved_at, raw_size)]; most recently saved first, or best match first"""
+        db = self.connection()
+        try:
+            match = fts_query(text)
+            if not match:
+                return db.execute("SELECT id, url, title, saved_at, raw_size FROM pages "
+                                  "ORDER BY saved_at DESC LIMIT ?", (limit,)).fetchall()
+            return db.execute("""SELECT p.id, p.url, p.title, p.saved_at, p.raw_size
+                                 FROM page_text JOIN pages p ON p.id = page_text.rowid
+                                 WHERE page_text MATCH ?
+                                 ORDER BY bm25(page_text, 5.0, 2.0, 1.0) LIMIT ?""",
+                              (match, limit)).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def stats(self):
+        """{"pages", "raw_bytes" (as saved), "stored_bytes" (on disk), "parts"}"""
+        db = self.connection()
+        pages, raw, headers = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(header)), 0) FROM pages").fetchone()
+        parts, stored = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()
+        return {"pages": pages, "raw_bytes": raw, "stored_bytes": stored + headers, "parts": parts}
+
+    def rebuild(self, page_id):
+        """The page's original MHTML bytes, or None"""
+        db = self.connection()
+        row = db.execute("SELECT header, trailer, delimiter, parts FROM pages WHERE id = ?",
+                         (page_id,)).fetchone()
+        if row is None:
+            return None
+        header, trailer, delimiter, hashes = row
+        pieces = [zlib.decompress(header)]
+        for digest in hashes.split():
+            blob = db.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+            if blob is None:
+                return None
+            pieces.append(zlib.decompress(blob[0]))
+        pieces.append(trailer)
+        return delimiter.join(pieces)
+
+    def materialize(self, page_id):
+        """Path of an .mhtml file for the page, for loading as a file: URL; None if gone"""
+        path = os.path.join(self.view_dir, f"{page_id}.mhtml")
+        if not os.path.exists(path):
+            data = self.rebuild(page_id)
+            if data is None:
+                return None
+            with open(path, "wb") as f:
+                f.write(data)
+        self.touch(page_id)
+        return path
+
+    # Writer thread
+
+    def run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        db = sqlite3.connect(self.path)
+        # Must be set before the first table is created to take effect
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""CREATE TABLE IF NOT EXISTS pages (
+                          id INTEGER PRIMARY KEY,
+                          url TEXT NOT NULL,
+                          title TEXT NOT NULL,
+                          saved_at REAL NOT NULL,
+                          opened_at REAL NOT NULL,
+                          header BLOB NOT NULL,
+                          trailer BLOB NOT NULL,
+                          delimiter BLOB NOT NULL,
+                          parts TEXT NOT NULL,
+                          raw_size INTEGER NOT NULL)""")
+        db.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url)")
+        db.execute("CREATE INDEX IF NOT EXISTS pages_opened_at ON pages (opened_at)")
+        db.execute("""CREATE TABLE IF NOT EXISTS blobs (
+                          hash TEXT PRIMARY KEY,
+                          data BLOB NOT NULL,
+                          refs INTEGER NOT NULL) WITHOUT ROWID""")
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5(title, url, body)")
+        db.commit()
+        self.ready.set()
+        # Kept up to date by store() and remove(), so eviction checks need no scan
+        self.stored_bytes = self.measure(db)
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            action, args = item
+            done = args[-1] if action == "add" else None
+            evicted = 0
+            try:
+                with db:
+                    if action == "add":
+                        result = self.store(db, *args[:-1])
+                        evicted = self.evict(db, keep=result[0])
+                    elif action == "delete":
+                        self.remove(db, args)
+                    elif action == "touch":
+                        # Opening a page adds nothing, so there is nothing to evict
+                        db.execute("UPDATE pages SET opened_at = ? WHERE id = ?", (time.time(), args))
+                if evicted:
+                    db.execute("PRAGMA incremental_vacuum")
+            except (sqlite3.Error, OSError, ValueError, zlib.error) as e:
+                print(f"Offline archive: {action} failed: {e}", file=sys.stderr)
+                result = (None, 0, 0)
+                # The transaction was rolled back; the running total may not have been
+                self.stored_bytes = self.measure(db)
+            if done is not None:
+                # After the commit, so the page is visible to readers
+                done(*result)
+        db.close()
+
+    def store(self, db, mhtml_path, url, title, text):
+        """(page id, raw bytes, bytes the page added to the archive)"""
+        try:
+            with open(mhtml_path, "rb") as f:
+                data = f.read()
+        finally:
+            try:
+                os.remove(mhtml_path)
+            except OSError:
+                pass
+        delimiter, header, parts, trailer = split_mhtml(data)
+        # A page saved again replaces its older copy
+        for (old_id,) in db.execute("SELECT id FROM pages WHERE url = ?", (url,)).fetchall():
+            self.remove(db, old_id)
+        hashes = []
+        new_bytes = 0
+        for part in parts:
+            digest = part_hash(part)
+            hashes.append(digest)
+            if db.execute("UPDATE blobs SET refs = refs + 1 WHERE hash = ?", (digest,)).rowcount == 0:
+                compressed = zlib.compress(part, self.level)
+                db.execute("INSERT INTO blobs (hash, data, refs) VALUES (?, ?, 1)", (digest, compressed))
+                new_bytes += len(compressed)
+        compressed_header = zlib.compress(header, self.level)
+        if new_bytes + len(compressed_header) > self.max_bytes:
+            # Rolled back by the caller; it could only be kept by evicting everything, itself included
+            raise ValueError(f"{url} is larger than the archive's {self.max_bytes} byte budget")
+        self.stored_bytes += new_bytes + len(compressed_header)
+        now = time.time()
+        page_id = db.execute(
+            """INSERT INTO pages (url, title, saved_at, opened_at, header, trailer, delimiter, parts, raw_size)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (url, title, now, now, compressed_header, trailer, delimiter, " ".join(hashes), len(data))).lastrowid
+        db.execute("INSERT INTO page_text (rowid, title, url, body) VALUES (?, ?, ?, ?)",
+                   (page_id, title, url, text))
+        return page_id, len(data), new_bytes + len(compressed_header)
+
+    def remove(self, db, page_id):
+        row = db.execute("SELECT parts, LENGTH(header) FROM pages WHERE id = ?", (page_id,)).fetchone()
+        if row is None:
+            return
+        freed = row[1]
+        for digest in row[0].split():
+            db.execute("UPDATE blobs SET refs = refs - 1 WHERE hash = ?", (digest,))
+            orphan = db.execute("SELECT LENGTH(data) FROM blobs WHERE hash = ? AND refs <= 0",
+                                (digest,)).fetchone()
+            if orphan is not None:
+                db.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+                freed += orphan[0]
+        self.stored_bytes -= freed
+        db.execute("DELETE FROM page_text WHERE rowid = ?", (page_id,))
+        db.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+        try:
+            os.remove(os.path.join(self.view_dir, f"{page_id}.mhtml"))
+        except OSError:
+            pass
+
+    def measure(self, db):
+        """Stored bytes, counted the slow way; once at startup and after a failed write"""
+        return db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM blobs").fetchone()[0] + \
+            db.execute("SELECT COALESCE(SUM(LENGTH(header)), 0) FROM pages").fetchone()[0]
+
+    def evict(self, db, keep=None):
+        """Remove the least recently opened pages, other than keep, until the archive fits max_bytes"""
+        evicted = 0
+        while self.stored_bytes > self.max_bytes:
+            row = db.execute("SELECT id FROM pages WHERE id IS NOT ? ORDER BY opened_at LIMIT 1",
+                             (keep,)).fetchone()
+            if row is None:
+                break
+            self.remove(db, row[0])
+            evicted += 1
+        return evicted
+
+
+def synthetic_mhtml(i, sites=20):
+    """A Blink-style MHTML page: unique HTML plus its site's shared stylesheet, script and logo"""
+    import base64
+    import random
+    site = i % sites
+    rng = random.Random(i)
+    boundary = f"----MultipartBoundary--{rng.getrandbits(64):016x}----"
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "tempor", "labore", "magna", "aliqua", "elit"]
+    html = "<html><body>" + "".join(
+        f"<p>{' '.join(rng.choice(words) for _ in range(60))}</p>" for _ in range(30)) + "</body></html>"
+    shared = random.Random(site)
+    css = "".join(f".c{k} {{ margin: {shared.randint(0, 20)}px; color: #{shared.getrandbits(24):06x}; }}\r\n"
+                  for k in range(800))
+    js = "".join(f"function f{k}(a) {{ return a * {shared.randint(1, 99)}; }}\r\n" for k in range(1500))
+    logo = base64.encodebytes(shared.randbytes(30_000)).replace(b"\n", b"\r\n").decode()
+    parts = [("text/html", "quoted-printable", f"https://site{site}.test/page{i}", html),
+             ("text/css", "quoted-printable", f"https://site{site}.test/style.css", css),
+             ("application/javascript", "quoted-printable", f"https://site{site}.test/app.js", js),
+             ("image/png", "base64", f"https://site{site}.test/logo.png", logo)]
+    out = [f"From: <Saved by Blink>\r\nSnapshot-Content-Location: https://site{site}.test/page{i}\r\n"
+           f"Subject: Page {i}\r\nMIME-Version: 1.0\r\nContent-Type: multipart/related;\r\n"
+           f"\ttype=\"text/html\";\r\n\tboundary=\"{boundary}\"\r\n\r\n\r\n"]
+    for content_type, encoding, location, body in parts:
+        out.append(f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Transfer-Encoding: {encoding}\r\n"
+                   f"Content-Location: {location}\r\n\r\n{body}\r\n")
+    out.append(f"--{boundary}--\r\n")
+    return "".join(out).encode()
+
+
+def benchmark(paths, synthetic=1000):
+    import tempfile
+    with tempfile.TemporaryDirectory() as work:
+        archive = OfflineArchive(os.path.join(work, "archive"), max_bytes=1 << 40)
+        sources = []
+        for i, path in enumerate(paths):
+            # The archive deletes what it ingests, so it gets a copy
+            copy = os.path.join(work, f"{i}.mhtml")
+            shutil.copy(path, copy)
+            sources.append((copy, f"file://{os.path.abspath(path)}"))
+        for i in range(0 if paths else synthetic):
+            path = os.path.join(work, f"{i}.mhtml")
+            with open(path, "wb") as f:
+                f.write(synthetic_mhtml(i))
+            sources.append((path, f"https://site{i % 20}.test/page{i}"))
+        done = threading.Event()
+        start = time.perf_counter()
+        for n, (path, url) in enumerate(sources, 1):
+            archive.add(path, url, os.path.basename(url),
+                        done=(lambda *result: done.set()) if n == len(sources) else None)
+        done.wait()
+        elapsed = time.perf_counter() - start
+        stats = archive.stats()
+        start = time.perf_counter()
+        rebuilt = archive.rebuild(archive.search(limit=1)[0][0])
+        read_ms = (time.perf_counter() - start) * 1000
+        archive.close()
+    print(f"{stats['pages']} pages, {stats['parts']} distinct parts, ingested in {elapsed:.2f} s")
+    print(f"MHTML {stats['raw_bytes'] / 1e6:.1f} MB -> archive {stats['stored_bytes'] / 1e6:.1f} MB "
+          f"({stats['stored_bytes'] / max(stats['raw_bytes'], 1):.1%}); "
+          f"rebuilding one page ({len(rebuilt) / 1024:.0f} KB) took {read_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline archive size and speed")
+    parser.add_argument("paths", nargs="*", help="MHTML files; synthetic pages if none")
+    parser.add_argument("--synthetic", type=int, default=1000)
+    args = parser.parse_args()
+    benchmark(args.paths, args.synthetic)
@@ -0,0 +1,178 @@
+"""Saving pages for offline reading, and the Offline Pages dialog
+
+OfflineSaver asks QWebEnginePage.save() for an MHTML snapshot, waits for
+the save-page download it starts to finish and hands the file to the
+OfflineArchive. Saved pages are opened from a rebuilt .mhtml file, which
+Chromium renders entirely from the archive; the content blocker refuses any
+network request such a page still makes.
+"""
+import os
+import time
+import uuid
+import shutil
+from PyQt6.QtCore import QObject, QUrl, Qt, pyqtSignal
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QLineEdit,
+                             QPushButton, QLabel, QHeaderView, QAbstractItemView)
+from PyQt6.QtWebEngineCore import QWebEngineDownloadRequest, QWebEngineScript
+from task_manager import SortItem, MB
+
+_DS = QWebEngineDownloadRequest.DownloadState
+
+
+class OfflineSaver(QObject):
+    """Turns pages into archive entries; saved(url, raw bytes, stored bytes) or failed(url)"""
+
+    saved = pyqtSignal(str, int, int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, archive, profile, parent=None):
+        super().__init__(parent)
+        self.archive = archive
+        # Snapshots on their way into the archive; leftovers are from saves that never finished
+        self.incoming = os.path.join(archive.directory, "incoming")
+        shutil.rmtree(self.incoming, ignore_errors=True)
+        os.makedirs(self.incoming, exist_ok=True)
+        self.pending = {}  # MHTML path -> [url, title, page text or None, finished]
+        profile.downloadRequested.connect(self.download_requested)
+
+    def save(self, page, text_script):
+        url = page.url().toString()
+        path = os.path.normpath(os.path.join(self.incoming, f"{uuid.uuid4().hex}.mhtml"))
+        self.pending[path] = entry = [url, page.title(), None, False]
+
+        def text_ready(text):
+            entry[2] = text if isinstance(text, str) else ""
+            self.ingest(path)
+
+        # Text for the search index, taken while the page is still as it was saved
+        page.runJavaScript(text_script, QWebEngineScript.ScriptWorldId.ApplicationWorld, text_ready)
+        page.save(path, QWebEngineDownloadRequest.SavePageFormat.MimeHtmlSaveFormat)
+
+    def download_requested(self, download):
+        # save() accepts its own download; other downloads are not ours
+        if not download.isSavePageDownload():
+            return
+        path = os.path.normpath(os.path.join(download.downloadDirectory(), download.downloadFileName()))
+        if path not in self.pending:
+            return
+        download.isFinishedChanged.connect(lambda: self.download_finished(download, path))
+
+    def download_finished(self, download, path):
+        entry = self.pending.get(path)
+        if entry is None:
+            return
+        if download.state() != _DS.DownloadCompleted:
+            del self.pending[path]
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.failed.emit(entry[0])
+            return
+        entry[3] = True
+        self.ingest(path)
+
+    def ingest(self, path):
+        """Archive once both the file and the text are there"""
+        entry = self.pending.get(path)
+        if entry is None or entry[2] is None or not entry[3]:
+            return
+        del self.pending[path]
+        url = entry[0]
+        # Emitted from the archive's thread; the signal queues it to the GUI thread
+        self.archive.add(path, url, entry[1], entry[2],
+                         lambda page_id, raw, stored: self.saved.emit(url, raw, stored) if page_id
+                         else self.failed.emit(url))
+
+
+def format_size(size):
+    return f"{size / MB:.1f} MB" if size >= MB else f"{size / 1024:.0f} KB"
+
+
+class OfflinePages(QDialog):
+    """Searchable list of saved pages; open_requested(QUrl) asks for one in a new tab"""
+
+    COLUMNS = ("Title", "Address", "Saved", "Size")
+    open_requested = pyqtSignal(QUrl)
+
+    def __init__(self, archive, parent=None):
+        super().__init__(parent)
+        self.archive = archive
+        self.setWindowTitle("Offline Pages - Elafrý")
+        self.resize(760, 420)
+
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Search saved pages")
+        self.search.setClearButtonEnabled(True)
+        self.search.textChanged.connect(self.refresh)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.table.doubleClicked.connect(lambda index: self.open_selected())
+
+        self.total_label = QLabel()
+        open_btn = QPushButton("Open")
+        open_btn.clicked.connect(self.open_selected)
+        delete_btn = QPushButton("Delete")
+        delete_btn.clicked.connect(self.delete_selected)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.total_label)
+        buttons.addStretch()
+        for btn in (open_btn, delete_btn):
+            buttons.addWidget(btn)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.search)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        rows = self.archive.search(self.search.text())
+        # Search results stay in rank order; the plain list can be sorted
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, (page_id, url, title, saved_at, raw_size) in enumerate(rows):
+            cells = (
+                SortItem(title or url, (title or url).lower()),
+                SortItem(url, url),
+                SortItem(time.strftime("%Y-%m-%d %H:%M", time.localtime(saved_at)), saved_at),
+                SortItem(format_size(raw_size), raw_size),
+            )
+            for column, item in enumerate(cells):
+                item.setData(Qt.ItemDataRole.UserRole, page_id)
+                self.table.setItem(row, column, item)
+        if not self.search.text().strip():
+            self.table.setSortingEnabled(True)
+        stats = self.archive.stats()
+        self.total_label.setText(f"{stats['pages']} pages, {format_size(stats['raw_bytes'])} "
+                                 f"saved in {format_size(stats['stored_bytes'])}")
+
+    def selected_ids(self):
+        return [self.table.item(index.row(), 0).data(Qt.ItemDataRole.UserRole)
+                for index in self.table.selectionModel().selectedRows()]
+
+    def open_selected(self):
+        for page_id in self.selected_ids():
+            path = self.archive.materialize(page_id)
+            if path is not None:
+                self.open_requested.emit(QUrl.fromLocalFile(path))
+
+    def delete_selected(self):
+        ids = self.selected_ids()
+        for page_id in ids:
+            self.archive.delete(page_id)
+        # Deletes are queued to the archive's thread; drop the rows here right away
+        for row in reversed(range(self.table.rowCount())):
+            if self.table.item(row, 0).data(Qt.ItemDataRole.UserRole) in ids:
+                self.table.removeRow(row)
@@ -0,0 +1,353 @@
+"""Reader mode: the main article of a page, re-rendered as script-free local HTML
+
+A QWebEngineScript in the application world (invisible to the page's own
+scripts) defines elafryReader() in every page. Toggling reader mode calls
+it: a Readability-style scorer credits each paragraph's text to its parent
+and grandparent, weighs tags and class names, discounts link-heavy blocks
+and returns the best block, cleaned of navigation, forms and clutter, with
+absolute URLs. The HTML is sanitized against a tag whitelist here and kept
+in memory; elafry://reader/<id> renders it in the window's theme, with a
+policy that forbids scripts. The tab navigates to that page, so the
+original page's renderer is freed, or kept frozen by the back/forward
+cache; Back or toggling again returns to it.
+
+    python reader.py [--settle 5] [fixture.html ...]
+
+loads fixtures from bench_fixtures and compares the renderer's memory and
+CPU use on the original page and on its reader version.
+"""
+import re
+import time
+from collections import OrderedDict
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, quote
+from PyQt6.QtCore import QUrl
+from PyQt6.QtWebEngineCore import QWebEngineScript
+
+READER_JS = r"""
+(function() {
+    const POSITIVE = /article|body|content|entry|main|page|post|text|blog|story/i;
+    const NEGATIVE = /\bads?\b|ad-|banner|comment|contact|foot|masthead|meta|nav|outbrain|promo|related|share|sidebar|social|sponsor|tags|ticker|tool|widget/i;
+    const DROP = "script, style, noscript, template, iframe, object, embed, form, button, input, " +
+                 "select, textarea, nav, aside, footer, svg, canvas, video, audio";
+    const TAG_WEIGHTS = {ARTICLE: 10, MAIN: 8, DIV: 5, SECTION: 3, PRE: 3, TD: 3, BLOCKQUOTE: 3,
+                         OL: -3, UL: -3, DL: -3, LI: -3, ADDRESS: -3, FORM: -3,
+                         H1: -5, H2: -5, H3: -5, H4: -5, H5: -5, H6: -5, TH: -5};
+
+    function classWeight(el) {
+        let weight = 0;
+        for (const name of [el.getAttribute("class"), el.id]) {
+            if (!name) continue;
+            if (NEGATIVE.test(name)) weight -= 25;
+            if (POSITIVE.test(name)) weight += 25;
+        }
+        return weight;
+    }
+
+    function linkDensity(el) {
+        const length = el.textContent.length;
+        if (!length) return 0;
+        let links = 0;
+        for (const a of el.querySelectorAll("a")) links += a.textContent.length;
+        return links / length;
+    }
+
+    function meta(selector) {
+        const el = document.querySelector(selector);
+        return el ? (el.getAttribute("content") || el.textContent || "").trim() : "";
+    }
+
+    window.elafryReader = function() {
+        if (!document.body) return null;
+        const scores = new Map();
+        function credit(el, points) {
+            if (!el || el === document.body.parentElement) return;
+            if (!scores.has(el)) scores.set(el, (TAG_WEIGHTS[el.tagName] || 0) + classWeight(el));
+            scores.set(el, scores.get(el) + points);
+        }
+        for (const p of document.body.querySelectorAll("p, pre, td")) {
+            const text = p.textContent.trim();
+            if (text.length < 25) continue;
+            const points = 1 + text.split(",").length + Math.min(Math.floor(text.length / 100), 3);
+            credit(p.parentElement, points);
+            credit(p.parentElement && p.parentElement.parentElement, points / 2);
+        }
+        let best = null, bestScore = 0;
+        for (const [el, score] of scores) {
+            const adjusted = score * (1 - linkDensity(el));
+            if (adjusted > bestScore) { best = el; bestScore = adjusted; }
+        }
+        if (!best) return null;
+
+        const content = best.cloneNode(true);
+        content.querySelectorAll(DROP).forEach(e => e.remove());
+        // Blocks flagged as clutter or made of links, unless they carry real text
+        for (const e of Array.from(content.querySelectorAll("div, section, header, ul, ol, table, figure, p"))) {
+            if (!content.contains(e)) continue;
+            const length = e.textContent.trim().length;
+            if ((classWeight(e) < 0 && length < 1000) || (linkDensity(e) > 0.5 && length < 500) ||
+                (e.tagName !== "P" && length === 0 && !e.querySelector("img"))) {
+                e.remove();
+            }
+        }
+        for (const a of content.querySelectorAll("a[href]")) a.setAttribute("href", a.href);
+        for (const img of content.querySelectorAll("img")) {
+            // Lazy-loading images keep the real address in a data attribute
+            let src = img.getAttribute("src") || "";
+            if (!src || src.startsWith("data:")) src = img.dataset.src || img.dataset.original || src;
+            if (src) img.setAttribute("src", new URL(src, document.baseURI).href);
+        }
+
+        const headline = content.querySelector("h1");
+        const title = meta('meta[property="og:title"]') || (headline && headline.textContent.trim()) ||
+                      document.title;
+        if (headline && headline.textContent.trim() === title) headline.remove();
+        const text = content.textContent.trim();
+        if (text.length < 250) return null;
+        return {
+            url: location.href,
+            site: meta('meta[property="og:site_name"]') || location.hostname,
+            title: title,
+            byline: meta('meta[name="author"]') || meta('[rel="author"], .byline, .author'),
+            lang: document.documentElement.lang || "",
+            dir: document.dir || "",
+            words: text.split(/\s+/).length,
+            html: content.innerHTML
+        };
+    };
+})();
+"""
+
+EXTRACT_CALL = "typeof elafryReader === 'function' ? elafryReader() : null"
+
+ALLOWED_TAGS = {
+    "p", "br", "hr", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "code", "kbd", "samp",
+    "em", "strong", "b", "i", "u", "s", "small", "sub", "sup", "mark", "abbr", "cite", "q", "time",
+    "ul", "ol", "li", "dl", "dt", "dd", "figure", "figcaption", "img", "a", "span", "div", "section",
+    "table", "caption", "thead", "tbody", "tfoot", "tr", "th", "td",
+}
+ALLOWED_ATTRIBUTES = {"a": {"href", "title"}, "img": {"src", "alt", "title", "width", "height"},
+                      "td": {"colspan", "rowspan"}, "th": {"colspan", "rowspan"},
+                      "abbr": {"title"}, "time": {"datetime"}, "ol": {"start"}}
+# Dropped with everything inside them
+DROPPED_TAGS = {"script", "style", "template", "svg", "math", "iframe", "object", "embed", "noscript",
+                "title", "head", "select", "textarea", "button"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+             "source", "track", "wbr"}
+SAFE_URL = re.compile(r"^(https?:|mailto:|#)", re.IGNORECASE)
+SAFE_IMAGE = re.compile(r"^(https?:|data:image/(png|gif|jpeg|webp);)", re.IGNORECASE)
+
+
+class Sanitizer(HTMLParser):
+    """Rebuilds HTML keeping only whitelisted tags and attributes"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open = []  # allowed tags opened and not yet closed
+        self.dropping = 0  # depth inside a dropped tag
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            if tag not in VOID_TAGS:
+                self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        kept = []
+        allowed = ALLOWED_ATTRIBUTES.get(tag, ())
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name == "href" and not SAFE_URL.match(value.strip()):
+                continue
+            if name == "src" and not SAFE_IMAGE.match(value.strip()):
+                continue
+            kept.append(f' {name}="{escape(value)}"')
+        if tag == "a":
+            kept.append(' rel="noreferrer"')
+        self.out.append(f"<{tag}{''.join(kept)}>")
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in self.open and self.open[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open:
+            return
+        # Close whatever the page left open inside this tag
+        while self.open:
+            inner = self.open.pop()
+            self.out.append(f"</{inner}>")
+            if inner == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        return "".join(self.out) + "".join(f"</{tag}>" for tag in reversed(self.open))
+
+
+def sanitize(html):
+    parser = Sanitizer()
+    parser.feed(html)
+    return parser.result()
+
+
+def install_script(profile):
+    """Make elafryReader() available in the application world of every page"""
+    script = QWebEngineScript()
+    script.setName("elafry-reader")
+    script.setSourceCode(READER_JS)
+    script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentReady)
+    script.setWorldId(QWebEngineScript.ScriptWorldId.ApplicationWorld)
+    script.setRunsOnSubFrames(False)
+    profile.scripts().insert(script)
+
+
+def is_reader(qurl):
+    return qurl.scheme() == "elafry" and qurl.host() == "reader"
+
+
+def original_url(qurl):
+    """The page a reader URL was made from"""
+    params = parse_qs(qurl.query(QUrl.ComponentFormattingOption.FullyEncoded))
+    return QUrl(params.get("url", [""])[0])
+
+
+class ReaderMode:
+    """Extracted articles by id, most recent last, for elafry://reader/<id>"""
+
+    def __init__(self, max_articles=32):
+        self.max_articles = max_articles
+        self.articles = OrderedDict()
+        self.next_id = 1
+
+    def add(self, result):
+        """Store elafryReader()'s result; its reader URL, or None if it found no article"""
+        if not isinstance(result, dict) or not isinstance(result.get("html"), str):
+            return None
+        article = {key: str(result.get(key) or "") for key in ("url", "site", "title", "byline", "lang", "dir")}
+        article["words"] = int(result.get("words") or 0)
+        start = time.perf_counter()
+        article["html"] = sanitize(result["html"])
+        article["sanitize_ms"] = (time.perf_counter() - start) * 1000
+        article_id = str(self.next_id)
+        self.next_id += 1
+        self.articles[article_id] = article
+        while len(self.articles) > self.max_articles:
+            self.articles.popitem(last=False)
+        return QUrl(f"elafry://reader/{article_id}?url={quote(article['url'], safe='')}")
+
+    def get(self, qurl):
+        article = self.articles.get(qurl.path().strip("/"))
+        if article is not None:
+            self.articles.move_to_end(qurl.path().strip("/"))
+        return article
+
+
+def benchmark(fixtures=("news.html", "article.html"), settle=5.0):
+    import os
+    import sys
+    import tempfile
+    from PyQt6.QtCore import QEventLoop, QTimer
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtWebEngineWidgets import QWebEngineView
+    from PyQt6.QtWebEngineCore import QWebEnginePage
+    from internal_pages import register_scheme, render_reader_page
+    from web_profile import WebProfile
+    from theme import PALETTES
+    from task_manager import process_stats, MB
+    import bench
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    register_scheme()
+    app = QApplication(sys.argv)
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+    server, base_url = bench.serve_directory(directory)
+    reader = ReaderMode()
+    storage = tempfile.mkdtemp(prefix="elafry-reader-")
+    web_profile = WebProfile(storage, name="reader-bench", parent=app)
+    # Providers return (content type, body), as BrowserWindow.render_reader does
+    web_profile.pages.add_page(
+        "reader", lambda url: ("text/html", render_reader_page(PALETTES["light"], reader.get(url), url)))
+    install_script(web_profile.profile)
+    view = QWebEngineView()
+    # The profile with the extraction script and the elafry:// handler, not Qt's default one
+    view.setPage(QWebEnginePage(web_profile.profile, view))
+    view.resize(1280, 800)
+    view.show()  # Hidden views are throttled, which would hide the page's real cost
+
+    def wait(seconds):
+        loop = QEventLoop()
+        QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec()
+
+    def load(url):
+        loop = QEventLoop()
+        view.loadFinished.connect(loop.quit)
+        view.setUrl(url)
+        loop.exec()
+        view.loadFinished.disconnect(loop.quit)
+
+    def evaluate(script):
+        loop = QEventLoop()
+        result = []
+        view.page().runJavaScript(script, QWebEngineScript.ScriptWorldId.ApplicationWorld,
+                                  lambda value: (result.append(value), loop.quit()))
+        loop.exec()
+        return result[0]
+
+    def measure():
+        """(PSS or RSS bytes, CPU %) of the view's renderer over `settle` seconds"""
+        wait(settle / 2)
+        pid = view.page().renderProcessPid()
+        before = process_stats(pid, with_pss=True)
+        start = time.monotonic()
+        wait(settle / 2)
+        after = process_stats(pid, with_pss=True)
+        if before is None or after is None:
+            return None, None
+        cpu = (after[2] - before[2]) / (time.monotonic() - start) * 100
+        return after[1] or after[0], cpu
+
+    for name in fixtures:
+        load(QUrl(base_url + name))
+        original_memory, original_cpu = measure()
+        start = time.perf_counter()
+        result = evaluate(EXTRACT_CALL)
+        extract_ms = (time.perf_counter() - start) * 1000
+        url = reader.add(result)
+        if url is None:
+            print(f"{name}: no article found")
+            continue
+        article = reader.get(url)
+        load(url)
+        reader_memory, reader_cpu = measure()
+        print(f"{name}: {article['words']} words extracted in {extract_ms:.0f} ms "
+              f"(+{article['sanitize_ms']:.1f} ms sanitizing)")
+        if original_memory is None or reader_memory is None:
+            print("  renderer memory and CPU are not available on this platform")
+            continue
+        print(f"  original: {original_memory / MB:.0f} MB, {original_cpu:.1f}% CPU; "
+              f"reader: {reader_memory / MB:.0f} MB, {reader_cpu:.1f}% CPU; "
+              f"saved {(original_memory - reader_memory) / MB:.0f} MB and {original_cpu - reader_cpu:.1f}% CPU")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reader mode memory and CPU savings")
+    parser.add_argument("fixtures", nargs="*", default=["news.html", "article.html"])
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds to let each page run before measuring")
+    args = parser.parse_args()
+    benchmark(args.fixtures, args.settle)
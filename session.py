@@ -0,0 +1,190 @@
+import os
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QByteArray, QDataStream, QIODevice, QObject, QTimer, Qt, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout, QPushButton
+
+
+def atomic_write(path, data):
+    """Write bytes so that readers only ever see the old or the new file"""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def serialize_history(history):
+    """Serialize a QWebEngineHistory (back/forward list) to bytes"""
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.OpenModeFlag.WriteOnly)
+    stream << history
+    return bytes(data)
+
+
+def restore_history(history, data):
+    """Load serialized history into a page; this also navigates to its current item"""
+    stream = QDataStream(QByteArray(data), QIODevice.OpenModeFlag.ReadOnly)
+    stream >> history
+
+
+class ClosedTabStore:
+    """Recently closed tabs, kept as serialized history instead of live views"""
+
+    def __init__(self, max_tabs=25, max_bytes=2 * 1024 * 1024):
+        self.max_tabs = max_tabs
+        self.max_bytes = max_bytes
+        self.entries = deque()  # (title, url string, history bytes), newest last
+        self.total_bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def push(self, title, url, history_data):
+        self.entries.append((title, url, history_data))
+        self.total_bytes += len(history_data)
+        # Drop the oldest entries once over either limit
+        while self.entries and (len(self.entries) > self.max_tabs or self.total_bytes > self.max_bytes):
+            _, _, dropped = self.entries.popleft()
+            self.total_bytes -= len(dropped)
+
+    def pop(self):
+        if not self.entries:
+            return None
+        entry = self.entries.pop()
+        self.total_bytes -= len(entry[2])
+        return entry
+
+
+class TabPlaceholder(QWidget):
+    """Stands in for a restored tab until it is first activated
+
+    A placeholder for a tab whose renderer died carries a message and the
+    tab's history, and only loads when its Reload button is pressed.
+    """
+
+    reload_requested = pyqtSignal()
+
+    def __init__(self, tab_id, title, url, message=None, history=None):
+        super().__init__()
+        self.tab_id = tab_id
+        self.title = title
+        self.url = url
+        self.crashed = message is not None
+        self.history = history
+        layout = QVBoxLayout(self)
+        layout.addStretch()
+        label = QLabel(f"{message}\n\n{title}\n{url}" if self.crashed else f"{title}\n{url}")
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(label)
+        if self.crashed:
+            button = QPushButton("Reload")
+            button.clicked.connect(self.reload_requested)
+            layout.addWidget(button, alignment=Qt.AlignmentFlag.AlignCenter)
+        layout.addStretch()
+
+
+class SessionStore(QObject):
+    """Crash-safe session on disk: a small tab index plus one history file per tab
+
+    Saves are debounced, only tabs marked dirty have their history rewritten,
+    and all file I/O happens on a single writer thread.
+    """
+
+    def __init__(self, directory, collect, serialize, parent=None, save_delay=1500):
+        super().__init__(parent)
+        self.directory = directory
+        self.tabs_dir = os.path.join(directory, "tabs")
+        os.makedirs(self.tabs_dir, exist_ok=True)
+        self.index_path = os.path.join(directory, "session.json")
+
+        # collect() -> [(current index, [(tab_id, title, url), ...]) per window]
+        # serialize(tab_id) -> history bytes, or None if the tab has no live view
+        self.collect = collect
+        self.serialize = serialize
+
+        self.dirty = set()
+        self.written = set()  # tab ids with a history file on disk
+        self.last_index = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(save_delay)
+        self.timer.timeout.connect(self.save)
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+    def history_path(self, tab_id):
+        return os.path.join(self.tabs_dir, f"{tab_id}.hist")
+
+    def load(self):
+        """Return [(current index, tab entries)] for each window of the last session"""
+        try:
+            with open(self.index_path, "rb") as f:
+                data = json.loads(f.read())
+            # Version 1 files hold a single window
+            saved = data["windows"] if data.get("version", 1) >= 2 else [data]
+            windows = []
+            for window in saved:
+                tabs = [tuple(t) for t in window["tabs"]]
+                if tabs:
+                    current = min(max(window.get("current", 0), 0), len(tabs) - 1)
+                    windows.append((current, tabs))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return []
+        self.written = {t[0] for _, tabs in windows for t in tabs
+                        if os.path.exists(self.history_path(t[0]))}
+        return windows
+
+    def load_history(self, tab_id):
+        try:
+            with open(self.history_path(tab_id), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def tab_changed(self, tab_id):
+        self.dirty.add(tab_id)
+        self.schedule()
+
+    def schedule(self):
+        # Restarting the timer coalesces bursts of changes into one save
+        self.timer.start()
+
+    def save(self):
+        windows = self.collect()
+        ids = {t[0] for _, tabs in windows for t in tabs}
+        blobs = {}
+        for tab_id in self.dirty & ids:
+            data = self.serialize(tab_id)
+            if data is not None:
+                blobs[tab_id] = data
+        self.dirty.clear()
+
+        removed = self.written - ids
+        self.written = (self.written | set(blobs)) - removed
+        index = json.dumps({"version": 2, "windows": [{"current": current, "tabs": tabs}
+                                                      for current, tabs in windows]}).encode()
+        if index == self.last_index and not blobs and not removed:
+            return
+        self.last_index = index
+        self.writer.submit(self.write, blobs, index, removed)
+
+    def write(self, blobs, index, removed):
+        # History files first, so the index never points at a missing one
+        for tab_id, data in blobs.items():
+            atomic_write(self.history_path(tab_id), data)
+        atomic_write(self.index_path, index)
+        for tab_id in removed:
+            try:
+                os.remove(self.history_path(tab_id))
+            except OSError:
+                pass
+
+    def close(self):
+        """Write any pending changes and wait for the writer thread"""
+        if self.timer.isActive() or self.dirty:
+            self.timer.stop()
+            self.save()
+        self.writer.shutdown(wait=True)
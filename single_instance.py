@@ -0,0 +1,104 @@
+"""Single-instance mode: later launches hand their URLs to the running browser
+
+The running browser listens on a QLocalServer (see BrowserApp.listen). A new
+launch connects with a plain socket before any Qt module is imported, sends
+one JSON line with its arguments, waits for a one-byte acknowledgement and
+exits. A Unix domain socket is used on Linux and macOS, a named pipe on
+Windows; both are what QLocalServer listens on.
+"""
+import os
+import sys
+import json
+import socket
+import getpass
+import hashlib
+import tempfile
+import threading
+
+
+def server_name():
+    # One instance per user and data directory, so ELAFRY_DATA_DIR runs stay separate
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = ""
+    key = f"{user}:{os.environ.get('ELAFRY_DATA_DIR', '')}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    if sys.platform == "win32":
+        return f"elafry-{digest}"
+    # A full path, so both sides agree on the directory whatever QDir.tempPath() says
+    return os.path.join(tempfile.gettempdir(), f"elafry-{digest}.sock")
+
+
+def automation_workers(argv):
+    """Worker count asked for with --automation[=N], or None; ValueError for a bad N"""
+    for arg in argv:
+        if arg == "--automation":
+            return 4
+        if arg.startswith("--automation="):
+            value = arg.partition("=")[2]
+            try:
+                workers = int(value)
+            except ValueError:
+                workers = 0
+            if workers < 1:
+                raise ValueError(f"--automation needs a worker count of 1 or more, not {value!r}")
+            return workers
+    return None
+
+
+def launch_message(argv):
+    """What a launch asks the running instance to do"""
+    return {
+        "urls": [arg for arg in argv if not arg.startswith("-")],
+        # Relative file paths are resolved against the launching process' directory
+        "cwd": os.getcwd(),
+        "new_window": "--new-window" in argv,
+        "automation": automation_workers(argv),
+    }
+
+
+def forward_pipe(path, data, timeout):
+    """The named pipe exchange; pipe reads take no timeout, so it runs on a thread"""
+    reply = []
+
+    def exchange():
+        try:
+            with open(path, "r+b", buffering=0) as pipe:
+                pipe.write(data)
+                reply.append(pipe.read(1))
+        except OSError:
+            pass
+
+    # A daemon thread, so one still blocked on a stuck instance does not keep this one alive
+    thread = threading.Thread(target=exchange, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return reply == [b"1"]
+
+
+def forward(argv, timeout=2.0):
+    """Hand argv to a running instance; False if none answered
+
+    --new-instance skips the check and always starts a separate browser, as
+    do --bench runs. --automation is passed on, so the running browser serves
+    it for its own tabs. --trace-startup runs start their own instance too,
+    since the trace is of this process starting up.
+    """
+    if "--new-instance" in argv or "--bench" in argv:
+        return False
+    if any(arg.split("=", 1)[0] == "--trace-startup" for arg in argv):
+        return False
+    data = json.dumps(launch_message(argv)).encode() + b"\n"
+    name = server_name()
+    try:
+        if sys.platform == "win32":
+            return forward_pipe("\\\\.\\pipe\\" + name, data, timeout)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(name)
+            sock.sendall(data)
+            return sock.recv(1) == b"1"
+    except OSError:
+        # No listener (or a stale socket file left by a crash): run normally
+        return False
@@ -0,0 +1,132 @@
+"""Per-site "lite mode": JavaScript, images, plugins, autoplay and WebGL by domain
+
+Rules live in site_rules.json in the data directory, as
+{"example.com": {"javascript": false, "images": false}, ...}; a rule applies
+to the domain and all its subdomains, and where rules for a host and its
+parent domain disagree the more specific one wins. Rules are kept in a
+DomainTrie, so looking a host up costs one step per label of the host
+however many rules there are. Features a rule does not mention keep the
+profile's setting.
+"""
+import json
+import sys
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineSettings
+from filters import DomainTrie
+from session import atomic_write
+
+_WA = QWebEngineSettings.WebAttribute
+# feature -> (attribute, whether "feature on" means the attribute is on)
+FEATURES = {
+    "javascript": (_WA.JavascriptEnabled, True),
+    "images": (_WA.AutoLoadImages, True),
+    "plugins": (_WA.PluginsEnabled, True),
+    # Autoplay off means media waits for a click
+    "autoplay": (_WA.PlaybackRequiresUserGesture, False),
+    "webgl": (_WA.WebGLEnabled, True),
+}
+
+# What the toolbar toggle turns off for a site
+LITE_MODE = {"javascript": False, "images": False, "plugins": False, "autoplay": False, "webgl": False}
+NO_RULES = {}
+
+
+def rule_domain(host):
+    """Domain a rule made from the toolbar is stored under"""
+    return host[4:] if host.startswith("www.") else host
+
+
+class SiteRules(QObject):
+    """Per-domain feature overrides, persisted as JSON"""
+
+    changed = pyqtSignal()
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.rules = {}  # domain -> {feature: bool}
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            if isinstance(saved, dict):
+                self.rules = {domain.lower(): {k: bool(v) for k, v in features.items() if k in FEATURES}
+                              for domain, features in saved.items() if isinstance(features, dict)}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring {path}: {e}", file=sys.stderr)
+        self.compile()
+
+    def compile(self):
+        self.trie = DomainTrie()
+        for domain, features in self.rules.items():
+            self.trie.add(domain, features)
+        self.cache = {}
+
+    def lookup(self, host):
+        """Merged {feature: bool} for host; the same dict for every host with the same rules"""
+        result = self.cache.get(host)
+        if result is None:
+            matches = self.trie.lookup(host) if host else ()
+            if not matches:
+                result = NO_RULES
+            elif len(matches) == 1:
+                result = matches[0]
+            else:
+                result = {}
+                for features in matches:  # Most specific last, so it wins
+                    result.update(features)
+            if len(self.cache) > 1024:
+                self.cache.clear()
+            self.cache[host] = result
+        return result
+
+    def covering(self, host):
+        """Domains with a rule that applies to host"""
+        labels = host.split(".")
+        return [d for d in (".".join(labels[i:]) for i in range(len(labels))) if d in self.rules]
+
+    def set_rule(self, domain, features):
+        self.rules[domain] = dict(features)
+        self.update()
+
+    def remove(self, domains):
+        for domain in domains:
+            self.rules.pop(domain, None)
+        self.update()
+
+    def update(self):
+        self.compile()
+        try:
+            atomic_write(self.path, json.dumps(self.rules, indent=1, sort_keys=True).encode())
+        except OSError as e:
+            print(f"Could not save site rules: {e}", file=sys.stderr)
+        self.changed.emit()
+
+
+class SiteRulesPage(QWebEnginePage):
+    """Page that switches its own settings to the site's rules on every main-frame navigation"""
+
+    def __init__(self, profile, site_rules, parent=None):
+        super().__init__(profile, parent)
+        self.site_rules = site_rules
+        self.applied = NO_RULES  # The rules now set on this page
+        # Restored history and same-document changes do not always ask acceptNavigationRequest
+        self.urlChanged.connect(lambda url: self.apply_rules(url.host()))
+
+    def acceptNavigationRequest(self, url, nav_type, is_main_frame):
+        if is_main_frame:
+            self.apply_rules(url.host())
+        return super().acceptNavigationRequest(url, nav_type, is_main_frame)
+
+    def apply_rules(self, host):
+        rules = self.site_rules.lookup(host)
+        if rules is self.applied:
+            return
+        settings = self.settings()
+        for feature, (attribute, positive) in FEATURES.items():
+            if feature in rules:
+                settings.setAttribute(attribute, rules[feature] == positive)
+            elif feature in self.applied:
+                settings.resetAttribute(attribute)  # Back to the profile's value
+        self.applied = rules
@@ -0,0 +1,331 @@
+"""Speculative work on link hover: preconnect/prefetch hints and prerendering
+
+A hover that stays on one link for `delay` ms is taken as intent to click.
+The page then gets <link rel=preconnect> (for other origins) and
+<link rel=prefetch> hints for the target, and, with prerendering on, the
+target is loaded in a hidden page, directly, so the tab's own page is not
+loaded a second time. Once it replaces the tab's page on click, the tab
+keeps the old page's history to fall back on (BrowserWindow.navigate_back),
+so Back still works. At most `max_prerenders` hidden pages exist at once; a prerender is
+dropped when the hover moves to another link, after `ttl` seconds, or under
+memory pressure.
+
+    python speculation.py [--prerender] [--latency MS] [--rounds N]
+
+clicks through links on a local server, with and without hovering first,
+and prints click-to-loaded times and the hit rates.
+"""
+import json
+import time
+from collections import OrderedDict
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineScript
+from filters import base_domain
+from site_rules import SiteRulesPage
+
+HINT_JS = """
+(function(href, origin) {
+    var head = document.head || document.documentElement;
+    var hints = origin === location.origin ? [["prefetch", href]] : [["preconnect", origin], ["prefetch", href]];
+    hints.forEach(function(hint) {
+        var link = document.createElement("link");
+        link.rel = hint[0];
+        link.href = hint[1];
+        head.appendChild(link);
+    });
+})(%s, %s)
+"""
+
+
+def speculation_key(url):
+    return url.adjusted(QUrl.UrlFormattingOption.RemoveFragment).toString()
+
+
+class Prerender:
+    __slots__ = ("key", "url", "page", "source", "started", "ready")
+
+    def __init__(self, key, url, page, source):
+        self.key = key
+        self.url = url
+        self.page = page
+        self.source = source            # the page whose link is being prerendered
+        self.started = time.monotonic()
+        self.ready = False              # target finished loading
+
+
+class SpeculativePage(SiteRulesPage):
+    """Tab page that hands link clicks to the speculator first"""
+
+    # A prerendered page for the clicked link; the tab should show it instead
+    prerender_taken = pyqtSignal(QWebEnginePage)
+
+    def __init__(self, profile, site_rules, speculator, parent=None):
+        super().__init__(profile, site_rules, parent)
+        self.speculator = speculator
+
+    def acceptNavigationRequest(self, url, nav_type, is_main_frame):
+        if is_main_frame and nav_type == QWebEnginePage.NavigationType.NavigationTypeLinkClicked:
+            page = self.speculator.clicked(self, url)
+            if page is not None:
+                self.prerender_taken.emit(page)
+                return False
+        return super().acceptNavigationRequest(url, nav_type, is_main_frame)
+
+
+class Speculator(QObject):
+    """Turns sustained link hovers into hints and prerenders, shared by all windows"""
+
+    def __init__(self, profile, site_rules, delay=200, prerender=False, max_prerenders=2,
+                 ttl=30, max_hints=64, content_blocker=None, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        self.site_rules = site_rules
+        self.content_blocker = content_blocker
+        self.prerender = prerender
+        self.max_prerenders = max_prerenders
+        self.ttl = ttl
+        self.max_hints = max_hints
+        self.pending = None           # (page, url) waiting for the hover delay
+        self.prerenders = {}          # speculation key -> Prerender
+        self.hinted = OrderedDict()   # speculation key -> monotonic time of the hint
+        self.stats = dict.fromkeys(("intents", "hints", "prerenders", "clicks", "hint_hits",
+                                    "prerender_hits", "cancelled", "expired", "skipped"), 0)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.intent)
+        self.expiry = QTimer(self)
+        self.expiry.setInterval(5000)
+        self.expiry.timeout.connect(self.expire)
+
+    def new_page(self, parent=None):
+        page = SpeculativePage(self.profile, self.site_rules, self, parent)
+        # Tab pages and prerenders alike; a prerender brings its count into the tab
+        if self.content_blocker is not None:
+            self.content_blocker.attach(page)
+        return page
+
+    def hovered(self, page, href):
+        """linkHovered of a tab page; an empty href means the pointer left the link"""
+        url = QUrl(href)
+        if self.pending and self.pending[0] is page and self.pending[1] == url:
+            return
+        self.timer.stop()
+        self.pending = None
+        key = speculation_key(url) if href else None
+        # A prerender is only worth keeping while its link is under the pointer
+        for prerender in list(self.prerenders.values()):
+            if prerender.source is page and prerender.key != key:
+                self.drop(prerender)
+                self.stats["cancelled"] += 1
+        if url.scheme() in ("http", "https") and speculation_key(url) != speculation_key(page.url()):
+            self.pending = (page, url)
+            self.timer.start()
+
+    def intent(self):
+        page, url = self.pending
+        self.pending = None
+        if sip.isdeleted(page):
+            return
+        self.stats["intents"] += 1
+        key = speculation_key(url)
+        if key not in self.hinted:
+            origin = url.adjusted(QUrl.UrlFormattingOption.RemovePath |
+                                  QUrl.UrlFormattingOption.RemoveQuery |
+                                  QUrl.UrlFormattingOption.RemoveFragment).toString()
+            page.runJavaScript(HINT_JS % (json.dumps(url.toString()), json.dumps(origin)),
+                               QWebEngineScript.ScriptWorldId.ApplicationWorld)
+            self.stats["hints"] += 1
+        self.hinted[key] = time.monotonic()
+        self.hinted.move_to_end(key)
+        if len(self.hinted) > self.max_hints:
+            self.hinted.popitem(last=False)
+        # Only same-site links: a prerender runs the target's scripts and sends its cookies
+        if self.prerender and key not in self.prerenders and \
+                base_domain(url.host()) == base_domain(page.url().host()):
+            self.start_prerender(page, url, key)
+
+    def start_prerender(self, source, url, key):
+        if len(self.prerenders) >= self.max_prerenders:
+            self.stats["skipped"] += 1
+            return
+        page = self.new_page(self)
+        prerender = Prerender(key, url, page, source)
+        self.prerenders[key] = prerender
+        self.stats["prerenders"] += 1
+        page.loadFinished.connect(lambda ok, p=prerender: self.prerender_loaded(p, ok))
+        # Only the target loads; the tab's history is grafted on when the page is swapped in
+        page.setUrl(url)
+        self.expiry.start()
+
+    def prerender_loaded(self, prerender, ok):
+        if self.prerenders.get(prerender.key) is not prerender:
+            return
+        if ok:
+            prerender.ready = True
+        else:
+            self.drop(prerender)
+
+    def clicked(self, page, url):
+        """A link click on page; returns a ready prerendered page for it, if any"""
+        key = speculation_key(url)
+        self.stats["clicks"] += 1
+        self.timer.stop()
+        self.pending = None
+        prerender = self.prerenders.get(key)
+        if prerender is not None and prerender.source is page and prerender.ready:
+            del self.prerenders[key]
+            prerender.page.loadFinished.disconnect()
+            self.stats["prerender_hits"] += 1
+            return prerender.page
+        if key in self.hinted and time.monotonic() - self.hinted[key] < self.ttl:
+            self.stats["hint_hits"] += 1
+        if prerender is not None:
+            self.drop(prerender)  # Still loading: the normal navigation wins
+        return None
+
+    def drop(self, prerender):
+        if self.prerenders.get(prerender.key) is prerender:
+            del self.prerenders[prerender.key]
+        if not sip.isdeleted(prerender.page):
+            prerender.page.deleteLater()
+
+    def forget(self, page):
+        """page is closing or being replaced: drop what it started"""
+        if self.pending and self.pending[0] is page:
+            self.timer.stop()
+            self.pending = None
+        for prerender in list(self.prerenders.values()):
+            if prerender.source is page:
+                self.drop(prerender)
+
+    def cancel_all(self):
+        """Drop every prerender, e.g. when renderers are over their memory budget"""
+        count = len(self.prerenders)
+        for prerender in list(self.prerenders.values()):
+            self.drop(prerender)
+        self.stats["cancelled"] += count
+        return count
+
+    def expire(self):
+        now = time.monotonic()
+        for prerender in list(self.prerenders.values()):
+            if now - prerender.started > self.ttl:
+                self.drop(prerender)
+                self.stats["expired"] += 1
+        if not self.prerenders:
+            self.expiry.stop()
+
+    def summary(self):
+        """Counters plus hit rates: speculations used, and clicks that had been speculated"""
+        stats = dict(self.stats)
+        hits = stats["hint_hits"] + stats["prerender_hits"]
+        stats["hit_rate"] = hits / stats["intents"] if stats["intents"] else None
+        stats["coverage"] = hits / stats["clicks"] if stats["clicks"] else None
+        return stats
+
+
+def benchmark(prerender=False, latency=150, rounds=5):
+    import os
+    import sys
+    import tempfile
+    import threading
+    import statistics
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("ELAFRY_DATA_DIR", tempfile.mkdtemp(prefix="elafry-speculation-"))
+    import browser
+    import bench
+    from PyQt6.QtCore import QEventLoop
+    from PyQt6.QtWidgets import QApplication
+
+    class SlowHandler(bench.QuietHandler):
+        # Cacheable, so a prefetch can serve the click; the delay stands in for network latency
+        def end_headers(self):
+            self.send_header("Cache-Control", "max-age=300")
+            SimpleHTTPRequestHandler.end_headers(self)
+
+        def send_head(self):
+            time.sleep(latency / 1000)
+            return super().send_head()
+
+    fixtures = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(SlowHandler, directory=fixtures))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    browser.register_scheme()
+    QApplication.setApplicationName("Elafrý")
+    app = QApplication(sys.argv)
+    web_profile = browser.WebProfile(browser.data_path("profile"), parent=app)
+    browser_app = browser.BrowserApp(web_profile, prerender=prerender, parent=app)
+    speculator = browser_app.speculator
+    window = browser_app.new_window([QUrl("about:blank")])
+    window.show()
+    view = window.active_browser()
+
+    def wait(condition, timeout=15):
+        loop = QEventLoop()
+        poll = QTimer()
+        poll.setInterval(5)
+        poll.timeout.connect(lambda: condition() and loop.quit())
+        poll.start()
+        QTimer.singleShot(int(timeout * 1000), loop.quit)
+        loop.exec()
+        poll.stop()
+
+    def load(url):
+        done = []
+        view.loadFinished.connect(lambda ok: done.append(ok))
+        view.setUrl(QUrl(url))
+        wait(lambda: done)
+        view.loadFinished.disconnect()
+
+    def click(href, hover):
+        # Every round uses new URLs, so neither mode profits from the other's cache
+        load(f"{base}links.html?round={click.round}")
+        target = QUrl(f"{base}{href}?round={click.round}")
+        click.round += 1
+        if hover:
+            view.page().linkHovered.emit(target.toString())
+            key = speculation_key(target)
+            wait(lambda: (speculator.prerenders.get(key) and speculator.prerenders[key].ready)
+                 if prerender else False, timeout=(speculator.timer.interval() + latency * 3) / 1000)
+        page = view.page()
+        done = []
+        view.loadFinished.connect(lambda ok: done.append(ok))
+        start = time.perf_counter()
+        page.runJavaScript(f"document.querySelector('a[data-target=\"{href}\"]').click()")
+        wait(lambda: done or view.page() is not page)
+        elapsed = (time.perf_counter() - start) * 1000
+        view.loadFinished.disconnect()
+        return elapsed
+    click.round = 0
+
+    targets = ["article.html", "gallery.html", "table.html", "app.html"]
+    times = {"no hover": [], "hover": []}
+    for _ in range(rounds):
+        for href in targets:
+            times["no hover"].append(click(href, False))
+            times["hover"].append(click(href, True))
+    server.shutdown()
+
+    print(f"Click to loaded, {latency} ms server latency, prerender {'on' if prerender else 'off'}")
+    for mode, values in times.items():
+        print(f"  {mode:10} median {statistics.median(values):7.1f} ms  max {max(values):7.1f} ms")
+    print("  " + ", ".join(f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}"
+                           for k, v in speculator.summary().items()))
+    window.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Link-hover speculation against a local server")
+    parser.add_argument("--prerender", action="store_true")
+    parser.add_argument("--latency", type=int, default=150, help="server delay per response, ms")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    benchmark(args.prerender, args.latency, args.rounds)
@@ -0,0 +1,210 @@
+"""Startup phase timing, written as a Chrome trace (chrome://tracing, Perfetto).
+
+browser.py imports this module before anything else. Run the browser with
+--trace-startup[=PATH] to write a report once the first page has painted,
+and add --quit-after-startup to exit right after.
+
+Running this file benchmarks cold and warm launches against a local page:
+
+    python startup_trace.py [--runs N] [--exe PATH_TO_FROZEN_BINARY]
+"""
+import os
+import sys
+import json
+import time
+
+
+def _flag(name):
+    for arg in sys.argv[1:]:
+        if arg == name:
+            return ""
+        if arg.startswith(name + "="):
+            return arg[len(name) + 1:]
+    return None
+
+
+_trace_path = _flag("--trace-startup")
+enabled = _trace_path is not None
+report_path = _trace_path or "startup-trace.json"
+quit_after = _flag("--quit-after-startup") is not None
+
+# perf_counter precision, anchored to the wall clock so events line up with
+# the process start time and with timestamps reported by web pages
+_perf0 = time.perf_counter()
+_wall0 = time.time()
+
+_events = []  # (name, start, end or None for instant events)
+_open = {}
+_done = set()
+
+
+def now():
+    return _wall0 + (time.perf_counter() - _perf0)
+
+
+def begin(name):
+    """Start a phase; phases are only recorded the first time they complete"""
+    if name not in _done and name not in _open:
+        _open[name] = now()
+
+
+def end(name):
+    start = _open.pop(name, None)
+    if start is not None:
+        _done.add(name)
+        _events.append((name, start, now()))
+
+
+def mark(name, when=None):
+    if name not in _done:
+        _done.add(name)
+        _events.append((name, when or now(), None))
+
+
+def is_done(name):
+    return name in _done
+
+
+def _start_time_of(pid):
+    if sys.platform.startswith("linux"):
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the ")" that ends the command name; starttime is field 22
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return None
+        times = [wintypes.FILETIME() for _ in range(4)]
+        ok = kernel32.GetProcessTimes(handle, *[ctypes.byref(t) for t in times])
+        kernel32.CloseHandle(handle)
+        if not ok:
+            return None
+        filetime = (times[0].dwHighDateTime << 32) | times[0].dwLowDateTime
+        return filetime / 1e7 - 11644473600  # 100 ns ticks since 1601 -> Unix time
+    return None
+
+
+def process_start_time():
+    """When the OS started us; for a PyInstaller --onefile build, when unpacking began"""
+    pid = os.getpid()
+    meipass = getattr(sys, "_MEIPASS", "")
+    if getattr(sys, "frozen", False) and os.path.basename(meipass).startswith("_MEI"):
+        # The onefile bootloader unpacks, then runs us as its child process
+        pid = os.getppid()
+    try:
+        return _start_time_of(pid)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def report():
+    started = process_start_time()
+    origin = started or _wall0
+    pid = os.getpid()
+
+    def us(t):
+        return round((t - origin) * 1e6)
+
+    events = []
+    summary = {}
+    if started:
+        events.append({"name": "process start to Python", "ph": "X", "ts": 0,
+                       "dur": us(_wall0), "pid": pid, "tid": 0})
+        summary["process start to Python"] = round((_wall0 - origin) * 1000, 1)
+    for name, start, stop in _events:
+        if stop is None:
+            events.append({"name": name, "ph": "i", "s": "p", "ts": us(start), "pid": pid, "tid": 0})
+            summary[name] = round((start - origin) * 1000, 1)
+        else:
+            events.append({"name": name, "ph": "X", "ts": us(start), "dur": us(stop) - us(start),
+                           "pid": pid, "tid": 0})
+            summary[name] = round((stop - start) * 1000, 1)
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {
+            # Phases are durations; instant events are times since process start
+            "summary_ms": summary,
+            "origin": "process start" if started else "startup_trace import",
+            "frozen": bool(getattr(sys, "frozen", False)),
+            "platform": sys.platform,
+        },
+    }
+
+
+def write_report(path=None):
+    with open(path or report_path, "w") as f:
+        json.dump(report(), f, indent=1)
+
+
+def benchmark(runs, command):
+    import shutil
+    import tempfile
+    import statistics
+    import subprocess
+    import threading
+    from functools import partial
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    work = tempfile.mkdtemp(prefix="elafry-startup-")
+    fixture = os.path.join(work, "site")
+    os.makedirs(fixture)
+    with open(os.path.join(fixture, "index.html"), "w") as f:
+        f.write("<!DOCTYPE html><html><head><title>Startup fixture</title>"
+                "<style>body{font-family:sans-serif;margin:40px}</style></head><body>"
+                + "<h1>Startup fixture</h1>" + "<p>Lorem ipsum dolor sit amet.</p>" * 50
+                + "</body></html>")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=fixture))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/index.html"
+
+    def launch(data_dir):
+        # Start without a saved session so only the fixture page is opened
+        shutil.rmtree(os.path.join(data_dir, "session"), ignore_errors=True)
+        path = os.path.join(work, "trace.json")
+        if os.path.exists(path):
+            os.remove(path)
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen", ELAFRY_DATA_DIR=data_dir)
+        subprocess.run(command + [f"--trace-startup={path}", "--quit-after-startup", url],
+                       env=env, timeout=120, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(path) as f:
+            return json.load(f)["otherData"]["summary_ms"]
+
+    results = {"cold": [], "warm": []}
+    try:
+        for i in range(runs):
+            results["cold"].append(launch(os.path.join(work, f"cold-{i}")))
+        warm_dir = os.path.join(work, "warm")
+        launch(warm_dir)  # populate the profile and HTTP cache
+        for _ in range(runs):
+            results["warm"].append(launch(warm_dir))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work, ignore_errors=True)
+
+    for kind, summaries in results.items():
+        print(f"{kind} launches ({len(summaries)}), median ms:")
+        for phase in summaries[0]:
+            values = [s[phase] for s in summaries if phase in s]
+            print(f"  {phase:32} {statistics.median(values):8.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark Elafrý cold and warm startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exe", help="frozen binary to launch instead of python browser.py")
+    args = parser.parse_args()
+    here = os.path.dirname(os.path.abspath(__file__))
+    command = [args.exe] if args.exe else [sys.executable, os.path.join(here, "browser.py")]
+    benchmark(args.runs, command)
@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, QTimer
+from PyQt6.QtWebEngineCore import QWebEnginePage
+
+Active = QWebEnginePage.LifecycleState.Active
+Frozen = QWebEnginePage.LifecycleState.Frozen
+Discarded = QWebEnginePage.LifecycleState.Discarded
+
+
+class TabLifecycleManager(QObject):
+    """Moves idle background tabs from Active to Frozen to Discarded"""
+
+    def __init__(self, parent=None, freeze_after=5 * 60, discard_after=30 * 60,
+                 max_live_tabs=10, check_interval=30):
+        super().__init__(parent)
+        # Idle times are in seconds since the tab was last in the foreground
+        self.freeze_after = freeze_after
+        self.discard_after = discard_after
+        # Maximum number of tabs keeping a renderer (Active or Frozen)
+        self.max_live_tabs = max_live_tabs
+
+        self.pinned = set()
+        self.current = None
+        # view -> time it was last in the foreground, least recently used first
+        self.last_active = OrderedDict()
+        # view -> scroll position saved when it was discarded
+        self.scroll_positions = {}
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(check_interval * 1000)
+        self.timer.timeout.connect(self.check_idle_tabs)
+        self.timer.start()
+
+    def register(self, view):
+        self.last_active[view] = time.monotonic()
+        view.loadFinished.connect(lambda ok, v=view: self.restore_scroll(v))
+
+    def unregister(self, view):
+        self.last_active.pop(view, None)
+        self.scroll_positions.pop(view, None)
+        self.pinned.discard(view)
+        if self.current is view:
+            self.current = None
+
+    def set_pinned(self, view, pinned):
+        if pinned:
+            self.pinned.add(view)
+        else:
+            self.pinned.discard(view)
+
+    def is_pinned(self, view):
+        return view in self.pinned
+
+    def activate(self, view):
+        """Bring a tab back to Active and mark the previous one as idle from now"""
+        now = time.monotonic()
+        if self.current is not None and self.current in self.last_active:
+            self.touch(self.current, now)
+        self.current = view
+        self.touch(view, now)
+
+        page = view.page()
+        if page.lifecycleState() != Active:
+            # Discarded pages reload their URL here; scroll is restored on loadFinished
+            page.setLifecycleState(Active)
+        self.enforce_live_limit()
+
+    def touch(self, view, now):
+        self.last_active[view] = now
+        self.last_active.move_to_end(view)
+
+    def can_suspend(self, view):
+        if view is self.current or view in self.pinned:
+            return False
+        page = view.page()
+        # Never freeze tabs that are visible or playing audio
+        return not page.isVisible() and not page.recentlyAudible()
+
+    def freeze(self, view):
+        page = view.page()
+        if page.lifecycleState() == Active and page.recommendedState() != Active:
+            page.setLifecycleState(Frozen)
+
+    def discard(self, view):
+        page = view.page()
+        if page.lifecycleState() == Discarded or page.recommendedState() != Discarded:
+            return False
+        self.scroll_positions[view] = page.scrollPosition()
+        page.setLifecycleState(Discarded)
+        return True
+
+    def check_idle_tabs(self):
+        now = time.monotonic()
+        for view, last in list(self.last_active.items()):
+            if not self.can_suspend(view):
+                continue
+            idle = now - last
+            if idle >= self.discard_after:
+                self.discard(view)
+            elif idle >= self.freeze_after:
+                self.freeze(view)
+        self.enforce_live_limit()
+
+    def enforce_live_limit(self):
+        """Discard least recently used tabs until the renderer cap is met"""
+        live = [v for v in self.last_active if v.page().lifecycleState() != Discarded]
+        excess = len(live) - self.max_live_tabs
+        for view in live:
+            if excess <= 0:
+                break
+            if self.can_suspend(view) and self.discard(view):
+                excess -= 1
+
+    def discard_oldest(self):
+        """Discard the least recently used tab that may be suspended; False if none"""
+        for view in self.last_active:
+            if view.page().lifecycleState() != Discarded and self.can_suspend(view) and self.discard(view):
+                return True
+        return False
+
+    def restore_scroll(self, view):
+        pos = self.scroll_positions.pop(view, None)
+        if pos is not None and (pos.x() or pos.y()):
+            view.page().runJavaScript(f"window.scrollTo({pos.x()}, {pos.y()});")
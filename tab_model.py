@@ -0,0 +1,129 @@
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QEvent, pyqtSignal
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QTabWidget, QListView, QAbstractItemView, QWidget
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWebEngineCore import QWebEnginePage
+from session import TabPlaceholder
+
+
+class TabModel(QAbstractListModel):
+    """Registry of open tabs in tab order, keyed by widget for O(1) lookups
+
+    Rows match the QTabWidget indices of the content tabs; the "+" tab is
+    always last and is not part of the model.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.widgets = []   # row -> widget
+        self.rows = {}      # widget -> row
+        self.titles = {}    # widget -> full page title
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.widgets)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        widget = self.widgets[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.titles.get(widget) or "New Tab"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return widget.url if isinstance(widget, TabPlaceholder) else widget.url().toString()
+        if role == Qt.ItemDataRole.ForegroundRole and self.is_sleeping(widget):
+            return QColor(128, 128, 128)
+        return None
+
+    def is_sleeping(self, widget):
+        """Placeholders and frozen/discarded tabs are shown dimmed"""
+        if isinstance(widget, TabPlaceholder):
+            return True
+        return widget.page().lifecycleState() != QWebEnginePage.LifecycleState.Active
+
+    def row(self, widget):
+        return self.rows.get(widget, -1)
+
+    def widget(self, row):
+        return self.widgets[row]
+
+    def insert(self, row, widget, title):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.widgets.insert(row, widget)
+        self.titles[widget] = title
+        self.reindex(row)
+        self.endInsertRows()
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        widget = self.widgets.pop(row)
+        self.rows.pop(widget, None)
+        self.titles.pop(widget, None)
+        self.reindex(row)
+        self.endRemoveRows()
+
+    def reindex(self, start):
+        # Only structural changes pay O(n); title updates stay O(1)
+        for i in range(start, len(self.widgets)):
+            self.rows[self.widgets[i]] = i
+
+    def set_title(self, widget, title):
+        row = self.rows.get(widget)
+        if row is not None:
+            self.titles[widget] = title
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def refresh(self, widget):
+        row = self.rows.get(widget)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class TabWidget(QTabWidget):
+    """QTabWidget that keeps a TabModel in sync with its content tabs"""
+
+    # A web view that was on screen has just been hidden because another tab
+    # replaced it or it was closed; its last frame is still there
+    leaving = pyqtSignal(QWidget)
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+
+    def tabInserted(self, index):
+        super().tabInserted(index)
+        widget = self.widget(index)
+        if isinstance(widget, TabPlaceholder):
+            self.model.insert(index, widget, widget.title)
+        elif isinstance(widget, QWebEngineView):
+            self.model.insert(index, widget, widget.title() or self.tabText(index))
+            # Switches made in C++ (Ctrl+Tab, setCurrentWidget, closing the current
+            # tab) bypass any Python override, but all of them hide the old view
+            widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        # Spontaneous hides come from the window system (minimizing), and while the
+        # tab widget itself is hidden (window closing, overview) nothing switched
+        if event.type() == QEvent.Type.Hide and not event.spontaneous() and self.isVisible():
+            self.leaving.emit(obj)
+        return super().eventFilter(obj, event)
+
+    def tabRemoved(self, index):
+        super().tabRemoved(index)
+        if index < self.model.rowCount():
+            self.model.remove(index)
+
+
+class TabPanel(QListView):
+    """Vertical tab list; only the visible rows are laid out and painted"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setObjectName("tabPanel")
+        self.setModel(model)
+        # Fixed row height lets the view skip measuring every row
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setTextElideMode(Qt.TextElideMode.ElideRight)
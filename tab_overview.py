@@ -0,0 +1,178 @@
+"""Tab overview: a grid of tab thumbnails over the TabModel
+
+Thumbnails are taken with grab() while a tab is still visible, i.e. right
+before it is switched away from and shortly after it loads, and kept as
+JPEG in a byte-bounded ThumbnailCache keyed by tab id. A tab keeps its last
+thumbnail when it is frozen, discarded or crashed; opening the overview
+never touches a background tab's renderer. The grid only decodes and
+paints the thumbnails of visible cells.
+
+    python tab_overview.py [--tabs 200]
+
+measures how long the overview takes to open and paint.
+"""
+import time
+from PyQt6.QtCore import Qt, QRect, QSize, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter, QPixmap
+from PyQt6.QtWidgets import QListView, QStyle, QStyledItemDelegate, QAbstractItemView
+from thumbnails import ThumbnailCache
+
+THUMB_WIDTH = 240
+THUMB_HEIGHT = 150
+TITLE_HEIGHT = 36
+PADDING = 8
+
+
+def tab_thumbnail_cache():
+    # Cropped to the cell's aspect when painted, so the width is all that matters
+    return ThumbnailCache(max_bytes=16 * 1024 * 1024, width=THUMB_WIDTH, quality=60)
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """Paints a cell: thumbnail (or the URL when there is none) above the full title"""
+
+    def __init__(self, thumbnails, parent=None):
+        super().__init__(parent)
+        self.thumbnails = thumbnails
+        self.decoded = {}  # tab id -> (JPEG bytes, QPixmap); cleared when the overview closes
+
+    def sizeHint(self, option, index):
+        return QSize(THUMB_WIDTH + 2 * PADDING, THUMB_HEIGHT + TITLE_HEIGHT + 2 * PADDING)
+
+    def pixmap(self, tab_id):
+        data = self.thumbnails.get(tab_id)
+        if data is None:
+            return None
+        cached = self.decoded.get(tab_id)
+        if cached is None or cached[0] is not data:
+            pixmap = QPixmap()
+            pixmap.loadFromData(data, "JPEG")
+            cached = self.decoded[tab_id] = (data, pixmap)
+        return cached[1]
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        widget = model.widget(index.row())
+        palette = option.palette
+        cell = option.rect.adjusted(PADDING // 2, PADDING // 2, -PADDING // 2, -PADDING // 2)
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(palette.highlight() if selected else palette.base() if not hovered
+                         else palette.alternateBase())
+        painter.drawRoundedRect(cell, 10, 10)
+
+        thumb = QRect(cell.left() + PADDING // 2, cell.top() + PADDING // 2, THUMB_WIDTH, THUMB_HEIGHT)
+        if model.is_sleeping(widget):
+            painter.setOpacity(0.6)
+        pixmap = self.pixmap(widget.tab_id)
+        if pixmap is not None and not pixmap.isNull():
+            # Top of the page, cropped to the cell
+            source = QRect(0, 0, pixmap.width(), min(pixmap.height(),
+                                                     pixmap.width() * THUMB_HEIGHT // THUMB_WIDTH))
+            painter.drawPixmap(thumb, pixmap, source)
+        else:
+            painter.setBrush(palette.window())
+            painter.drawRect(thumb)
+            painter.setPen(palette.color(palette.ColorRole.PlaceholderText))
+            painter.drawText(thumb.adjusted(8, 8, -8, -8),
+                             Qt.AlignmentFlag.AlignCenter | Qt.TextFlag.TextWrapAnywhere,
+                             index.data(Qt.ItemDataRole.ToolTipRole) or "")
+        painter.setOpacity(1.0)
+
+        painter.setPen(palette.color(palette.ColorRole.HighlightedText if selected else palette.ColorRole.Text))
+        title = QRect(thumb.left(), thumb.bottom() + 4, THUMB_WIDTH, TITLE_HEIGHT - 4)
+        text = painter.fontMetrics().elidedText(index.data() or "", Qt.TextElideMode.ElideRight, THUMB_WIDTH)
+        painter.drawText(title, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, text)
+        painter.restore()
+
+
+class TabOverview(QListView):
+    """Grid of all tabs of a window; activating a cell emits its row"""
+
+    tab_chosen = pyqtSignal(int)
+    closed = pyqtSignal()
+
+    def __init__(self, model, thumbnails, parent=None):
+        super().__init__(parent)
+        self.setObjectName("tabOverview")
+        self.setModel(model)
+        self.delegate = ThumbnailDelegate(thumbnails, self)
+        self.setItemDelegate(self.delegate)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setMovement(QListView.Movement.Static)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setWrapping(True)
+        # Every cell is the same size, so layout needs no per-item measuring
+        self.setUniformItemSizes(True)
+        self.setGridSize(self.delegate.sizeHint(None, None))
+        self.setSpacing(0)
+        self.setMouseTracking(True)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.clicked.connect(lambda index: self.tab_chosen.emit(index.row()))
+
+    def open(self, current_row):
+        if 0 <= current_row < self.model().rowCount():
+            self.setCurrentIndex(self.model().index(current_row))
+            self.scrollTo(self.currentIndex(), QAbstractItemView.ScrollHint.PositionAtCenter)
+        self.show()
+        self.setFocus()
+
+    def hideEvent(self, event):
+        # Decoded pixmaps are only worth keeping while the grid is on screen
+        self.delegate.decoded.clear()
+        super().hideEvent(event)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key.Key_Escape:
+            self.closed.emit()
+            return
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter) and self.currentIndex().isValid():
+            self.tab_chosen.emit(self.currentIndex().row())
+            return
+        super().keyPressEvent(event)
+
+
+def benchmark(tabs=200):
+    import os
+    import sys
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from tab_model import TabModel
+    from session import TabPlaceholder
+    app = QApplication(sys.argv)
+    model = TabModel()
+    thumbnails = tab_thumbnail_cache()
+    for i in range(tabs):
+        placeholder = TabPlaceholder(f"tab{i}", f"Page {i} with a title too long for a tab", f"https://example.com/{i}")
+        model.insert(i, placeholder, placeholder.title)
+        page = QPixmap(1200, 800)
+        page.fill(QColor.fromHsv(i * 37 % 360, 80, 230))
+        thumbnails.put(placeholder.tab_id, page)
+    overview = TabOverview(model, thumbnails)
+    overview.resize(1200, 800)
+
+    times = []
+    for _ in range(10):
+        start = time.perf_counter()
+        overview.open(tabs // 2)
+        overview.grab()  # Lays out and paints the visible cells synchronously
+        times.append((time.perf_counter() - start) * 1000)
+        overview.hide()
+        app.processEvents()
+    first = times[0]
+    times.sort()
+    print(f"{tabs} tabs, {len(thumbnails)} thumbnails in {thumbnails.total_bytes / 1024:.0f} KB: "
+          f"open + paint first {first:.1f} ms, median {times[len(times) // 2]:.1f} ms, max {times[-1]:.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Tab overview open latency")
+    parser.add_argument("--tabs", type=int, default=200)
+    args = parser.parse_args()
+    benchmark(args.tabs)
@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import signal
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                             QPushButton, QLabel, QAbstractItemView, QHeaderView)
+from PyQt6.QtWebEngineCore import QWebEnginePage
+
+try:
+    import psutil  # Optional; only needed where there is no /proc
+except ImportError:
+    psutil = None
+
+HAVE_PROC = sys.platform.startswith("linux")
+CLK_TCK = os.sysconf("SC_CLK_TCK") if HAVE_PROC else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if HAVE_PROC else 4096
+MB = 1024 * 1024
+
+STATE_NAMES = {
+    QWebEnginePage.LifecycleState.Active: "Active",
+    QWebEnginePage.LifecycleState.Frozen: "Frozen",
+    QWebEnginePage.LifecycleState.Discarded: "Discarded",
+}
+
+
+def read_proc_stats(pid, with_pss):
+    """(rss bytes, pss bytes or None, cpu seconds) from /proc, or None if the process is gone"""
+    try:
+        # statm and stat are a single short read each; smaps_rollup walks the
+        # process' mappings in the kernel, so it is only read when asked for
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * PAGE_SIZE
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK  # utime + stime
+        pss = None
+        if with_pss:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        pss = int(line.split()[1]) * 1024
+                        break
+        return rss, pss, cpu
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def read_psutil_stats(pid, with_pss):
+    try:
+        process = psutil.Process(pid)
+        times = process.cpu_times()
+        rss = process.memory_info().rss
+        pss = getattr(process.memory_full_info(), "pss", None) if with_pss else None
+        return rss, pss, times.user + times.system
+    except (psutil.Error, OSError):
+        return None
+
+
+def process_stats(pid, with_pss=False):
+    if HAVE_PROC:
+        return read_proc_stats(pid, with_pss)
+    if psutil is not None:
+        return read_psutil_stats(pid, with_pss)
+    return None
+
+
+class ProcessStats:
+    __slots__ = ("pid", "rss", "pss", "cpu_percent")
+
+    def __init__(self, pid, rss, pss, cpu_percent):
+        self.pid = pid
+        self.rss = rss
+        self.pss = pss
+        self.cpu_percent = cpu_percent
+
+
+class ProcessSampler(QObject):
+    """Samples renderer processes on a timer and watches their total RSS
+
+    In the background only RSS and CPU time are read, every `interval`
+    seconds; while the task manager is open sampling is faster and includes
+    PSS. memory_pressure is emitted on every sample while the total RSS of
+    all renderers is above `budget` bytes.
+    """
+
+    sampled = pyqtSignal(object)              # {pid: ProcessStats}
+    memory_pressure = pyqtSignal(int, int)    # total RSS, budget
+
+    def __init__(self, pids, budget=2048 * MB, interval=15, detailed_interval=2, parent=None):
+        super().__init__(parent)
+        self.pids = pids  # callable returning the current renderer pids
+        self.budget = budget
+        self.interval = interval * 1000
+        self.detailed_interval = detailed_interval * 1000
+        self.detailed = False
+        self.previous = {}  # pid -> (cpu seconds, monotonic time) of the last sample
+        self.stats = {}
+        self.total_rss = 0
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.interval)
+        self.timer.timeout.connect(self.sample)
+        self.timer.start()
+
+    def set_detailed(self, detailed):
+        self.detailed = detailed
+        self.timer.setInterval(self.detailed_interval if detailed else self.interval)
+        if detailed:
+            self.sample()
+
+    def sample(self):
+        now = time.monotonic()
+        stats, previous = {}, {}
+        for pid in self.pids():
+            result = process_stats(pid, self.detailed)
+            if result is None:
+                continue
+            rss, pss, cpu = result
+            last = self.previous.get(pid)
+            percent = None
+            if last is not None and now > last[1]:
+                percent = max(cpu - last[0], 0) / (now - last[1]) * 100
+            stats[pid] = ProcessStats(pid, rss, pss, percent)
+            previous[pid] = (cpu, now)
+        self.previous = previous
+        self.stats = stats
+        self.total_rss = sum(s.rss for s in stats.values())
+        if self.budget and self.total_rss > self.budget:
+            self.memory_pressure.emit(self.total_rss, self.budget)
+        self.sampled.emit(stats)
+
+
+def kill_process(pid):
+    """End a renderer process; its tabs see renderProcessTerminated"""
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except OSError:
+        pass
+
+
+class SortItem(QTableWidgetItem):
+    """Table cell that sorts by a number while showing formatted text"""
+
+    def __init__(self, text, key):
+        super().__init__(text)
+        self.key = key
+
+    def __lt__(self, other):
+        if isinstance(other, SortItem):
+            return self.key < other.key
+        return super().__lt__(other)
+
+
+class TaskManager(QDialog):
+    """Per-tab renderer CPU and memory, with freeze, discard and kill actions"""
+
+    COLUMNS = ("Tab", "Process", "CPU %", "Memory", "PSS", "State")
+
+    def __init__(self, browser_app, sampler, parent=None):
+        super().__init__(parent)
+        self.browser_app = browser_app
+        self.sampler = sampler
+        self.setWindowTitle("Task Manager - Elafrý")
+        self.resize(760, 420)
+        self.rows = []  # row -> (window, view), in table order after sorting
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().hide()
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(3, Qt.SortOrder.DescendingOrder)
+
+        self.total_label = QLabel()
+        freeze_btn = QPushButton("Freeze")
+        freeze_btn.clicked.connect(lambda: self.apply_to_selected(self.freeze))
+        discard_btn = QPushButton("Discard")
+        discard_btn.clicked.connect(lambda: self.apply_to_selected(self.discard))
+        kill_btn = QPushButton("End Process")
+        kill_btn.setToolTip("Also ends other tabs sharing the same process")
+        kill_btn.clicked.connect(lambda: self.apply_to_selected(self.kill))
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.total_label)
+        buttons.addStretch()
+        for btn in (freeze_btn, discard_btn, kill_btn):
+            buttons.addWidget(btn)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+
+        sampler.sampled.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.sampler.set_detailed(True)
+
+    def hideEvent(self, event):
+        self.sampler.set_detailed(False)
+        super().hideEvent(event)
+
+    def refresh(self, stats):
+        if not self.isVisible():
+            return
+        selected = {self.rows[i.row()][1] for i in self.table.selectionModel().selectedRows()
+                    if i.row() < len(self.rows)}
+        tabs = list(self.browser_app.live_tabs())
+        shared = {}
+        for _, view in tabs:
+            pid = view.page().renderProcessPid()
+            shared[pid] = shared.get(pid, 0) + 1
+
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(tabs))
+        for row, (window, view) in enumerate(tabs):
+            page = view.page()
+            pid = page.renderProcessPid()
+            s = stats.get(pid)
+            state = STATE_NAMES.get(page.lifecycleState(), "")
+            if window.lifecycle.is_pinned(view):
+                state += ", pinned"
+            cells = (
+                SortItem(view.title() or view.url().toString(), (view.title() or "").lower()),
+                SortItem(str(pid) if pid else "–", pid),
+                SortItem("–" if s is None or s.cpu_percent is None else f"{s.cpu_percent:.1f}",
+                         (s.cpu_percent or 0) if s else -1),
+                SortItem("–" if s is None else f"{s.rss / MB:.0f} MB", s.rss if s else -1),
+                SortItem("–" if s is None or s.pss is None else f"{s.pss / MB:.0f} MB",
+                         (s.pss or 0) if s else -1),
+                SortItem(state, state),
+            )
+            for column, item in enumerate(cells):
+                # Column 0 carries the row's tab, so it survives sorting
+                if column == 0:
+                    item.setData(Qt.ItemDataRole.UserRole, view.tab_id)
+                if shared.get(pid, 0) > 1:
+                    item.setToolTip(f"Process {pid} is shared by {shared[pid]} tabs")
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+
+        by_id = {view.tab_id: (window, view) for window, view in tabs}
+        self.rows = [by_id[self.table.item(r, 0).data(Qt.ItemDataRole.UserRole)]
+                     for r in range(self.table.rowCount())]
+        selection = self.table.selectionModel()
+        selection.clearSelection()
+        for row, (_, view) in enumerate(self.rows):
+            if view in selected:
+                selection.select(self.table.model().index(row, 0),
+                                 selection.SelectionFlag.Select | selection.SelectionFlag.Rows)
+        self.total_label.setText(f"Renderers: {self.sampler.total_rss / MB:.0f} MB "
+                                 f"of {self.sampler.budget / MB:.0f} MB budget")
+
+    def apply_to_selected(self, action):
+        for index in self.table.selectionModel().selectedRows():
+            if index.row() < len(self.rows):
+                action(*self.rows[index.row()])
+        self.sampler.sample()
+
+    def freeze(self, window, view):
+        window.lifecycle.freeze(view)
+
+    def discard(self, window, view):
+        window.lifecycle.discard(view)
+
+    def kill(self, window, view):
+        pid = view.page().renderProcessPid()
+        if pid:
+            kill_process(pid)
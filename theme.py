@@ -0,0 +1,390 @@
+"""Theme palettes, precompiled stylesheets and a rendered-icon cache
+
+Each theme's stylesheets are built once, split per widget: the toolbar,
+the tab bar, the vertical tab panel and the status bar each get their own.
+Switching themes then only restyles those widgets whose sheet changed;
+nothing is set on the window itself (its colors come from the QPalette), so
+the web views, which are most of the widgets, are never re-polished.
+
+    python theme.py [--tabs 100] [--toggles 20]
+
+measures theme-toggle latency with that many tabs open, against setting
+one stylesheet on the whole window as before.
+"""
+import os
+import sys
+import time
+import statistics
+from functools import lru_cache
+from PyQt6.QtCore import QByteArray, QRectF, Qt
+from PyQt6.QtGui import QColor, QFont, QIcon, QPainter, QPalette, QPen, QPixmap
+
+try:
+    from PyQt6.QtSvg import QSvgRenderer
+except ImportError:  # QtSvg missing: fall back to icons drawn with QPainter
+    QSvgRenderer = None
+
+# Modern Glassmorphism-inspired Palette
+PALETTES = {
+    "light": {
+        "bg": "#F3F4F6",
+        "fg": "#1F2937",
+        "glass_bg": "#FFFFFF",
+        "accent": "#0F62FE",  # Enterprise Blue
+        "border": "#D1D5DB",
+        "hover_bg": "#E5E7EB",
+    },
+    "dark": {
+        "bg": "#1E1E1E",  # Deep Gray
+        "fg": "#FFFFFF",
+        "glass_bg": "#2D2D2D",  # Slightly lighter
+        "accent": "#61AFEF",  # OneDark Blue
+        "border": "#3e4451",
+        "hover_bg": "#3a3f4b",
+    },
+}
+FONT_FAMILIES = ["-apple-system", "BlinkMacSystemFont", "Segoe UI", "Roboto", "sans-serif"]
+
+# Lucide SVG Icons
+LUCIDE_ICONS = {
+    'chevron-left': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="m15 18-6-6 6-6"/></svg>''',
+    'chevron-right': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="m9 18 6-6-6-6"/></svg>''',
+    'rotate-cw': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M21 12a9 9 0 1 1-9-9c2.52 0 4.93 1 6.74 2.74L21 8"/><path d="M21 3v5h-5"/></svg>''',
+    'home': '''<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="m3 9 9-7 9 7v11a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2z"/><polyline points="9 22 9 12 15 12 15 22"/></svg>''',
+}
+
+SCROLLBARS_QSS = """
+/* Scrollbars (Modern Slim) */
+QScrollBar:vertical {{
+    border: none;
+    background: {bg};
+    width: 8px;
+    margin: 0px;
+}}
+
+QScrollBar::handle:vertical {{
+    background: {border};
+    min-height: 20px;
+    border-radius: 4px;
+}}
+
+QScrollBar::handle:vertical:hover {{
+    background: {accent};
+}}
+
+QScrollBar:horizontal {{
+    border: none;
+    background: {bg};
+    height: 8px;
+    margin: 0px;
+}}
+
+QScrollBar::handle:horizontal {{
+    background: {border};
+    min-width: 20px;
+    border-radius: 4px;
+}}
+
+QScrollBar::handle:horizontal:hover {{
+    background: {accent};
+}}
+"""
+
+# Per-widget stylesheet templates; the keys name BrowserWindow.themed_widgets()
+STYLESHEETS = {
+    "navbar": """
+/* Navigation Bar */
+QToolBar {{
+    background: {glass_bg};
+    border: none;
+    border-bottom: 1px solid {border};
+    padding: 4px 8px;
+    spacing: 4px;
+}}
+
+QToolBar QToolButton {{
+    background: transparent;
+    border: none;
+    border-radius: 12px;
+    padding: 6px;
+    color: {fg};
+    min-width: 32px;
+    min-height: 32px;
+    max-width: 32px;
+    max-height: 32px;
+}}
+
+QToolBar QToolButton:hover {{
+    background: {hover_bg};
+}}
+
+QToolBar QToolButton:pressed {{
+    background: {accent}33;
+}}
+
+QToolBar QToolButton:checked {{
+    background: {accent}33;
+}}
+
+QToolBar::separator {{
+    background: {border};
+    width: 1px;
+    margin: 6px 8px;
+}}
+
+/* URL Bar */
+QLineEdit {{
+    background-color: {bg};
+    color: {fg};
+    border: 2px solid {border};
+    border-radius: 20px;
+    padding: 8px 16px;
+    font-size: 14px;
+    selection-background-color: {accent};
+}}
+
+QLineEdit:focus {{
+    border: 2px solid {accent};
+    background-color: {glass_bg};
+}}
+
+/* URL suggestions */
+QAbstractItemView {{
+    background: {glass_bg};
+    color: {fg};
+    selection-background-color: {accent};
+}}
+""" + SCROLLBARS_QSS,
+    "tabs": """
+/* Tab pane; only the pane is styled, which leaves the pages' look alone */
+QTabWidget::pane {{
+    border: none;
+    background: {glass_bg};
+}}
+""",
+    "tab_bar": """
+/* Tabs */
+QTabBar::tab {{
+    background: {bg};
+    color: {fg};
+    padding: 10px 24px;
+    border-top-left-radius: 10px;
+    border-top-right-radius: 10px;
+    border: none;
+    margin-right: 2px;
+    min-width: 120px;
+    max-width: 200px;
+}}
+
+QTabBar::tab:selected {{
+    background: {glass_bg};
+    border-bottom: 3px solid {accent};
+    font-weight: 600;
+}}
+
+QTabBar::tab:hover:!selected {{
+    background: {hover_bg};
+}}
+
+/* Vertical Tabs Style overrides */
+QTabBar::tab:left {{
+    padding: 12px 16px;
+    border-top-left-radius: 10px;
+    border-bottom-left-radius: 10px;
+    border-top-right-radius: 0px;
+    border-bottom-right-radius: 0px;
+    margin-bottom: 2px;
+    min-height: 48px;
+}}
+
+QTabBar::tab:left:selected {{
+    border-bottom: none;
+    border-right: 3px solid {accent};
+}}
+""",
+    "tab_panel": """
+/* Vertical Tab Panel */
+QListView#tabPanel {{
+    background: {bg};
+    color: {fg};
+    border: none;
+    border-right: 1px solid {border};
+    outline: 0;
+}}
+
+QListView#tabPanel::item {{
+    padding: 8px 12px;
+    margin: 1px 4px;
+    border-radius: 8px;
+}}
+
+QListView#tabPanel::item:selected {{
+    background: {glass_bg};
+    color: {fg};
+    border-left: 3px solid {accent};
+}}
+
+QListView#tabPanel::item:hover:!selected {{
+    background: {hover_bg};
+}}
+""" + SCROLLBARS_QSS,
+    "overview": """
+/* Tab Overview */
+QListView#tabOverview {{
+    background: {bg};
+    border: none;
+    outline: 0;
+}}
+""" + SCROLLBARS_QSS,
+    "status": """
+/* Status Bar */
+QStatusBar {{
+    background: {glass_bg};
+    color: {fg};
+    border-top: 1px solid {border};
+}}
+""",
+}
+
+
+@lru_cache(maxsize=None)
+def stylesheets(theme):
+    """{widget key: QSS} for a theme, formatted once per process"""
+    palette = PALETTES[theme]
+    return {key: template.format(**palette) for key, template in STYLESHEETS.items()}
+
+
+@lru_cache(maxsize=None)
+def qpalette(theme):
+    """Window colors, inherited by every widget without a stylesheet (placeholders, dialogs)"""
+    colors = PALETTES[theme]
+    palette = QPalette()
+    bg, fg, glass_bg = QColor(colors["bg"]), QColor(colors["fg"]), QColor(colors["glass_bg"])
+    for role, color in ((QPalette.ColorRole.Window, bg), (QPalette.ColorRole.WindowText, fg),
+                        (QPalette.ColorRole.Base, glass_bg), (QPalette.ColorRole.Text, fg),
+                        (QPalette.ColorRole.Button, glass_bg), (QPalette.ColorRole.ButtonText, fg),
+                        (QPalette.ColorRole.AlternateBase, QColor(colors["hover_bg"])),
+                        (QPalette.ColorRole.Highlight, QColor(colors["accent"])),
+                        (QPalette.ColorRole.HighlightedText, QColor("#FFFFFF"))):
+        palette.setColor(role, color)
+    return palette
+
+
+def window_font(base):
+    font = QFont(base)
+    font.setFamilies(FONT_FAMILIES)
+    return font
+
+
+def icon_color(theme):
+    return PALETTES[theme]["fg"]
+
+
+def draw_icon(painter, name):
+    """Approximation of the Lucide icon in a 24x24 box, for when QtSvg is missing"""
+    if name == 'chevron-left':
+        painter.drawLine(15, 6, 9, 12)
+        painter.drawLine(9, 12, 15, 18)
+    elif name == 'chevron-right':
+        painter.drawLine(9, 6, 15, 12)
+        painter.drawLine(15, 12, 9, 18)
+    elif name == 'rotate-cw':
+        painter.drawArc(4, 4, 16, 16, 90 * 16, 270 * 16)
+        painter.drawLine(20, 4, 20, 9)
+        painter.drawLine(20, 4, 15, 4)
+    elif name == 'home':
+        painter.drawLine(12, 5, 4, 11)
+        painter.drawLine(12, 5, 20, 11)
+        painter.drawLine(4, 11, 4, 20)
+        painter.drawLine(20, 11, 20, 20)
+        painter.drawLine(4, 20, 20, 20)
+        painter.drawLine(9, 14, 9, 20)
+        painter.drawLine(15, 14, 15, 20)
+        painter.drawLine(9, 14, 15, 14)
+
+
+class IconCache:
+    """Rendered icons keyed by (name, color, device pixel ratio)"""
+
+    def __init__(self, size=24):
+        self.size = size
+        self.icons = {}
+        self.renders = 0  # cache misses, for the benchmark
+
+    def icon(self, name, color, dpr=1.0):
+        key = (name, color, dpr)
+        icon = self.icons.get(key)
+        if icon is None:
+            icon = self.icons[key] = QIcon(self.render(name, color, dpr))
+        return icon
+
+    def render(self, name, color, dpr):
+        self.renders += 1
+        side = round(self.size * dpr)
+        pixmap = QPixmap(side, side)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if QSvgRenderer is not None and name in LUCIDE_ICONS:
+            svg = LUCIDE_ICONS[name].replace("currentColor", color)
+            QSvgRenderer(QByteArray(svg.encode())).render(painter, QRectF(0, 0, side, side))
+        else:
+            pen = QPen(QColor(color))
+            pen.setWidth(2)
+            pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+            pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
+            painter.setPen(pen)
+            painter.scale(dpr, dpr)
+            draw_icon(painter, name)
+        painter.end()
+        pixmap.setDevicePixelRatio(dpr)
+        return pixmap
+
+
+def benchmark(tabs=100, toggles=20):
+    import tempfile
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    os.environ.setdefault("ELAFRY_DATA_DIR", tempfile.mkdtemp(prefix="elafry-theme-"))
+    import browser
+    from PyQt6.QtCore import QUrl
+    from PyQt6.QtWidgets import QApplication
+    browser.register_scheme()
+    QApplication.setApplicationName("Elafrý")
+    app = QApplication(sys.argv)
+    web_profile = browser.WebProfile(browser.data_path("profile"), parent=app)
+    browser_app = browser.BrowserApp(web_profile, parent=app)
+    window = browser_app.new_window([QUrl("about:blank")] * tabs)
+    window.show()
+    app.processEvents()
+
+    def measure(toggle):
+        times = []
+        for _ in range(toggles):
+            start = time.perf_counter()
+            toggle()
+            app.processEvents()  # Polish and repaint happen in the event loop
+            times.append((time.perf_counter() - start) * 1000)
+        return times
+
+    def whole_window():
+        # What apply_theme used to do: one sheet on the window, restyling every widget
+        window.current_theme = "dark" if window.current_theme == "light" else "light"
+        window.setStyleSheet("".join(stylesheets(window.current_theme).values()))
+
+    results = {"per-widget sheets": measure(window.toggle_theme)}
+    results["whole-window sheet"] = measure(whole_window)
+    print(f"Theme toggle with {tabs} tabs, {toggles} toggles ({browser_app.icons.renders} icon renders)")
+    for name, times in results.items():
+        times.sort()
+        print(f"  {name:20} median {statistics.median(times):7.2f} ms  max {times[-1]:7.2f} ms")
+    window.setStyleSheet("")
+    window.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Theme-toggle latency benchmark")
+    parser.add_argument("--tabs", type=int, default=100)
+    parser.add_argument("--toggles", type=int, default=20)
+    args = parser.parse_args()
+    benchmark(args.tabs, args.toggles)
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt6.QtGui import QPixmap
+
+
+class ThumbnailCache:
+    """LRU cache of downscaled, JPEG-compressed thumbnails bounded by total bytes"""
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, width=320, quality=70):
+        self.max_bytes = max_bytes
+        self.width = width
+        self.quality = quality
+        self.entries = OrderedDict()  # key -> JPEG bytes, least recently used first
+        self.total_bytes = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, key, pixmap):
+        if pixmap.isNull():
+            return
+        scaled = pixmap.scaledToWidth(self.width, Qt.TransformationMode.SmoothTransformation)
+        data = QByteArray()
+        buf = QBuffer(data)
+        buf.open(QIODevice.OpenModeFlag.WriteOnly)
+        scaled.save(buf, "JPEG", self.quality)
+        buf.close()
+        self.put_bytes(key, bytes(data))
+
+    def put_bytes(self, key, data):
+        self.discard(key)
+        self.entries[key] = data
+        self.total_bytes += len(data)
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, dropped = self.entries.popitem(last=False)
+            self.total_bytes -= len(dropped)
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+        return data
+
+    def pixmap(self, key):
+        data = self.get(key)
+        pixmap = QPixmap()
+        if data is not None:
+            pixmap.loadFromData(data, "JPEG")
+        return pixmap
+
+    def discard(self, key):
+        data = self.entries.pop(key, None)
+        if data is not None:
+            self.total_bytes -= len(data)
@@ -0,0 +1,95 @@
+import os
+from PyQt6.QtCore import QObject
+from PyQt6.QtWebEngineCore import QWebEngineProfile
+from internal_pages import SCHEME, InternalSchemeHandler
+from content_blocker import ContentBlocker
+
+# Counts resources of the finished page that were served from the HTTP cache.
+# transferSize is 0 for cache hits; cross-origin entries without
+# Timing-Allow-Origin report no sizes at all and are skipped.
+CACHE_HITS_JS = """
+(function() {
+    var hits = 0, misses = 0;
+    var entries = performance.getEntriesByType('navigation')
+        .concat(performance.getEntriesByType('resource'));
+    entries.forEach(function(e) {
+        if (!e.decodedBodySize) return;
+        if (e.transferSize === 0) hits++; else misses++;
+    });
+    return [hits, misses];
+})()
+"""
+
+
+class WebProfile(QObject):
+    """Named, disk-backed QWebEngineProfile shared by every tab"""
+
+    def __init__(self, storage_path, name="default", cache_path=None,
+                 cache_size=256 * 1024 * 1024, memory_only=False, filter_path=None,
+                 parent=None):
+        super().__init__(parent)
+        # A named profile is persistent; the unnamed default one is off-the-record
+        self.profile = QWebEngineProfile(name, self)
+        self.profile.setPersistentStoragePath(storage_path)
+        self.profile.setCachePath(cache_path or os.path.join(storage_path, "cache"))
+        self.set_cache_size(cache_size)
+        self.set_memory_only(memory_only)
+
+        # Built-in elafry:// pages, served from memory
+        self.pages = InternalSchemeHandler(self)
+        self.profile.installUrlSchemeHandler(SCHEME, self.pages)
+
+        # Ad and tracker blocking from the filter lists (*.txt) in filter_path; installed
+        # per page (ContentBlocker.attach), so blocked requests are counted per tab
+        self.content_blocker = ContentBlocker(self)
+        self.content_blocker.load_lists(filter_path or os.path.join(storage_path, "filters"))
+
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def set_cache_size(self, size):
+        """Maximum HTTP cache size in bytes; 0 lets Chromium choose"""
+        self.profile.setHttpCacheMaximumSize(size)
+
+    def set_memory_only(self, memory_only):
+        cache_type = (QWebEngineProfile.HttpCacheType.MemoryHttpCache if memory_only
+                      else QWebEngineProfile.HttpCacheType.DiskHttpCache)
+        self.profile.setHttpCacheType(cache_type)
+
+    def clear_cache(self):
+        """Clear the HTTP cache; clearHttpCacheCompleted fires when done"""
+        self.profile.clearHttpCache()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_load(self, page):
+        """Add the cache hits/misses of a finished page load to the totals"""
+        page.runJavaScript(CACHE_HITS_JS, self.add_counts)
+
+    def add_counts(self, result):
+        if isinstance(result, list) and len(result) == 2:
+            self.cache_hits += int(result[0])
+            self.cache_misses += int(result[1])
+
+    def cache_disk_usage(self):
+        total = 0
+        for root, _, files in os.walk(self.profile.cachePath()):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def cache_stats(self):
+        requests = self.cache_hits + self.cache_misses
+        memory_only = self.profile.httpCacheType() == QWebEngineProfile.HttpCacheType.MemoryHttpCache
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / requests if requests else 0.0,
+            "disk_bytes": 0 if memory_only else self.cache_disk_usage(),
+            "max_bytes": self.profile.httpCacheMaximumSize(),
+            "path": self.profile.cachePath(),
+            "memory_only": memory_only,
+        }